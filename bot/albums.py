@@ -0,0 +1,78 @@
+"""
+Albüm (grouped_id) birleştirme.
+
+Telegram bir medya albümünü aynı grouped_id'ye sahip ayrı NewMessage
+olayları olarak gönderir. AlbumAggregator bu parçaları kısa bir süre
+biriktirir; son parçadan sonra `window` saniye yeni parça gelmezse albümü
+tek bir liste olarak geri çağırma fonksiyonuna verir.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, Hashable, List
+
+logger = logging.getLogger(__name__)
+
+
+class AlbumAggregator:
+    """Buffers grouped messages per album key and emits them together"""
+
+    def __init__(self, window: float, on_album: Callable[[List], Awaitable]):
+        self.window = window
+        self.on_album = on_album
+        self._albums: Dict[Hashable, List] = {}
+        self._timers: Dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks = set()
+
+    def add(self, key: Hashable, item):
+        """Albüm parçasını ekle; zamanlayıcı her parçada yeniden başlar"""
+        self._albums.setdefault(key, []).append(item)
+
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        self._timers[key] = asyncio.get_running_loop().call_later(self.window, self._emit, key)
+
+    def _emit(self, key: Hashable):
+        self._timers.pop(key, None)
+        items = self._albums.pop(key, None)
+        if not items:
+            return
+        task = asyncio.create_task(self._run(items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, items: List):
+        try:
+            await self.on_album(items)
+        except Exception as e:
+            logger.error(f"Albüm işlenemedi: {e}")
+
+    async def flush_all(self):
+        """Bekleyen tüm albümleri hemen işle (shutdown için)"""
+        for key in list(self._albums):
+            timer = self._timers.pop(key, None)
+            if timer is not None:
+                timer.cancel()
+            self._emit(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class PresetEntities:
+    """
+    Telethon parse_mode nesnesi: metni değiştirmez, önceden hesaplanmış
+    entity'leri döndürür. send_file albüm gönderirken formatting_entities
+    parametresini kullanmadığı için caption entity'leri bu yolla aktarılır.
+    """
+
+    def __init__(self, text: str, entities: list):
+        self.text = text
+        self.entities = entities
+
+    def parse(self, text: str):
+        if text and text == self.text:
+            return text, list(self.entities)
+        return text, []
+
+    def unparse(self, text: str, entities: list) -> str:
+        return text
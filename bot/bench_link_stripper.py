@@ -0,0 +1,245 @@
+"""
+remove_links_from_message için fark testi ve benchmark.
+
+Yeni (bisect + prefix-sum) uygulamayı eski satır×entity döngülü uygulamayla
+Türkçe/emoji ağırlıklı rastgele bir korpus üzerinde karşılaştırır ve
+çıktılar birebir aynı değilse hata koduyla çıkar. Ardından uzun bir promo
+post üzerinde iki uygulamanın süresini ölçer.
+
+    python bench_link_stripper.py [--cases 5000] [--seed 1]
+"""
+import argparse
+import random
+import sys
+import timeit
+
+from telethon.tl.types import (
+    MessageEntityBold,
+    MessageEntityCustomEmoji,
+    MessageEntityItalic,
+    MessageEntityMention,
+    MessageEntityTextUrl,
+    MessageEntityUnderline,
+    MessageEntityUrl,
+)
+
+from main import (
+    FORMATTING_ENTITY_TYPES,
+    LINK_ENTITY_TYPES,
+    remove_links_from_message,
+    utf16_len,
+)
+
+WORDS = [
+    'Bugün', 'büyük', 'fırsat', 'İstanbul', 'ışık', 'ĞÜŞİÖÇ', 'çekiliş', 'şans',
+    'Kazan', 'bonus', 'ödül', 'IĞDIR', 'yatırım', 'promosyon', '%100', 'hoş geldin',
+    '🔥', '🎁', '💰', '👇', '🇹🇷', '👨‍👩‍👧', '✅', '⚡️', '🚀',
+]
+LINKS = ['https://t.me/kanal/123', 't.me/+AbCdEf', '@destek_hatti', 'www.ornek.com.tr/kayit']
+FORMATTING = [MessageEntityBold, MessageEntityItalic, MessageEntityUnderline]
+
+
+def legacy_remove_links_from_message(raw_text: str, entities: list) -> tuple:
+    """main.remove_links_from_message'ın O(E·L + E·N) ilk hali (referans)"""
+    if not raw_text:
+        return "", []
+
+    if not entities:
+        return raw_text, []
+
+    # Entity'leri kategorize et
+    link_entities = []
+    formatting_entities = []
+
+    for entity in entities:
+        if isinstance(entity, LINK_ENTITY_TYPES):
+            link_entities.append(entity)
+        elif isinstance(entity, FORMATTING_ENTITY_TYPES):
+            formatting_entities.append(entity)
+
+    # Link yoksa orijinali döndür
+    if not link_entities:
+        return raw_text, list(formatting_entities)
+
+    # Satırları bul
+    lines = raw_text.split('\n')
+
+    # Her satırın UTF-16 başlangıç ve bitiş pozisyonlarını hesapla
+    line_positions_utf16 = []
+    current_pos_utf16 = 0
+    for line in lines:
+        line_len_utf16 = utf16_len(line)
+        line_end_utf16 = current_pos_utf16 + line_len_utf16
+        line_positions_utf16.append((current_pos_utf16, line_end_utf16))
+        current_pos_utf16 = line_end_utf16 + 1  # +1 for \n
+
+    # Her link entity'sinin hangi satırda olduğunu bul
+    lines_to_remove = set()
+
+    for entity in link_entities:
+        link_start = entity.offset
+        link_end = entity.offset + entity.length
+
+        # Link'in hangi satır(lar)da olduğunu bul
+        for line_idx, (start, end) in enumerate(line_positions_utf16):
+            # Link bu satırla kesişiyor mu?
+            if link_start <= end and link_end >= start:
+                lines_to_remove.add(line_idx)
+
+    # Link içermeyen satırları birleştir
+    cleaned_lines = []
+    for idx, line in enumerate(lines):
+        if idx not in lines_to_remove:
+            cleaned_lines.append(line)
+
+    cleaned_text = '\n'.join(cleaned_lines)
+
+    # Boş satırları temizle (ardışık boş satırları tek satıra indir)
+    while '\n\n\n' in cleaned_text:
+        cleaned_text = cleaned_text.replace('\n\n\n', '\n\n')
+
+    # Silinen UTF-16 karakter sayısını hesapla
+    removed_utf16_chars = 0
+    for line_idx in sorted(lines_to_remove):
+        start, end = line_positions_utf16[line_idx]
+        removed_utf16_chars += (end - start) + 1  # +1 for \n
+
+    # Formatting entity'lerini filtrele ve güncelle
+    updated_formatting = []
+    for entity in formatting_entities:
+        entity_start = entity.offset
+        entity_end = entity.offset + entity.length
+
+        # Entity silinen bir satırda mı?
+        entity_in_removed_line = False
+        for line_idx in lines_to_remove:
+            start, end = line_positions_utf16[line_idx]
+            if entity_start <= end and entity_end >= start:
+                entity_in_removed_line = True
+                break
+
+        if not entity_in_removed_line:
+            # Entity'nin offset'ini hesapla
+            # Silinen satırların UTF-16 uzunluklarını çıkar
+            adjustment = 0
+            for line_idx in sorted(lines_to_remove):
+                start, end = line_positions_utf16[line_idx]
+                line_utf16_len = (end - start) + 1  # +1 for \n
+                if start < entity_start:
+                    adjustment += line_utf16_len
+
+            new_offset = entity_start - adjustment
+            cleaned_text_utf16_len = utf16_len(cleaned_text)
+
+            if new_offset >= 0 and new_offset < cleaned_text_utf16_len:
+                try:
+                    new_entity = type(entity)(
+                        offset=new_offset,
+                        length=entity.length,
+                        **{k: v for k, v in entity.__dict__.items() if k not in ['offset', 'length']}
+                    )
+                    updated_formatting.append(new_entity)
+                except Exception:
+                    pass
+
+    return cleaned_text.strip(), updated_formatting
+
+
+def random_message(rng: random.Random, max_lines: int = 12, min_lines: int = 1) -> tuple:
+    """Rastgele metin + entity listesi (offset'ler UTF-16)"""
+    lines = []
+    entities = []
+    pos = 0
+
+    for _ in range(rng.randint(min_lines, max_lines)):
+        line = ''
+        if rng.random() < 0.15:
+            # Boş satır (ardışık boşluk temizliğini test eder)
+            pass
+        else:
+            for _ in range(rng.randint(1, 8)):
+                if line:
+                    line += ' '
+                start = pos + utf16_len(line)
+                if rng.random() < 0.12:
+                    link = rng.choice(LINKS)
+                    line += link
+                    if link.startswith('@'):
+                        entities.append(MessageEntityMention(start, utf16_len(link)))
+                    elif rng.random() < 0.5:
+                        entities.append(MessageEntityUrl(start, utf16_len(link)))
+                    else:
+                        entities.append(MessageEntityTextUrl(start, utf16_len(link), url=link))
+                else:
+                    word = rng.choice(WORDS)
+                    line += word
+                    length = utf16_len(word)
+                    if word[0] > '\u2000' and rng.random() < 0.6:
+                        entities.append(MessageEntityCustomEmoji(start, length, document_id=rng.randint(1, 10**12)))
+                    elif rng.random() < 0.2:
+                        entities.append(rng.choice(FORMATTING)(start, length))
+        lines.append(line)
+        pos += utf16_len(line) + 1
+
+    text = '\n'.join(lines)
+    total = utf16_len(text)
+
+    # Satır sınırlarını aşan ve sınırda biten entity'ler
+    for _ in range(rng.randint(0, 4)):
+        offset = rng.randint(0, max(total, 1))
+        entities.append(rng.choice(FORMATTING)(offset, rng.randint(0, 40)))
+    if rng.random() < 0.2:
+        entities.append(MessageEntityUrl(rng.randint(0, max(total, 1)), rng.randint(0, 10)))
+
+    rng.shuffle(entities)
+    return text, entities
+
+
+def entity_key(entity) -> tuple:
+    return (type(entity).__name__, tuple(sorted(entity.to_dict().items())))
+
+
+def run_differential(cases: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+
+    for case in range(cases):
+        text, entities = random_message(rng)
+        expected = legacy_remove_links_from_message(text, entities)
+        actual = remove_links_from_message(text, entities)
+        if expected[0] != actual[0] or [entity_key(e) for e in expected[1]] != [entity_key(e) for e in actual[1]]:
+            failures += 1
+            if failures <= 3:
+                print(f"FARK (case {case}):\n{text!r}\n{entities}\nbeklenen={expected}\nbulunan={actual}")
+
+    print(f"Fark testi: {cases - failures}/{cases} aynı")
+    return failures
+
+
+def run_benchmark(seed: int):
+    # Yüzlerce custom emoji entity'si olan uzun promo post
+    rng = random.Random(seed)
+    text, entities = random_message(rng, max_lines=300, min_lines=300)
+    emoji = sum(isinstance(e, MessageEntityCustomEmoji) for e in entities)
+    links = sum(isinstance(e, LINK_ENTITY_TYPES) for e in entities)
+    print(f"Benchmark: {text.count(chr(10)) + 1} satır, {len(entities)} entity ({emoji} custom emoji, {links} link)")
+
+    for name, func in (('eski', legacy_remove_links_from_message), ('yeni', remove_links_from_message)):
+        number = 20
+        seconds = min(timeit.repeat(lambda: func(text, entities), number=number, repeat=5)) / number
+        print(f"  {name}: {seconds * 1000:.2f} ms/mesaj")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cases', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    failures = run_differential(args.cases, args.seed)
+    run_benchmark(args.seed)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
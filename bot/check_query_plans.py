@@ -0,0 +1,129 @@
+"""
+Query plan check for the posts hot path.
+
+Runs EXPLAIN for every posts query the bot issues per message/stat lookup and
+exits non-zero if any of them falls back to a sequential scan on posts.
+Meant for a local scratch database, never production:
+
+    DATABASE_URL=postgresql://localhost/harley_plans python check_query_plans.py --seed
+
+--seed runs migrations and inserts synthetic rows; it refuses to run against a
+non-local database unless --i-know is also given.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+from urllib.parse import urlparse
+
+import config
+import database as db
+
+logging.basicConfig(level=logging.INFO, format='%(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SEED_CHANNELS = 20
+SEED_POSTS = 200000
+SEED_CHAT_ID_BASE = -1009000000000
+
+# Hosts --seed may write to without --i-know
+LOCAL_HOSTS = ('', 'localhost', '127.0.0.1', '::1')
+
+
+def hot_queries(channel_id: int) -> list:
+    """(name, sql, args) - SQL comes from database.py, so the check follows the real queries"""
+    _, start, end = db.day_window()
+    return [
+        ('get_today_post_count', db.SQL_TODAY_POST_COUNT, (channel_id, start, end)),
+        ('get_total_post_count', db.SQL_CHANNEL_POST_COUNT, (channel_id,)),
+        ('get_recent_posts', db.SQL_RECENT_POSTS, (50,)),
+        ('get_recent_posts (channel)', db.SQL_CHANNEL_RECENT_POSTS, (channel_id, 50)),
+        ('get_channel_stats (last post)', db.SQL_CHANNEL_LAST_POST, (channel_id,)),
+    ]
+
+
+def is_local_database(url: str) -> bool:
+    """DATABASE_URL bu makinedeki bir veritabanını mı gösteriyor?"""
+    host = urlparse(url).hostname or ''
+    return host in LOCAL_HOSTS
+
+
+async def seed(conn):
+    """Insert synthetic channels and posts spread over ~6 months"""
+    channel_ids = []
+    for i in range(SEED_CHANNELS):
+        row = await conn.fetchrow('''
+            INSERT INTO source_channels (source_chat_id, target_chat_id, source_title)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (source_chat_id) DO UPDATE SET source_title = EXCLUDED.source_title
+            RETURNING id
+        ''', SEED_CHAT_ID_BASE - i, SEED_CHAT_ID_BASE - 1000 - i, f'seed-{i}')
+        channel_ids.append(row['id'])
+
+    await conn.execute('''
+        INSERT INTO posts
+        (source_channel_id, source_link, source_chat_id, source_message_id,
+         target_chat_id, target_message_id, status, created_at)
+        SELECT
+            ($2::int[])[1 + g % array_length($2::int[], 1)],
+            't.me/seed/' || g, 0, g, 0, g,
+            CASE WHEN g % 10 = 0 THEN 'failed' ELSE 'success' END,
+            (NOW() AT TIME ZONE 'UTC') - (g % 4320) * INTERVAL '1 hour'
+        FROM generate_series(1, $1) g
+    ''', SEED_POSTS, channel_ids)
+    logger.info(f"Seeded {SEED_CHANNELS} channels and {SEED_POSTS} posts")
+
+
+def find_seq_scans(plan: dict, relation: str = 'posts') -> list:
+    """Walk an EXPLAIN (FORMAT JSON) plan tree and collect seq scans on relation"""
+    found = []
+    if plan.get('Node Type') == 'Seq Scan' and plan.get('Relation Name') == relation:
+        found.append(plan)
+    for child in plan.get('Plans', []):
+        found.extend(find_seq_scans(child, relation))
+    return found
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seed', action='store_true', help='insert synthetic rows before checking')
+    parser.add_argument('--i-know', action='store_true',
+                        help='allow --seed against a non-local database (it writes 200k rows)')
+    args = parser.parse_args()
+
+    if args.seed and not args.i_know and not is_local_database(config.DATABASE_URL):
+        host = urlparse(config.DATABASE_URL).hostname
+        logger.error(f"Refusing to seed non-local database ({host}) - use a scratch database or pass --i-know")
+        return 2
+
+    await db.init_db()
+    failures = 0
+
+    try:
+        async with db.pool.acquire() as conn:
+            if args.seed:
+                await seed(conn)
+            await conn.execute('ANALYZE posts')
+
+            channel_id = await conn.fetchval('SELECT id FROM source_channels ORDER BY id LIMIT 1')
+            if channel_id is None:
+                logger.error("No source channels found - run with --seed")
+                return 2
+
+            for name, sql, query_args in hot_queries(channel_id):
+                raw = await conn.fetchval(f'EXPLAIN (FORMAT JSON) {sql}', *query_args)
+                plan = json.loads(raw)[0]['Plan']
+                if find_seq_scans(plan):
+                    failures += 1
+                    logger.error(f"SEQ SCAN  {name}\n{json.dumps(plan, indent=2)}")
+                else:
+                    logger.info(f"ok        {name}")
+    finally:
+        await db.close_db()
+
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,106 @@
+"""
+Çoklu hesap (client) havuzu.
+
+Her session string ayrı bir TelegramClient olarak aynı süreçte çalışır; her
+hesabın kendi flood bütçesi, entity cache'i ve korumalı medya handle'ları
+vardır (access hash ve yüklenen medya hesaba özeldir). Kaynak kanallar
+hesaplara rendezvous hash ile yapışık atanır: kanalın mesajlarını o hesap
+dinler ve gönderir. Bir hesap uzun FloodWait aldığında ya da banlandığında
+atama kalan sağlıklı hesaplara kayar; FloodWait bitince kanal geri döner.
+"""
+import logging
+import time
+import zlib
+from typing import Iterator, List, Optional
+
+from telethon.errors import (
+    AuthKeyUnregisteredError,
+    SessionRevokedError,
+    UserDeactivatedBanError,
+    UserDeactivatedError,
+)
+
+logger = logging.getLogger(__name__)
+
+# Hesabın kalıcı olarak kullanılamadığını gösteren hatalar
+ACCOUNT_ERRORS = (
+    AuthKeyUnregisteredError,
+    SessionRevokedError,
+    UserDeactivatedBanError,
+    UserDeactivatedError,
+)
+
+
+class PoolAccount:
+    """One logged-in account with its own caches and health state"""
+
+    def __init__(self, name: str, client, entity_cache, media_handles):
+        self.name = name
+        self.client = client
+        self.account_id: Optional[int] = None  # get_me sonrası (entity deposu anahtarı)
+        self.entity_cache = entity_cache
+        self.media_handles = media_handles
+        self.blocked_until = 0.0
+        self.banned = False
+
+    def __repr__(self):
+        return f"<PoolAccount {self.name}>"
+
+    @property
+    def available(self) -> bool:
+        return not self.banned and time.monotonic() >= self.blocked_until
+
+    @property
+    def blocked_for(self) -> float:
+        """FloodWait'in bitmesine kalan süre"""
+        return max(0.0, self.blocked_until - time.monotonic())
+
+
+class ClientPool:
+    """Sticky source -> account routing with failover on long FloodWait or ban"""
+
+    def __init__(self, failover_after: float = 60):
+        # Bu süreden kısa FloodWait'ler hesapta beklenir, uzunları hesabı devre dışı bırakır
+        self.failover_after = failover_after
+        self.accounts: List[PoolAccount] = []
+
+    def __len__(self):
+        return len(self.accounts)
+
+    def __iter__(self) -> Iterator[PoolAccount]:
+        return iter(self.accounts)
+
+    def add(self, account: PoolAccount):
+        self.accounts.append(account)
+
+    def account_of(self, client) -> Optional[PoolAccount]:
+        """Olayı alan client'ın hesabı"""
+        return next((account for account in self.accounts if account.client is client), None)
+
+    @staticmethod
+    def _score(key, account: PoolAccount) -> int:
+        # Hesap sırası değişse de aynı hesap aynı kanalları alsın
+        return zlib.crc32(f"{key}:{account.account_id or account.name}".encode())
+
+    def route(self, key) -> Optional[PoolAccount]:
+        """Kanalın şu an atandığı hesap (tüm hesaplar banlıysa None)"""
+        available = [account for account in self.accounts if account.available]
+        if not available:
+            # Hepsi FloodWait'te - işler en erken açılacak hesapta beklesin
+            waiting = [account for account in self.accounts if not account.banned]
+            return min(waiting, key=lambda account: account.blocked_until, default=None)
+        return max(available, key=lambda account: self._score(key, account))
+
+    def on_flood_wait(self, account: PoolAccount, seconds: float) -> bool:
+        """Uzun FloodWait'te hesabı bekleme süresince devre dışı bırak; bırakıldıysa True"""
+        if seconds < self.failover_after or len(self.accounts) < 2:
+            return False
+        account.blocked_until = max(account.blocked_until, time.monotonic() + seconds)
+        logger.warning(f"⏸️ {account.name} {seconds}s FloodWait - kanalları diğer hesaplara geçiyor")
+        return True
+
+    def on_banned(self, account: PoolAccount, error: Exception):
+        """Hesabı kalıcı olarak devre dışı bırak"""
+        if not account.banned:
+            account.banned = True
+            logger.error(f"⛔ {account.name} kullanılamıyor ({type(error).__name__}) - kanalları diğer hesaplara geçiyor")
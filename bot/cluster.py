@@ -0,0 +1,138 @@
+"""
+Çoklu worker (cluster) modu.
+
+Birden fazla süreç (farklı dyno'lar, farklı session'lar) kaynak kanalları
+Postgres'teki kira tablosu üzerinden paylaşır. Her worker periyodik olarak
+heartbeat atar, kiralarını yeniler ve aktif kanalların ceil(kanal / canlı
+worker) kadarını üstlenir. Heartbeat'i kesilen worker'ın kiraları süre
+dolunca diğerlerine geçer; worker da son başarılı yenilemeden bu yana kira
+süresi geçtiyse kanallarını işlemeyi bırakır (DB'ye ulaşamayan worker başka
+worker'ın devraldığı kanalları iletmeye devam etmesin).
+
+Kanal devri iki adımlıdır: fazla kanal önce teklif edilir ve eski sahip onu
+işlemeyi bırakır; sonraki heartbeat'te son işlediği mesaj id'siyle birlikte
+bırakır. Yeni sahip kanalı ancak bundan sonra alır ve aradaki mesajları o
+id'den itibaren Telegram'dan çekip kuyruğa ekler. Konumu (son mesaj id'si)
+bilinmeyen kanal, konumu alınana kadar işlenmeye devam eder ve bırakılmaz;
+konumlar her heartbeat'te kira satırına da yazılır. Cluster modu kapalıyken
+tüm kanallar bu sürecindir.
+"""
+import logging
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import database as db
+
+logger = logging.getLogger(__name__)
+
+
+class ClusterMembership:
+    """This worker's share of source channels (all channels when clustering is off)"""
+
+    def __init__(self, worker_id: str, enabled: bool = False, lease: float = 30):
+        self.worker_id = worker_id
+        self.enabled = enabled
+        self.lease = lease
+        self._owned: Set[int] = set()
+        # Son başarılı yenilemenin başladığı an (monotonic) - DB kirası en geç bu andan itibaren sayılır
+        self._renewed_at: Optional[float] = None
+        # Teklif edilip işlenmesi bırakılan, bir sonraki heartbeat'te bırakılacak kanallar
+        self._offered: Set[int] = set()
+        # Kanal başına işlenen en son mesaj id'si (devirde yeni sahibe verilir)
+        self._last_seen: Dict[int, int] = {}
+        # Devralınan kanallar: [eski sahibin son mesajı, burada canlı alınan ilk mesaj]
+        self._catch_up: Dict[int, List[Optional[int]]] = {}
+
+    def _lease_valid(self) -> bool:
+        return self._renewed_at is not None and time.monotonic() - self._renewed_at < self.lease
+
+    def _processing(self) -> Set[int]:
+        # Teklif edilen kanal konumu alınana kadar işlenir (yoksa devirde aradaki mesajlar kaybolur)
+        return self._owned | {i for i in self._offered if i not in self._last_seen}
+
+    def owns(self, source_channel_id: int) -> bool:
+        """Bu kanalın mesajlarını bu worker mı işliyor?"""
+        return not self.enabled or (source_channel_id in self._processing() and self._lease_valid())
+
+    def owned_ids(self) -> Optional[list]:
+        """Sahip olunan kanal id'leri (cluster kapalıysa None = hepsi)"""
+        if not self.enabled:
+            return None
+        return sorted(self._processing()) if self._lease_valid() else []
+
+    def seen(self, source_channel_id: int, message_id: int):
+        """Kanalın işlenmeye alınan mesajını kaydet"""
+        if not self.enabled:
+            return
+        if message_id > self._last_seen.get(source_channel_id, 0):
+            self._last_seen[source_channel_id] = message_id
+        pending = self._catch_up.get(source_channel_id)
+        if pending is not None and (pending[1] is None or message_id < pending[1]):
+            pending[1] = message_id
+
+    def set_position(self, source_channel_id: int, message_id: int):
+        """Kanalın bu id'ye kadarki mesajları işlenmiş sayılsın (Telegram'dan alınan son mesaj)"""
+        if message_id > self._last_seen.get(source_channel_id, -1):
+            self._last_seen[source_channel_id] = message_id
+
+    def unpositioned(self) -> List[int]:
+        """Son mesaj id'si bilinmeyen kanallar - önce bırakılacaklar (devralma sürenlerin konumu bitince yazılır)"""
+        pending = [i for i in self._offered | self._owned if i not in self._last_seen and i not in self._catch_up]
+        return sorted(pending, key=lambda i: i not in self._offered)
+
+    def catch_up_pending(self) -> List[int]:
+        """Eski sahibinden bırakılan mesajları henüz alınmamış kanallar"""
+        return list(self._catch_up)
+
+    def catch_up_range(self, source_channel_id: int) -> Tuple[Optional[int], Optional[int]]:
+        """(bu id'den sonraki, bu id'den önceki) mesajlar eski sahipten devralınır"""
+        resume_after, live_from = self._catch_up.get(source_channel_id, (None, None))
+        return resume_after, live_from
+
+    def resume_catch_up(self, source_channel_id: int, resume_after: int):
+        """Yarıda kalan devralmayı bu mesajdan sonra sürdür"""
+        pending = self._catch_up.get(source_channel_id)
+        if pending is not None:
+            pending[0] = resume_after
+
+    def finish_catch_up(self, source_channel_id: int, position: Optional[int] = None):
+        """Devralma bitti; position: kuyruğa alınan son mesaj"""
+        pending = self._catch_up.pop(source_channel_id, None)
+        if pending is not None and pending[0] is not None:
+            self.set_position(source_channel_id, pending[0] if position is None else position)
+
+    async def rebalance(self):
+        """Heartbeat at, teklif edilen kanalları bırak, kiraları yenile ve payı dengele"""
+        if not self.enabled:
+            return
+        started = time.monotonic()
+        # Sadece konumu bilinen teklifler bırakılır; diğerleri işlenmeye devam eder
+        released = {i: self._last_seen[i] for i in self._offered if i in self._last_seen}
+        positions = {i: self._last_seen[i] for i in self._owned if i in self._last_seen}
+        owned, taken = await db.rebalance_source_channels(self.worker_id, self.lease, released, positions)
+        owned = set(owned)
+        self._renewed_at = started
+        self._offered -= set(released)
+
+        # Payımızdan çıkanlar teklif edildi (ya da kira dolunca başkası aldı) - artık işlenmez
+        self._offered |= self._owned - owned
+        for source_channel_id, resume_after in taken.items():
+            if resume_after is not None:
+                self._catch_up[source_channel_id] = [resume_after, None]
+
+        if owned != self._owned:
+            gained = len(owned - self._owned)
+            lost = len(self._owned - owned)
+            logger.info(f"🧩 Kanal payı güncellendi: {len(owned)} kanal (+{gained} / -{lost})")
+        self._owned = owned
+
+    async def leave(self):
+        """
+        Kanalları son işlenen mesajlarıyla bırak (diğer worker'lar hemen devralsın).
+        Konumu bilinmeyen kanalda kira satırındaki son kayıtlı konum kullanılır.
+        """
+        if not self.enabled:
+            return
+        released = {i: self._last_seen.get(i) for i in self._owned | self._offered}
+        self._owned = set()
+        await db.leave_cluster(self.worker_id, released)
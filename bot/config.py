@@ -1,4 +1,5 @@
 import os
+import socket
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -11,8 +12,93 @@ API_HASH = os.getenv("API_HASH", "")
 # generate_session.py ile oluşturun
 SESSION_STRING = os.getenv("SESSION_STRING", "")
 
+# Çoklu hesap: virgül/satır ile ayrılmış session string'leri (boşsa SESSION_STRING)
+# Her kaynak kanal bir hesaba yapışık atanır; tüm hesaplar kaynak ve hedeflere üye olmalı
+SESSION_STRINGS = [
+    s.strip() for s in os.getenv("SESSION_STRINGS", "").replace("\n", ",").split(",") if s.strip()
+] or ([SESSION_STRING] if SESSION_STRING else [])
+
+# Bu süreden (saniye) uzun FloodWait alan hesabın işleri diğer hesaplara geçer
+ACCOUNT_FAILOVER_FLOOD_SECONDS = float(os.getenv("ACCOUNT_FAILOVER_FLOOD_SECONDS", "60"))
+
 # Database
 DATABASE_URL = os.getenv("DATABASE_URL", "")
 
+# LISTEN/NOTIFY için doğrudan bağlantı (PgBouncer transaction modunda LISTEN çalışmaz)
+# Boş bırakılırsa DATABASE_URL kullanılır
+DATABASE_LISTEN_URL = os.getenv("DATABASE_LISTEN_URL", "") or DATABASE_URL
+
 # Bot Settings
 HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "30"))
+
+# Kaynak kanal cache'inin tam yenilenme aralığı (saniye) - NOTIFY kaçarsa yedek
+CHANNEL_CACHE_RESYNC_INTERVAL = int(os.getenv("CHANNEL_CACHE_RESYNC_INTERVAL", "300"))
+
+# Global ayarların (bot_enabled vb.) bellekte tutulma süresi (saniye)
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "15"))
+
+# Günlük limitin sıfırlandığı varsayılan saat dilimi (kanal bazında reset_timezone ile değiştirilebilir)
+DEFAULT_RESET_TIMEZONE = os.getenv("DEFAULT_RESET_TIMEZONE", "Europe/Istanbul")
+
+# Entity cache (get_entity sonuçları)
+ENTITY_CACHE_SIZE = int(os.getenv("ENTITY_CACHE_SIZE", "2048"))
+ENTITY_CACHE_TTL = float(os.getenv("ENTITY_CACHE_TTL", "3600"))
+ENTITY_CACHE_NEGATIVE_TTL = float(os.getenv("ENTITY_CACHE_NEGATIVE_TTL", "300"))
+
+# Session entity'lerinin (access hash) veritabanına yazılma aralığı (saniye)
+ENTITY_STORE_FLUSH_INTERVAL = int(os.getenv("ENTITY_STORE_FLUSH_INTERVAL", "30"))
+
+# Gönderim worker havuzu ve hedef başına kuyruk kapasitesi
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_QUEUE_SIZE = int(os.getenv("DELIVERY_QUEUE_SIZE", "100"))
+
+# Shutdown sırasında intake, albüm ve gönderim kuyruklarının boşalması için toplam süre (saniye)
+SHUTDOWN_DRAIN_TIMEOUT = float(os.getenv("SHUTDOWN_DRAIN_TIMEOUT", "20"))
+
+# Gönderim hız sınırları (dakikada mesaj) - FloodWait alındıkça otomatik düşer
+RATE_LIMIT_TARGET_PER_MINUTE = float(os.getenv("RATE_LIMIT_TARGET_PER_MINUTE", "20"))
+RATE_LIMIT_ACCOUNT_PER_MINUTE = float(os.getenv("RATE_LIMIT_ACCOUNT_PER_MINUTE", "60"))
+
+# Post kayıtları toplu yazılır: bu kadar kayıt birikince ya da bu aralıkta (saniye)
+POST_BUFFER_SIZE = int(os.getenv("POST_BUFFER_SIZE", "50"))
+POST_BUFFER_FLUSH_INTERVAL = float(os.getenv("POST_BUFFER_FLUSH_INTERVAL", "2"))
+# DB erişilemezken bellekte tutulacak en fazla kayıt
+POST_BUFFER_MAX_BACKLOG = int(os.getenv("POST_BUFFER_MAX_BACKLOG", "5000"))
+
+# Albüm parçalarının birleştirilmesi için son parçadan sonra beklenecek süre (saniye)
+ALBUM_WINDOW = float(os.getenv("ALBUM_WINDOW", "1.5"))
+
+# Korumalı kaynaklardan indirilip yüklenen medya handle'ları (adet / geçerlilik süresi, saniye)
+MEDIA_CACHE_SIZE = int(os.getenv("MEDIA_CACHE_SIZE", "512"))
+MEDIA_CACHE_TTL = float(os.getenv("MEDIA_CACHE_TTL", "3600"))
+
+# 10 MB üstü korumalı medya akış halinde aktarılır: paralel indirme akışı, upload
+# worker sayısı ve bellekte bekleyebilecek en fazla 512 KB'lık parça
+MEDIA_STREAM_DOWNLOADS = int(os.getenv("MEDIA_STREAM_DOWNLOADS", "2"))
+MEDIA_STREAM_UPLOADS = int(os.getenv("MEDIA_STREAM_UPLOADS", "3"))
+MEDIA_STREAM_BUFFER_PARTS = int(os.getenv("MEDIA_STREAM_BUFFER_PARTS", "8"))
+
+# Mesaj alım kuyruğu: toplam / kaynak başına kapasite ve işleyen worker sayısı
+INTAKE_QUEUE_SIZE = int(os.getenv("INTAKE_QUEUE_SIZE", "1000"))
+INTAKE_PER_SOURCE = int(os.getenv("INTAKE_PER_SOURCE", "200"))
+INTAKE_WORKERS = int(os.getenv("INTAKE_WORKERS", "4"))
+# Kuyruk dolunca: block (bekle), drop_oldest (kaynağın en eskisini at), spill (DB'ye yaz)
+INTAKE_POLICY = os.getenv("INTAKE_POLICY", "block")
+# block policy'de yer bekleyebilecek en fazla handler; aşılınca spill'e düşülür
+INTAKE_MAX_BLOCKED = int(os.getenv("INTAKE_MAX_BLOCKED", "100"))
+# spill ile DB'ye yazılan mesajların kuyruğa geri alınma aralığı (saniye)
+INTAKE_REPLAY_INTERVAL = float(os.getenv("INTAKE_REPLAY_INTERVAL", "5"))
+
+# Bu sürecin kimliği (outbox kiraları) - Heroku'da dyno adı restart sonrası aynı kalır
+WORKER_ID = os.getenv("WORKER_ID") or os.getenv("DYNO") or f"{socket.gethostname()}:{os.getpid()}"
+# Outbox: sahipsiz iş arama / kira yenileme aralığı, kira süresi (saniye) ve tek seferde alınan iş
+OUTBOX_POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+OUTBOX_LEASE = float(os.getenv("OUTBOX_LEASE", "120"))
+OUTBOX_CLAIM_BATCH = int(os.getenv("OUTBOX_CLAIM_BATCH", "20"))
+
+# Cluster modu: birden fazla worker kaynak kanalları kira tablosu üzerinden paylaşır
+# (her worker'ın WORKER_ID'si ve Telegram session'ı farklı olmalı)
+CLUSTER_MODE = os.getenv("CLUSTER_MODE", "false").lower() in ("1", "true", "yes")
+CLUSTER_HEARTBEAT_INTERVAL = float(os.getenv("CLUSTER_HEARTBEAT_INTERVAL", "10"))
+# Heartbeat'i bu süre kesilen worker'ın kanalları diğerlerine geçer (saniye)
+CLUSTER_LEASE = float(os.getenv("CLUSTER_LEASE", "30"))
@@ -1,17 +1,411 @@
 import asyncio
+import json
+import time
 import asyncpg
-from datetime import datetime, date
-from typing import Optional, List, Dict, Any
+from datetime import datetime, date, timezone, timedelta
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Tuple, Callable, Set
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import logging
 import config
 
 logger = logging.getLogger(__name__)
 
 pool: Optional[asyncpg.Pool] = None
+listen_conn: Optional[asyncpg.Connection] = None
+
+SOURCE_CHANNELS_NOTIFY_CHANNEL = 'source_channels_changed'
+SETTINGS_NOTIFY_CHANNEL = 'settings_changed'
+
+# Active source channels keyed by source_chat_id (and by row id)
+_source_channel_cache: Dict[int, Dict[str, Any]] = {}
+_source_channels_by_id: Dict[int, Dict[str, Any]] = {}
+# Called (without arguments) whenever the set of active source chats changes
+_source_chat_listeners: List[Callable[[], None]] = []
+
+# Cached [start, end) day windows keyed by timezone name
+_day_windows: Dict[str, Tuple[date, datetime, datetime]] = {}
+_background_tasks = set()
+
+
+# ============== SCHEMA MIGRATIONS ==============
+
+# Ordered (version, name, statements). Every step runs once and is recorded in
+# schema_version; a warm start only reads the current version.
+# Append new steps at the end - never edit a step that has shipped.
+MIGRATIONS: List[Tuple[int, str, List[str]]] = [
+    (1, 'baseline tables', [
+        # Global settings table
+        '''
+        CREATE TABLE IF NOT EXISTS settings (
+            id SERIAL PRIMARY KEY,
+            key VARCHAR(255) UNIQUE NOT NULL,
+            value TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Target channels table (where messages are sent to)
+        '''
+        CREATE TABLE IF NOT EXISTS target_channels (
+            id SERIAL PRIMARY KEY,
+            chat_id VARCHAR(255) UNIQUE NOT NULL,
+            title VARCHAR(255) NOT NULL,
+            username VARCHAR(255),
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Source channels/groups with their own settings
+        '''
+        CREATE TABLE IF NOT EXISTS source_channels (
+            id SERIAL PRIMARY KEY,
+            source_chat_id BIGINT UNIQUE NOT NULL,
+            source_title TEXT,
+            source_username TEXT,
+            target_chat_id BIGINT NOT NULL,
+            target_channel_id INTEGER,
+            target_title TEXT,
+            append_link TEXT DEFAULT '',
+            daily_limit INTEGER DEFAULT 10,
+            remove_links BOOLEAN DEFAULT TRUE,
+            is_active BOOLEAN DEFAULT TRUE,
+            listen_type VARCHAR(20) DEFAULT 'direct',
+            trigger_keywords TEXT DEFAULT '',
+            send_link_back BOOLEAN DEFAULT FALSE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Columns added before versioned migrations existed
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS listen_type VARCHAR(20) DEFAULT 'direct'",
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS trigger_keywords TEXT DEFAULT ''",
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS send_link_back BOOLEAN DEFAULT FALSE",
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS target_channel_id INTEGER",
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS append_link_text TEXT DEFAULT ''",
+        # Posts history
+        '''
+        CREATE TABLE IF NOT EXISTS posts (
+            id SERIAL PRIMARY KEY,
+            source_channel_id INTEGER REFERENCES source_channels(id) ON DELETE SET NULL,
+            source_link TEXT NOT NULL,
+            source_chat_id BIGINT,
+            source_message_id BIGINT,
+            target_chat_id BIGINT,
+            target_message_id BIGINT,
+            message_text TEXT,
+            has_media BOOLEAN DEFAULT FALSE,
+            media_type TEXT,
+            status VARCHAR(50) DEFAULT 'pending',
+            error_message TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Daily stats per source channel
+        '''
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            id SERIAL PRIMARY KEY,
+            source_channel_id INTEGER REFERENCES source_channels(id) ON DELETE CASCADE,
+            date DATE NOT NULL,
+            post_count INTEGER DEFAULT 0,
+            success_count INTEGER DEFAULT 0,
+            failed_count INTEGER DEFAULT 0,
+            UNIQUE(source_channel_id, date)
+        )
+        ''',
+        # Default global settings
+        '''
+        INSERT INTO settings (key, value) VALUES ('bot_enabled', 'true'), ('bot_status', 'offline')
+        ON CONFLICT (key) DO NOTHING
+        ''',
+    ]),
+    (2, 'change notifications', [
+        # Notify listeners (bot cache) whenever a source channel row changes
+        '''
+        CREATE OR REPLACE FUNCTION notify_source_channels_change() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('source_channels_changed', OLD.source_chat_id::text);
+            ELSE
+                PERFORM pg_notify('source_channels_changed', NEW.source_chat_id::text);
+                IF TG_OP = 'UPDATE' AND OLD.source_chat_id <> NEW.source_chat_id THEN
+                    PERFORM pg_notify('source_channels_changed', OLD.source_chat_id::text);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        "DROP TRIGGER IF EXISTS source_channels_notify ON source_channels",
+        '''
+        CREATE TRIGGER source_channels_notify
+            AFTER INSERT OR UPDATE OR DELETE ON source_channels
+            FOR EACH ROW EXECUTE FUNCTION notify_source_channels_change()
+        ''',
+        # Notify listeners when a global setting changes (bot_status is written by the bot itself)
+        '''
+        CREATE OR REPLACE FUNCTION notify_settings_change() RETURNS trigger AS $$
+        DECLARE
+            changed_key TEXT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed_key := OLD.key;
+            ELSE
+                changed_key := NEW.key;
+            END IF;
+            IF changed_key <> 'bot_status' THEN
+                PERFORM pg_notify('settings_changed', changed_key);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        "DROP TRIGGER IF EXISTS settings_notify ON settings",
+        '''
+        CREATE TRIGGER settings_notify
+            AFTER INSERT OR UPDATE OR DELETE ON settings
+            FOR EACH ROW EXECUTE FUNCTION notify_settings_change()
+        ''',
+    ]),
+    (3, 'daily quota reservation', [
+        # Quota counter reserved before sending (daily limit is enforced on this column)
+        "ALTER TABLE daily_stats ADD COLUMN IF NOT EXISTS quota_used INTEGER DEFAULT 0",
+        "UPDATE daily_stats SET quota_used = success_count WHERE quota_used < success_count",
+        # Check limit, increment counter and return remaining quota in one round trip.
+        # The no-op DO UPDATE locks the day's row so concurrent reservations serialize.
+        '''
+        CREATE OR REPLACE FUNCTION reserve_daily_quota(p_channel_id INTEGER, p_date DATE, p_count INTEGER)
+        RETURNS TABLE (granted INTEGER, remaining INTEGER) AS $$
+        DECLARE
+            v_limit INTEGER;
+            v_used INTEGER;
+            v_granted INTEGER;
+        BEGIN
+            SELECT sc.daily_limit INTO v_limit FROM source_channels sc WHERE sc.id = p_channel_id;
+            IF v_limit IS NULL THEN
+                RETURN QUERY SELECT 0, 0;
+                RETURN;
+            END IF;
+
+            INSERT INTO daily_stats AS ds (source_channel_id, date, quota_used)
+            VALUES (p_channel_id, p_date, 0)
+            ON CONFLICT (source_channel_id, date) DO UPDATE SET quota_used = ds.quota_used
+            RETURNING ds.quota_used INTO v_used;
+
+            v_granted := GREATEST(0, LEAST(p_count, v_limit - v_used));
+            IF v_granted > 0 THEN
+                UPDATE daily_stats ds SET quota_used = v_used + v_granted
+                WHERE ds.source_channel_id = p_channel_id AND ds.date = p_date;
+            END IF;
+
+            RETURN QUERY SELECT v_granted, GREATEST(0, v_limit - v_used - v_granted);
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+    ]),
+    (4, 'per-channel reset timezone', [
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS reset_timezone TEXT DEFAULT 'Europe/Istanbul'",
+    ]),
+    (5, 'posts hot-path indexes', [
+        # Today/total success counts and last-post lookup per channel
+        """CREATE INDEX IF NOT EXISTS idx_posts_success_channel_created
+           ON posts (source_channel_id, created_at DESC) WHERE status = 'success'""",
+        # Recent posts of a channel (any status)
+        """CREATE INDEX IF NOT EXISTS idx_posts_channel_created
+           ON posts (source_channel_id, created_at DESC)""",
+        # Recent posts across all channels
+        """CREATE INDEX IF NOT EXISTS idx_posts_created
+           ON posts (created_at DESC)""",
+    ]),
+    (6, 'telegram entity store', [
+        # Telethon session entities (access hashes are per account)
+        '''
+        CREATE TABLE IF NOT EXISTS telegram_entities (
+            account_id BIGINT NOT NULL,
+            peer_id BIGINT NOT NULL,
+            access_hash BIGINT NOT NULL,
+            username TEXT,
+            phone TEXT,
+            name TEXT,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (account_id, peer_id)
+        )
+        ''',
+    ]),
+    (7, 'multi-target fan-out', [
+        # Extra targets per source; source_channels.target_chat_id stays the primary target
+        '''
+        CREATE TABLE IF NOT EXISTS source_channel_targets (
+            id SERIAL PRIMARY KEY,
+            source_channel_id INTEGER NOT NULL REFERENCES source_channels(id) ON DELETE CASCADE,
+            target_chat_id BIGINT NOT NULL,
+            target_title TEXT,
+            is_active BOOLEAN DEFAULT TRUE,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(source_channel_id, target_chat_id)
+        )
+        ''',
+        # A target change refreshes the cached source channel it belongs to
+        '''
+        CREATE OR REPLACE FUNCTION notify_source_channel_targets_change() RETURNS trigger AS $$
+        DECLARE
+            changed_id INTEGER;
+            changed_chat_id BIGINT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed_id := OLD.source_channel_id;
+            ELSE
+                changed_id := NEW.source_channel_id;
+            END IF;
+            SELECT source_chat_id INTO changed_chat_id FROM source_channels WHERE id = changed_id;
+            IF changed_chat_id IS NOT NULL THEN
+                PERFORM pg_notify('source_channels_changed', changed_chat_id::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        "DROP TRIGGER IF EXISTS source_channel_targets_notify ON source_channel_targets",
+        '''
+        CREATE TRIGGER source_channel_targets_notify
+            AFTER INSERT OR UPDATE OR DELETE ON source_channel_targets
+            FOR EACH ROW EXECUTE FUNCTION notify_source_channel_targets_change()
+        ''',
+    ]),
+    (8, 'per-source delivery scheduling', [
+        # Higher priority is served first in each round; weight = sends per round
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS priority INTEGER DEFAULT 0",
+        "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS weight INTEGER DEFAULT 1",
+    ]),
+    (9, 'intake spill', [
+        # Messages that overflowed the bot's intake queue, replayed when it drains
+        '''
+        CREATE TABLE IF NOT EXISTS intake_spill (
+            id BIGSERIAL PRIMARY KEY,
+            source_chat_id BIGINT NOT NULL,
+            message_id BIGINT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            UNIQUE(source_chat_id, message_id)
+        )
+        ''',
+    ]),
+    (10, 'delivery outbox', [
+        # One row per accepted post until every target is handled; claimed rows carry a lease
+        '''
+        CREATE TABLE IF NOT EXISTS delivery_outbox (
+            id BIGSERIAL PRIMARY KEY,
+            source_channel_id INTEGER NOT NULL REFERENCES source_channels(id) ON DELETE CASCADE,
+            message_chat_id BIGINT NOT NULL,
+            message_ids BIGINT[] NOT NULL,
+            event_chat_id BIGINT,
+            event_message_id BIGINT,
+            remaining_posts INTEGER,
+            done_targets BIGINT[] NOT NULL DEFAULT '{}',
+            claimed_by TEXT,
+            claimed_at TIMESTAMP,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_delivery_outbox_claim ON delivery_outbox (claimed_at NULLS FIRST, id)",
+    ]),
+    (11, 'cluster source sharding', [
+        # Worker heartbeats (a worker is live while its heartbeat is within the lease)
+        '''
+        CREATE TABLE IF NOT EXISTS cluster_workers (
+            worker_id TEXT PRIMARY KEY,
+            heartbeat_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Source channel ownership leases; handoff = owner asked for it to be taken over
+        '''
+        CREATE TABLE IF NOT EXISTS source_channel_owners (
+            source_channel_id INTEGER PRIMARY KEY REFERENCES source_channels(id) ON DELETE CASCADE,
+            worker_id TEXT NOT NULL,
+            lease_until TIMESTAMP NOT NULL,
+            handoff BOOLEAN NOT NULL DEFAULT FALSE
+        )
+        ''',
+        "CREATE INDEX IF NOT EXISTS idx_source_channel_owners_worker ON source_channel_owners (worker_id)",
+    ]),
+    (12, 'outbox quota date', [
+        # Day the quota was reserved on - refunds go back to that day, not the current one
+        "ALTER TABLE delivery_outbox ADD COLUMN IF NOT EXISTS quota_date DATE",
+    ]),
+    (13, 'quiet intake stats settings', [
+        # Per-worker intake counters are written every heartbeat - don't NOTIFY for them
+        '''
+        CREATE OR REPLACE FUNCTION notify_settings_change() RETURNS trigger AS $$
+        DECLARE
+            changed_key TEXT;
+        BEGIN
+            IF TG_OP = 'DELETE' THEN
+                changed_key := OLD.key;
+            ELSE
+                changed_key := NEW.key;
+            END IF;
+            IF changed_key <> 'bot_status' AND changed_key NOT LIKE 'intake_stats:%' THEN
+                PERFORM pg_notify('settings_changed', changed_key);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+    ]),
+    (14, 'intake stage outbox rows', [
+        # 'intake' rows are accepted messages still in the intake queue / album buffer;
+        # they become 'delivery' rows (posts) once filtering and the quota are done
+        "ALTER TABLE delivery_outbox ADD COLUMN IF NOT EXISTS stage TEXT NOT NULL DEFAULT 'delivery'",
+    ]),
+    (15, 'two-step channel handoff', [
+        # released = the old owner stopped processing; resume_after = last message it handled
+        "ALTER TABLE source_channel_owners ADD COLUMN IF NOT EXISTS released BOOLEAN NOT NULL DEFAULT FALSE",
+        "ALTER TABLE source_channel_owners ADD COLUMN IF NOT EXISTS resume_after BIGINT",
+    ]),
+]
+
+# Transaction-level advisory lock key so concurrently booting workers don't migrate twice
+# (session locks are unsafe behind PgBouncer transaction pooling)
+MIGRATION_LOCK_KEY = 784512001
+
+
+async def _get_schema_version(conn) -> int:
+    """Current schema version (0 if migrations never ran)"""
+    try:
+        version = await conn.fetchval('SELECT MAX(version) FROM schema_version')
+    except asyncpg.UndefinedTableError:
+        return 0
+    return version or 0
+
+
+async def _apply_migrations(conn):
+    """Apply pending migration steps in order, in one transaction"""
+    async with conn.transaction():
+        await conn.execute('SELECT pg_advisory_xact_lock($1)', MIGRATION_LOCK_KEY)
+        await conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        # Another worker may have migrated while we waited for the lock
+        current = await _get_schema_version(conn)
+        for version, name, statements in MIGRATIONS:
+            if version <= current:
+                continue
+            for statement in statements:
+                await conn.execute(statement)
+            await conn.execute(
+                'INSERT INTO schema_version (version, name) VALUES ($1, $2)',
+                version, name
+            )
+            logger.info(f"Applied migration {version}: {name}")
 
 
 async def init_db():
-    """Initialize database connection pool and create tables"""
+    """Initialize database connection pool and migrate the schema if needed"""
     global pool
 
     if not config.DATABASE_URL:
@@ -31,109 +425,12 @@ async def init_db():
         raise
 
     async with pool.acquire() as conn:
-        # Global settings table
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS settings (
-                id SERIAL PRIMARY KEY,
-                key VARCHAR(255) UNIQUE NOT NULL,
-                value TEXT NOT NULL,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Target channels table (where messages are sent to)
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS target_channels (
-                id SERIAL PRIMARY KEY,
-                chat_id VARCHAR(255) UNIQUE NOT NULL,
-                title VARCHAR(255) NOT NULL,
-                username VARCHAR(255),
-                is_active BOOLEAN DEFAULT TRUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Source channels/groups with their own settings
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS source_channels (
-                id SERIAL PRIMARY KEY,
-                source_chat_id BIGINT UNIQUE NOT NULL,
-                source_title TEXT,
-                source_username TEXT,
-                target_chat_id BIGINT NOT NULL,
-                target_channel_id INTEGER,
-                target_title TEXT,
-                append_link TEXT DEFAULT '',
-                daily_limit INTEGER DEFAULT 10,
-                remove_links BOOLEAN DEFAULT TRUE,
-                is_active BOOLEAN DEFAULT TRUE,
-                listen_type VARCHAR(20) DEFAULT 'direct',
-                trigger_keywords TEXT DEFAULT '',
-                send_link_back BOOLEAN DEFAULT FALSE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-
-        # Add new columns if they don't exist (for existing databases)
-        migration_queries = [
-            "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS listen_type VARCHAR(20) DEFAULT 'direct'",
-            "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS trigger_keywords TEXT DEFAULT ''",
-            "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS send_link_back BOOLEAN DEFAULT FALSE",
-            "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS target_channel_id INTEGER",
-            "ALTER TABLE source_channels ADD COLUMN IF NOT EXISTS append_link_text TEXT DEFAULT ''",
-        ]
-
-        for query in migration_queries:
-            try:
-                await conn.execute(query)
-            except Exception as e:
-                logger.debug(f"Migration query skipped (may already exist): {e}")
-
-        # Posts history
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS posts (
-                id SERIAL PRIMARY KEY,
-                source_channel_id INTEGER REFERENCES source_channels(id) ON DELETE SET NULL,
-                source_link TEXT NOT NULL,
-                source_chat_id BIGINT,
-                source_message_id BIGINT,
-                target_chat_id BIGINT,
-                target_message_id BIGINT,
-                message_text TEXT,
-                has_media BOOLEAN DEFAULT FALSE,
-                media_type TEXT,
-                status VARCHAR(50) DEFAULT 'pending',
-                error_message TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        # Warm start: a single version check
+        if await _get_schema_version(conn) >= MIGRATIONS[-1][0]:
+            logger.info("Database schema up to date")
+            return
 
-        # Daily stats per source channel
-        await conn.execute('''
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                id SERIAL PRIMARY KEY,
-                source_channel_id INTEGER REFERENCES source_channels(id) ON DELETE CASCADE,
-                date DATE NOT NULL,
-                post_count INTEGER DEFAULT 0,
-                success_count INTEGER DEFAULT 0,
-                failed_count INTEGER DEFAULT 0,
-                UNIQUE(source_channel_id, date)
-            )
-        ''')
-
-        # Initialize default global settings
-        default_settings = {
-            'bot_enabled': 'true',
-            'bot_status': 'offline'
-        }
-
-        for key, value in default_settings.items():
-            await conn.execute('''
-                INSERT INTO settings (key, value) VALUES ($1, $2)
-                ON CONFLICT (key) DO NOTHING
-            ''', key, value)
+        await _apply_migrations(conn)
 
     logger.info("Database tables initialized")
 
@@ -141,6 +438,7 @@ async def init_db():
 async def close_db():
     """Close database connection pool"""
     global pool
+    await stop_listener()
     if pool:
         try:
             # Tüm bağlantıları düzgün kapat
@@ -161,8 +459,123 @@ def _check_pool():
         raise RuntimeError("Database pool is not initialized. Call init_db() first.")
 
 
+# ============== LISTEN / NOTIFY ==============
+
+async def start_listener():
+    """Open a dedicated LISTEN connection for cache invalidation (no-op if already open)"""
+    global listen_conn
+    if listen_conn is not None and not listen_conn.is_closed():
+        return
+
+    try:
+        listen_conn = await asyncpg.connect(
+            config.DATABASE_LISTEN_URL,
+            statement_cache_size=0
+        )
+        await listen_conn.add_listener(SOURCE_CHANNELS_NOTIFY_CHANNEL, _on_source_channels_notify)
+        await listen_conn.add_listener(SETTINGS_NOTIFY_CHANNEL, _on_settings_notify)
+        logger.info("Database listener started")
+    except Exception as e:
+        listen_conn = None
+        logger.warning(f"Database listener unavailable, relying on periodic resync: {e}")
+
+
+async def stop_listener():
+    """Close the LISTEN connection"""
+    global listen_conn
+    if listen_conn is None:
+        return
+    try:
+        await asyncio.wait_for(listen_conn.close(), timeout=5.0)
+    except Exception:
+        listen_conn.terminate()
+    listen_conn = None
+
+
+def is_listener_alive() -> bool:
+    """Check if the LISTEN connection is open"""
+    return listen_conn is not None and not listen_conn.is_closed()
+
+
+def _spawn(coro):
+    """Run a coroutine in the background, keeping a reference until it finishes"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def _on_source_channels_notify(connection, pid, channel, payload):
+    """NOTIFY callback: reload the changed source channel row"""
+    try:
+        chat_id = int(payload)
+    except (ValueError, TypeError):
+        _spawn(load_source_channel_cache())
+        return
+    _spawn(refresh_source_channel(chat_id))
+
+
+def _on_settings_notify(connection, pid, channel, payload):
+    """NOTIFY callback: reload the settings snapshot"""
+    _spawn(settings_snapshot.refresh())
+
+
 # ============== GLOBAL SETTINGS ==============
 
+class SettingsSnapshot:
+    """
+    In-memory copy of the settings table.
+
+    Refreshed on NOTIFY and, as a fallback, in the background once the TTL
+    expires. Reads never wait for the database.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._values: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        """Reload all settings from the database"""
+        try:
+            values = await get_all_settings()
+        except Exception as e:
+            logger.warning(f"Failed to refresh settings snapshot: {e}")
+            return
+        self._values = values
+        self._loaded_at = time.monotonic()
+
+    def _refresh_if_stale(self):
+        if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        if pool is None:
+            return
+        self._refresh_task = _spawn(self.refresh())
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Get a setting value from the snapshot"""
+        self._refresh_if_stale()
+        return self._values.get(key, default)
+
+    def set_local(self, key: str, value: str):
+        """Apply a write made by this process without waiting for NOTIFY"""
+        self._values[key] = value
+
+    @property
+    def bot_enabled(self) -> bool:
+        """Check if bot is enabled (defaults to enabled until the first load)"""
+        value = self.get('bot_enabled')
+        if value is None:
+            return self._loaded_at is None
+        return value == 'true'
+
+
+settings_snapshot = SettingsSnapshot(config.SETTINGS_CACHE_TTL)
+
+
 async def get_setting(key: str) -> Optional[str]:
     """Get a global setting value"""
     _check_pool()
@@ -179,6 +592,31 @@ async def set_setting(key: str, value: str):
             INSERT INTO settings (key, value, updated_at) VALUES ($1, $2, CURRENT_TIMESTAMP)
             ON CONFLICT (key) DO UPDATE SET value = $2, updated_at = CURRENT_TIMESTAMP
         ''', key, value)
+    settings_snapshot.set_local(key, value)
+
+
+async def publish_intake_stats(worker_id: str, stats: Dict[str, int]):
+    """Store this worker's intake counters (summed across workers by get_intake_stats)"""
+    await set_setting(f'intake_stats:{worker_id}', json.dumps(stats))
+
+
+async def get_intake_stats(conn=None) -> Dict[str, int]:
+    """Intake counters (accepted, blocked, dropped, spilled, ...) summed over all workers"""
+    _check_pool()
+    if conn is None:
+        async with pool.acquire() as conn:
+            return await get_intake_stats(conn)
+
+    rows = await conn.fetch("SELECT value FROM settings WHERE key LIKE 'intake_stats:%'")
+    totals: Dict[str, int] = {}
+    for row in rows:
+        try:
+            values = json.loads(row['value'])
+        except ValueError:
+            continue
+        for name, count in values.items():
+            totals[name] = totals.get(name, 0) + int(count)
+    return totals
 
 
 async def get_all_settings() -> Dict[str, str]:
@@ -189,16 +627,6 @@ async def get_all_settings() -> Dict[str, str]:
         return {row['key']: row['value'] for row in rows}
 
 
-async def is_bot_enabled() -> bool:
-    """Check if bot is enabled"""
-    try:
-        val = await get_setting('bot_enabled')
-        return val == 'true'
-    except Exception as e:
-        logger.error(f"Error checking bot enabled status: {e}")
-        return True  # Default to enabled if can't check
-
-
 # ============== TARGET CHANNELS ==============
 
 async def get_target_channel(channel_id: int) -> Optional[Dict[str, Any]]:
@@ -278,10 +706,15 @@ async def update_source_channel(
     listen_type: str = None,
     trigger_keywords: str = None,
     send_link_back: bool = None,
-    target_channel_id: int = None
+    target_channel_id: int = None,
+    reset_timezone: str = None,
+    priority: int = None,
+    weight: int = None
 ):
-    """Update source channel settings"""
+    """Update source channel settings (raises ValueError for an unknown reset_timezone)"""
     _check_pool()
+    if reset_timezone is not None:
+        validate_timezone(reset_timezone)
     async with pool.acquire() as conn:
         updates = []
         values = [source_chat_id]
@@ -327,6 +760,18 @@ async def update_source_channel(
             updates.append(f"target_channel_id = ${idx}")
             values.append(target_channel_id)
             idx += 1
+        if reset_timezone is not None:
+            updates.append(f"reset_timezone = ${idx}")
+            values.append(reset_timezone)
+            idx += 1
+        if priority is not None:
+            updates.append(f"priority = ${idx}")
+            values.append(priority)
+            idx += 1
+        if weight is not None:
+            updates.append(f"weight = ${idx}")
+            values.append(max(1, weight))
+            idx += 1
 
         if updates:
             updates.append("updated_at = CURRENT_TIMESTAMP")
@@ -387,17 +832,631 @@ async def get_active_source_channels() -> List[Dict[str, Any]]:
 
 async def is_source_channel(chat_id) -> bool:
     """Check if a chat is a registered source channel"""
+    return get_cached_source_channel(chat_id) is not None
+
+
+# ============== SOURCE CHANNEL CACHE ==============
+
+def _attach_targets(channel: Dict[str, Any], extra_targets: List[int]):
+    """Store the fan-out target list (primary first, no duplicates) on a cached channel"""
+    channel['targets'] = list(dict.fromkeys([channel['target_chat_id'], *extra_targets]))
+
+
+async def load_source_channel_cache():
+    """Load all active source channels into the in-memory index (full resync)"""
+    global _source_channel_cache, _source_channels_by_id
+    channels = await get_active_source_channels()
+    async with pool.acquire() as conn:
+        target_rows = await conn.fetch(
+            'SELECT source_channel_id, target_chat_id FROM source_channel_targets '
+            'WHERE is_active = TRUE ORDER BY id'
+        )
+    extra_targets: Dict[int, List[int]] = {}
+    for row in target_rows:
+        extra_targets.setdefault(row['source_channel_id'], []).append(row['target_chat_id'])
+    for channel in channels:
+        _attach_targets(channel, extra_targets.get(channel['id'], []))
+    previous_chat_ids = set(_source_channel_cache)
+    _source_channel_cache = {int(channel['source_chat_id']): channel for channel in channels}
+    _source_channels_by_id = {channel['id']: channel for channel in channels}
+    logger.debug(f"Source channel cache loaded: {len(_source_channel_cache)} active")
+    if set(_source_channel_cache) != previous_chat_ids:
+        _notify_source_chat_listeners()
+
+
+async def refresh_source_channel(source_chat_id: int):
+    """Reload a single source channel into the cache (drops it if inactive or deleted)"""
+    _check_pool()
+    try:
+        async with pool.acquire() as conn:
+            row = await conn.fetchrow(
+                'SELECT * FROM source_channels WHERE source_chat_id = $1',
+                source_chat_id
+            )
+            target_rows = []
+            if row and row['is_active']:
+                target_rows = await conn.fetch(
+                    'SELECT target_chat_id FROM source_channel_targets '
+                    'WHERE source_channel_id = $1 AND is_active = TRUE ORDER BY id',
+                    row['id']
+                )
+    except Exception as e:
+        logger.warning(f"Failed to refresh source channel {source_chat_id}: {e}")
+        return
+
+    previous = _source_channel_cache.pop(source_chat_id, None)
+    if previous:
+        _source_channels_by_id.pop(previous['id'], None)
+
+    if row and row['is_active']:
+        channel = dict(row)
+        _attach_targets(channel, [r['target_chat_id'] for r in target_rows])
+        _source_channel_cache[source_chat_id] = channel
+        _source_channels_by_id[channel['id']] = channel
+
+    if (previous is None) != (source_chat_id not in _source_channel_cache):
+        _notify_source_chat_listeners()
+
+
+def add_source_chat_listener(callback: Callable[[], None]):
+    """Register a callback run whenever a source chat is added to or dropped from the cache"""
+    _source_chat_listeners.append(callback)
+
+
+def _notify_source_chat_listeners():
+    for callback in _source_chat_listeners:
+        try:
+            callback()
+        except Exception as e:
+            logger.warning(f"Source chat listener failed: {e}")
+
+
+def get_cached_source_channel(source_chat_id) -> Optional[Dict[str, Any]]:
+    """Get an active source channel from the in-memory index (no database I/O)"""
     try:
-        chat_id_int = int(chat_id)
+        chat_id = int(source_chat_id)
     except (ValueError, TypeError):
-        return False
-    channel = await get_source_channel(chat_id_int)
-    return channel is not None
+        return None
+    return _source_channel_cache.get(chat_id)
+
+
+def get_cached_source_channels() -> List[Dict[str, Any]]:
+    """Get all active source channels from the in-memory index"""
+    return list(_source_channel_cache.values())
+
+
+def get_cached_source_chat_ids() -> Set[int]:
+    """Get the chat ids of all active source channels"""
+    return set(_source_channel_cache)
+
+
+def get_cached_source_channel_by_id(source_channel_id: int) -> Optional[Dict[str, Any]]:
+    """Get an active source channel from the in-memory index by row id"""
+    return _source_channels_by_id.get(source_channel_id)
+
+
+def get_channel_targets(channel: Dict[str, Any]) -> List[int]:
+    """Fan-out targets of a source channel, primary target first"""
+    return channel.get('targets') or [channel['target_chat_id']]
+
+
+# ============== SOURCE CHANNEL TARGETS ==============
 
+async def add_source_target(source_channel_id: int, target_chat_id: int, target_title: str = None) -> int:
+    """Add (or re-activate) an extra fan-out target for a source channel"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow('''
+            INSERT INTO source_channel_targets (source_channel_id, target_chat_id, target_title)
+            VALUES ($1, $2, $3)
+            ON CONFLICT (source_channel_id, target_chat_id) DO UPDATE SET
+                target_title = COALESCE($3, source_channel_targets.target_title),
+                is_active = TRUE
+            RETURNING id
+        ''', source_channel_id, target_chat_id, target_title)
+        return row['id']
+
+
+async def remove_source_target(source_channel_id: int, target_chat_id: int):
+    """Remove an extra fan-out target"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            'DELETE FROM source_channel_targets WHERE source_channel_id = $1 AND target_chat_id = $2',
+            source_channel_id, target_chat_id
+        )
+
+
+async def get_source_targets(source_channel_id: int) -> List[Dict[str, Any]]:
+    """Get the extra fan-out targets of a source channel"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch(
+            'SELECT * FROM source_channel_targets WHERE source_channel_id = $1 ORDER BY id',
+            source_channel_id
+        )
+        return [dict(row) for row in rows]
+
+
+# ============== INTAKE SPILL ==============
+
+async def spill_intake(source_chat_id: int, message_id: int, intake_job_id: Optional[int] = None):
+    """
+    Persist a message that did not fit into the intake queue.
+    Its intake job row (if any) is dropped in the same transaction so it is replayed only once.
+    """
+    _check_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute('''
+                INSERT INTO intake_spill (source_chat_id, message_id)
+                VALUES ($1, $2)
+                ON CONFLICT (source_chat_id, message_id) DO NOTHING
+            ''', source_chat_id, message_id)
+            if intake_job_id is not None:
+                await conn.execute(
+                    "DELETE FROM delivery_outbox WHERE id = $1 AND stage = 'intake'", intake_job_id
+                )
+
+
+async def take_spilled_intake(
+    limit: int,
+    worker_id: str,
+    source_chat_ids: Optional[List[int]] = None
+) -> List[Tuple[int, int, int]]:
+    """
+    Move up to `limit` spilled messages (oldest first) into intake job rows claimed by
+    `worker_id` and return them as (job_id, chat_id, message_id).
+    Messages of inactive channels are discarded. In cluster mode only the given
+    (owned) source chats are taken.
+    """
+    _check_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            WITH taken AS (
+                DELETE FROM intake_spill
+                WHERE id IN (
+                    SELECT id FROM intake_spill
+                    WHERE $2::bigint[] IS NULL OR source_chat_id = ANY($2::bigint[])
+                    ORDER BY id LIMIT $1 FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, source_chat_id, message_id
+            )
+            INSERT INTO delivery_outbox
+            (source_channel_id, message_chat_id, message_ids, event_chat_id,
+             event_message_id, stage, claimed_by, claimed_at)
+            SELECT sc.id, t.source_chat_id, ARRAY[t.message_id], t.source_chat_id,
+                   t.message_id, 'intake', $3, CURRENT_TIMESTAMP
+            FROM taken t
+            JOIN source_channels sc ON sc.source_chat_id = t.source_chat_id AND sc.is_active = TRUE
+            ORDER BY t.id
+            RETURNING id, message_chat_id, event_message_id
+        ''', limit, source_chat_ids, worker_id)
+        rows = sorted(rows, key=lambda row: row['id'])
+        return [(row['id'], row['message_chat_id'], row['event_message_id']) for row in rows]
+
+
+# ============== DELIVERY OUTBOX ==============
+
+async def insert_intake_job(source_channel_id: int, chat_id: int, message_id: int, worker_id: str) -> int:
+    """Persist an accepted message as soon as it is received, claimed by the receiving worker"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow('''
+            INSERT INTO delivery_outbox
+            (source_channel_id, message_chat_id, message_ids, event_chat_id,
+             event_message_id, stage, claimed_by, claimed_at)
+            VALUES ($1, $2, $3, $2, $4, 'intake', $5, CURRENT_TIMESTAMP)
+            RETURNING id
+        ''', source_channel_id, chat_id, [message_id], message_id, worker_id)
+        return row['id']
+
+
+async def insert_outbox_jobs(
+    jobs: List[Dict[str, Any]],
+    worker_id: str,
+    intake_job_ids: Optional[List[int]] = None
+) -> List[int]:
+    """
+    Persist accepted posts, already claimed by the inserting worker, and drop the
+    intake job rows they were made from in the same transaction.
+    Each job has source_channel_id, message_chat_id, message_ids, event_chat_id,
+    event_message_id, remaining_posts and quota_date. Returns the new ids in job order.
+    """
+    _check_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            if intake_job_ids:
+                await conn.execute(
+                    "DELETE FROM delivery_outbox WHERE id = ANY($1::bigint[]) AND stage = 'intake'",
+                    list(intake_job_ids)
+                )
+            outbox_ids = []
+            for job in jobs:
+                outbox_ids.append(await conn.fetchval('''
+                    INSERT INTO delivery_outbox
+                    (source_channel_id, message_chat_id, message_ids, event_chat_id,
+                     event_message_id, remaining_posts, claimed_by, claimed_at, quota_date)
+                    VALUES ($1, $2, $3, $4, $5, $6, $7, CURRENT_TIMESTAMP, $8)
+                    RETURNING id
+                ''', job['source_channel_id'], job['message_chat_id'], job['message_ids'],
+                    job['event_chat_id'], job['event_message_id'], job['remaining_posts'],
+                    worker_id, job['quota_date']))
+            return outbox_ids
+
+
+async def claim_outbox(
+    worker_id: str,
+    lease_seconds: float,
+    limit: int,
+    source_channel_ids: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Claim unowned or lease-expired outbox rows (oldest first) without blocking other workers.
+    In cluster mode only rows of the given (owned) source channels are claimed.
+    """
+    _check_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            UPDATE delivery_outbox SET claimed_by = $1, claimed_at = CURRENT_TIMESTAMP
+            WHERE id IN (
+                SELECT id FROM delivery_outbox
+                WHERE (claimed_at IS NULL
+                       OR claimed_at < CURRENT_TIMESTAMP - make_interval(secs => $2))
+                  AND ($4::int[] IS NULL OR source_channel_id = ANY($4::int[]))
+                ORDER BY id
+                LIMIT $3
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING *
+        ''', worker_id, float(lease_seconds), limit, source_channel_ids)
+        return sorted((dict(row) for row in rows), key=lambda row: row['id'])
+
+
+async def renew_outbox_claims(worker_id: str, outbox_ids: List[int]):
+    """Extend the lease of rows this worker is still delivering"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.execute('''
+            UPDATE delivery_outbox SET claimed_at = CURRENT_TIMESTAMP
+            WHERE id = ANY($2::bigint[]) AND claimed_by = $1
+        ''', worker_id, outbox_ids)
+
+
+async def release_outbox_claims(worker_id: str):
+    """Hand this worker's unfinished rows back so they are picked up immediately"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            'UPDATE delivery_outbox SET claimed_by = NULL, claimed_at = NULL WHERE claimed_by = $1',
+            worker_id
+        )
+
+
+async def mark_outbox_target_done(outbox_id: int, target_chat_id: int):
+    """Record a delivered target so a resumed job does not send it twice"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.execute(
+            'UPDATE delivery_outbox SET done_targets = array_append(done_targets, $2) WHERE id = $1',
+            outbox_id, target_chat_id
+        )
+
+
+async def complete_outbox(outbox_id: int):
+    """Remove a finished outbox row (the result lives in posts)"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.execute('DELETE FROM delivery_outbox WHERE id = $1', outbox_id)
+
+
+# ============== CLUSTER SHARDING ==============
+
+# Serializes rebalancing so workers see a consistent share (transaction-level, PgBouncer safe)
+CLUSTER_LOCK_KEY = 784512002
+
+
+async def rebalance_source_channels(
+    worker_id: str,
+    lease_seconds: float,
+    released: Optional[Dict[int, int]] = None,
+    positions: Optional[Dict[int, int]] = None
+) -> Tuple[List[int], Dict[int, Optional[int]]]:
+    """
+    Heartbeat this worker, renew its source channel leases and move towards an
+    even share (ceil(active channels / live workers)).
+
+    Handoff takes two steps so a channel never has two owners: excess channels
+    are first offered (handoff) and dropped from the returned share; the owner
+    stops processing them and releases them on its next call through `released`
+    ({channel id: last message id it handled}). Only released, free or
+    lease-expired channels are claimed. `positions` stores the last handled
+    message id of owned channels in resume_after as a fallback for releases
+    without a known position.
+    Returns (ids of the channels this worker owns, {newly claimed released
+    channel id: message id to resume after}).
+    """
+    _check_pool()
+    lease = float(lease_seconds)
+    released = released or {}
+    positions = positions or {}
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute('SELECT pg_advisory_xact_lock($1)', CLUSTER_LOCK_KEY)
+
+            await conn.execute('''
+                INSERT INTO cluster_workers (worker_id, heartbeat_at) VALUES ($1, CURRENT_TIMESTAMP)
+                ON CONFLICT (worker_id) DO UPDATE SET heartbeat_at = CURRENT_TIMESTAMP
+            ''', worker_id)
+            await conn.execute(
+                "DELETE FROM cluster_workers WHERE heartbeat_at < CURRENT_TIMESTAMP - INTERVAL '1 day'"
+            )
+            await conn.execute('''
+                DELETE FROM source_channel_owners o USING source_channels s
+                WHERE s.id = o.source_channel_id AND s.is_active = FALSE
+            ''')
+
+            if positions:
+                await conn.execute('''
+                    UPDATE source_channel_owners o
+                    SET resume_after = GREATEST(o.resume_after, p.resume_after)
+                    FROM unnest($2::int[], $3::bigint[]) AS p(source_channel_id, resume_after)
+                    WHERE o.source_channel_id = p.source_channel_id AND o.worker_id = $1 AND NOT o.released
+                ''', worker_id, list(positions), list(positions.values()))
+
+            if released:
+                await conn.execute('''
+                    UPDATE source_channel_owners o
+                    SET released = TRUE, resume_after = GREATEST(o.resume_after, r.resume_after)
+                    FROM unnest($2::int[], $3::bigint[]) AS r(source_channel_id, resume_after)
+                    WHERE o.source_channel_id = r.source_channel_id AND o.worker_id = $1 AND o.handoff
+                ''', worker_id, list(released), list(released.values()))
+
+            live_workers = await conn.fetchval('''
+                SELECT count(*) FROM cluster_workers
+                WHERE heartbeat_at > CURRENT_TIMESTAMP - make_interval(secs => $1)
+            ''', lease)
+            active_channels = await conn.fetchval('SELECT count(*) FROM source_channels WHERE is_active = TRUE')
+            share = -(-active_channels // max(1, live_workers))
+
+            # Offered channels keep their lease until released so nobody takes them early
+            owned = await conn.fetch('''
+                UPDATE source_channel_owners
+                SET lease_until = CURRENT_TIMESTAMP + make_interval(secs => $2)
+                WHERE worker_id = $1 AND NOT released
+                RETURNING source_channel_id, handoff
+            ''', worker_id, lease)
+            kept = sorted(row['source_channel_id'] for row in owned if not row['handoff'])
+
+            taken = {}
+            if len(kept) > share:
+                # Offer the excess - we stop processing it and release it next time
+                await conn.execute(
+                    'UPDATE source_channel_owners SET handoff = TRUE WHERE source_channel_id = ANY($1::int[])',
+                    kept[share:]
+                )
+                kept = kept[:share]
+            elif len(kept) < share:
+                # Free, released (including our own) or lease-expired channels
+                candidates = await conn.fetch('''
+                    SELECT s.id, o.released, o.resume_after
+                    FROM source_channels s
+                    LEFT JOIN source_channel_owners o ON o.source_channel_id = s.id
+                    WHERE s.is_active = TRUE
+                      AND (o.source_channel_id IS NULL
+                           OR o.released
+                           OR o.lease_until <= CURRENT_TIMESTAMP)
+                    ORDER BY o.source_channel_id IS NOT NULL, s.id
+                    LIMIT $1
+                ''', share - len(kept))
+                if candidates:
+                    await conn.execute('''
+                        INSERT INTO source_channel_owners (source_channel_id, worker_id, lease_until)
+                        SELECT id, $1, CURRENT_TIMESTAMP + make_interval(secs => $2)
+                        FROM unnest($3::int[]) AS id
+                        ON CONFLICT (source_channel_id) DO UPDATE SET
+                            worker_id = EXCLUDED.worker_id,
+                            lease_until = EXCLUDED.lease_until,
+                            handoff = FALSE,
+                            released = FALSE
+                    ''', worker_id, lease, [row['id'] for row in candidates])
+                    kept += [row['id'] for row in candidates]
+                    taken = {row['id']: row['resume_after'] for row in candidates if row['released']}
+
+            return sorted(kept), taken
+
+
+async def leave_cluster(worker_id: str, released: Optional[Dict[int, Optional[int]]] = None):
+    """
+    Release this worker's channels (with the last message id handled, or the
+    stored position when unknown) and drop its heartbeat so the others take over immediately
+    """
+    _check_pool()
+    released = released or {}
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            await conn.execute('''
+                UPDATE source_channel_owners o
+                SET released = TRUE, handoff = TRUE, resume_after = GREATEST(o.resume_after, r.resume_after)
+                FROM unnest($2::int[], $3::bigint[]) AS r(source_channel_id, resume_after)
+                WHERE o.worker_id = $1 AND o.source_channel_id = r.source_channel_id
+            ''', worker_id, list(released), list(released.values()))
+            await conn.execute(
+                'DELETE FROM source_channel_owners WHERE worker_id = $1 AND NOT released', worker_id
+            )
+            await conn.execute('DELETE FROM cluster_workers WHERE worker_id = $1', worker_id)
+
+
+# ============== TELEGRAM ENTITIES ==============
+
+async def get_telegram_entities(account_id: int) -> List[tuple]:
+    """Get all stored session entities of an account as (id, hash, username, phone, name)"""
+    _check_pool()
+    async with pool.acquire() as conn:
+        rows = await conn.fetch('''
+            SELECT peer_id, access_hash, username, phone, name
+            FROM telegram_entities WHERE account_id = $1
+        ''', account_id)
+        return [tuple(row) for row in rows]
 
-# ============== POSTS ==============
 
-async def add_post(
+async def save_telegram_entities(account_id: int, rows: List[tuple]):
+    """Upsert session entities (id, hash, username, phone, name) of an account"""
+    if not rows:
+        return
+    _check_pool()
+    async with pool.acquire() as conn:
+        await conn.executemany('''
+            INSERT INTO telegram_entities (account_id, peer_id, access_hash, username, phone, name)
+            VALUES ($1, $2, $3, $4, $5, $6)
+            ON CONFLICT (account_id, peer_id) DO UPDATE SET
+                access_hash = EXCLUDED.access_hash,
+                username = EXCLUDED.username,
+                phone = EXCLUDED.phone,
+                name = EXCLUDED.name,
+                updated_at = CURRENT_TIMESTAMP
+        ''', [(account_id, *row) for row in rows])
+
+
+# ============== POST WRITE BUFFER ==============
+
+POST_COLUMNS = (
+    'source_channel_id', 'source_link', 'source_chat_id', 'source_message_id',
+    'target_chat_id', 'target_message_id', 'message_text', 'has_media',
+    'media_type', 'status', 'error_message', 'created_at'
+)
+
+
+# Errors caused by the batch's contents (bad value, missing FK row) rather than
+# the connection - retrying the same batch can never succeed
+_DATA_ERRORS = (asyncpg.exceptions.DataError, asyncpg.exceptions.IntegrityConstraintViolationError)
+
+
+class PostWriteBuffer:
+    """
+    Write-behind buffer for post records and daily stats increments.
+
+    Records are flushed in one transaction per batch (COPY for posts, one
+    executemany upsert for stats) when max_size records are waiting or by the
+    periodic flush loop. Stats are derived from the buffered records at flush
+    time, so records dropped on overflow take their counts with them.
+
+    A batch that fails on a connection error is kept for the next flush. A batch
+    the database rejects for its contents is retried with ids of deleted source
+    channels nulled out, then row by row; records that still fail are logged
+    and dropped so one bad row can't block every later write.
+    """
+
+    def __init__(self, max_size: int, max_backlog: int):
+        self.max_size = max_size
+        self.max_backlog = max_backlog
+        # (record, (source_channel_id, date) or None, success)
+        self._entries: List[Tuple[tuple, Optional[Tuple[int, date]], bool]] = []
+        self._lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def add(self, record: tuple, source_channel_id: Optional[int], success: bool):
+        """Buffer a post record (POST_COLUMNS order) and its stats increment"""
+        key = None
+        if source_channel_id is not None:
+            key = (source_channel_id, _channel_today(source_channel_id))
+        self._entries.append((record, key, success))
+
+        if len(self._entries) > self.max_backlog:
+            dropped = len(self._entries) - self.max_backlog
+            del self._entries[:dropped]
+            logger.error(f"Post buffer overflow, dropped {dropped} oldest records")
+
+        if len(self._entries) >= self.max_size and not self._lock.locked() and pool is not None:
+            _spawn(self.flush())
+
+    @staticmethod
+    def _stats_rows(entries) -> List[tuple]:
+        stats: Dict[Tuple[int, date], List[int]] = {}
+        for _, key, success in entries:
+            if key is None:
+                continue
+            counts = stats.setdefault(key, [0, 0, 0])
+            counts[0] += 1
+            counts[1 if success else 2] += 1
+        return [(channel_id, day, *counts) for (channel_id, day), counts in stats.items()]
+
+    async def _write(self, conn, entries):
+        """Write records and their stats in one transaction"""
+        records = [record for record, _, _ in entries]
+        stats_rows = self._stats_rows(entries)
+        async with conn.transaction():
+            if records:
+                await conn.copy_records_to_table('posts', records=records, columns=POST_COLUMNS)
+            if stats_rows:
+                await conn.executemany('''
+                    INSERT INTO daily_stats (source_channel_id, date, post_count, success_count, failed_count)
+                    VALUES ($1, $2, $3, $4, $5)
+                    ON CONFLICT (source_channel_id, date) DO UPDATE
+                    SET post_count = daily_stats.post_count + EXCLUDED.post_count,
+                        success_count = daily_stats.success_count + EXCLUDED.success_count,
+                        failed_count = daily_stats.failed_count + EXCLUDED.failed_count
+                ''', stats_rows)
+
+    @staticmethod
+    async def _drop_deleted_channels(conn, entries) -> list:
+        """Null out ids of source channels deleted since queueing (posts keep the row, stats are skipped)"""
+        channel_ids = list({key[0] for _, key, _ in entries if key is not None})
+        rows = await conn.fetch('SELECT id FROM source_channels WHERE id = ANY($1::int[])', channel_ids)
+        existing = {row['id'] for row in rows}
+
+        cleaned = []
+        for record, key, success in entries:
+            if key is not None and key[0] not in existing:
+                record, key = (None, *record[1:]), None
+            cleaned.append((record, key, success))
+        return cleaned
+
+    async def flush(self):
+        """Write all buffered records and stats"""
+        async with self._lock:
+            if not self._entries:
+                return
+            _check_pool()
+
+            entries, self._entries = self._entries, []
+            written = len(entries)
+            try:
+                async with pool.acquire() as conn:
+                    try:
+                        await self._write(conn, entries)
+                    except _DATA_ERRORS as e:
+                        logger.warning(f"Post buffer batch rejected, retrying without deleted channels: {e}")
+                        entries = await self._drop_deleted_channels(conn, entries)
+                        try:
+                            await self._write(conn, entries)
+                        except _DATA_ERRORS:
+                            # Isolate the bad rows; `entries` shrinks as rows are done so a
+                            # connection error below only keeps the unwritten ones
+                            while entries:
+                                entry = entries[0]
+                                try:
+                                    await self._write(conn, [entry])
+                                except _DATA_ERRORS as row_error:
+                                    written -= 1
+                                    logger.error(f"Post record dropped ({row_error}): {entry[0][:6]}")
+                                entries.pop(0)
+                    entries = []
+            except Exception as e:
+                # Keep the (unwritten part of the) batch for the next flush
+                self._entries = entries + self._entries
+                logger.warning(f"Post buffer flush failed ({len(entries)} records kept): {e}")
+                return
+
+            logger.debug(f"Flushed {written} posts")
+
+
+post_buffer = PostWriteBuffer(config.POST_BUFFER_SIZE, config.POST_BUFFER_MAX_BACKLOG)
+
+
+def queue_post(
     source_channel_id: int,
     source_link: str,
     source_chat_id: int,
@@ -407,40 +1466,61 @@ async def add_post(
     message_text: str = None,
     has_media: bool = False,
     media_type: str = None,
-    status: str = 'success'
-) -> int:
-    """Add a new post record"""
-    _check_pool()
-    async with pool.acquire() as conn:
-        row = await conn.fetchrow('''
-            INSERT INTO posts
-            (source_channel_id, source_link, source_chat_id, source_message_id,
-             target_chat_id, target_message_id, message_text, has_media, media_type, status)
-            VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10)
-            RETURNING id
-        ''', source_channel_id, source_link, source_chat_id, source_message_id,
-            target_chat_id, target_message_id, message_text, has_media, media_type, status)
-
-        # Update daily stats
-        try:
-            await update_daily_stats(source_channel_id, status == 'success')
-        except Exception as e:
-            logger.warning(f"Failed to update daily stats: {e}")
-
-        return row['id']
+    status: str = 'success',
+    error_message: str = None
+):
+    """Buffer a post record; it is written by the next post_buffer flush"""
+    record = (
+        source_channel_id, source_link, source_chat_id, source_message_id,
+        target_chat_id, target_message_id, message_text, has_media,
+        media_type, status, error_message,
+        datetime.now(timezone.utc).replace(tzinfo=None)
+    )
+    post_buffer.add(record, source_channel_id, status == 'success')
+
+
+# Hot-path posts queries, shared with check_query_plans.py so the plan check
+# always EXPLAINs exactly what the bot runs.
+SQL_TODAY_POST_COUNT = '''
+    SELECT COUNT(*) as count FROM posts
+    WHERE source_channel_id = $1
+    AND status = 'success'
+    AND created_at >= $2 AND created_at < $3
+'''
+
+SQL_CHANNEL_POST_COUNT = '''
+    SELECT COUNT(*) as count FROM posts
+    WHERE source_channel_id = $1 AND status = 'success'
+'''
+
+SQL_RECENT_POSTS = '''
+    SELECT p.*, sc.source_title, sc.target_title
+    FROM posts p
+    LEFT JOIN source_channels sc ON p.source_channel_id = sc.id
+    ORDER BY p.created_at DESC LIMIT $1
+'''
+
+SQL_CHANNEL_RECENT_POSTS = '''
+    SELECT p.*, sc.source_title, sc.target_title
+    FROM posts p
+    LEFT JOIN source_channels sc ON p.source_channel_id = sc.id
+    WHERE p.source_channel_id = $1
+    ORDER BY p.created_at DESC LIMIT $2
+'''
+
+SQL_CHANNEL_LAST_POST = '''
+    SELECT created_at FROM posts
+    WHERE source_channel_id = $1 AND status = 'success'
+    ORDER BY created_at DESC LIMIT 1
+'''
 
 
 async def get_today_post_count(source_channel_id: int) -> int:
-    """Get number of successful posts made today for a source channel (TR timezone)"""
+    """Get number of successful posts made today for a source channel (channel's reset timezone)"""
     _check_pool()
+    _, start, end = _channel_day_window(source_channel_id)
     async with pool.acquire() as conn:
-        # TR saat dilimine göre bugünün tarihini hesapla (UTC+3)
-        row = await conn.fetchrow('''
-            SELECT COUNT(*) as count FROM posts
-            WHERE source_channel_id = $1
-            AND DATE(created_at AT TIME ZONE 'Europe/Istanbul') = DATE(NOW() AT TIME ZONE 'Europe/Istanbul')
-            AND status = 'success'
-        ''', source_channel_id)
+        row = await conn.fetchrow(SQL_TODAY_POST_COUNT, source_channel_id, start, end)
         return row['count'] if row else 0
 
 
@@ -449,10 +1529,7 @@ async def get_total_post_count(source_channel_id: int = None) -> int:
     _check_pool()
     async with pool.acquire() as conn:
         if source_channel_id:
-            row = await conn.fetchrow('''
-                SELECT COUNT(*) as count FROM posts
-                WHERE source_channel_id = $1 AND status = 'success'
-            ''', source_channel_id)
+            row = await conn.fetchrow(SQL_CHANNEL_POST_COUNT, source_channel_id)
         else:
             row = await conn.fetchrow("SELECT COUNT(*) as count FROM posts WHERE status = 'success'")
         return row['count'] if row else 0
@@ -463,39 +1540,71 @@ async def get_recent_posts(limit: int = 50, source_channel_id: int = None) -> Li
     _check_pool()
     async with pool.acquire() as conn:
         if source_channel_id:
-            rows = await conn.fetch('''
-                SELECT p.*, sc.source_title, sc.target_title
-                FROM posts p
-                LEFT JOIN source_channels sc ON p.source_channel_id = sc.id
-                WHERE p.source_channel_id = $1
-                ORDER BY p.created_at DESC LIMIT $2
-            ''', source_channel_id, limit)
+            rows = await conn.fetch(SQL_CHANNEL_RECENT_POSTS, source_channel_id, limit)
         else:
-            rows = await conn.fetch('''
-                SELECT p.*, sc.source_title, sc.target_title
-                FROM posts p
-                LEFT JOIN source_channels sc ON p.source_channel_id = sc.id
-                ORDER BY p.created_at DESC LIMIT $1
-            ''', limit)
+            rows = await conn.fetch(SQL_RECENT_POSTS, limit)
         return [dict(row) for row in rows]
 
 
-async def can_post_today(source_channel_id: int) -> bool:
-    """Check if we can still post today for this source channel"""
+async def reserve_daily_quota(source_channel_id: int, count: int = 1) -> Tuple[int, Optional[int], date]:
+    """
+    Atomically reserve up to `count` posts from today's quota.
+
+    Returns (granted, remaining, day). `day` is the quota day the reservation was
+    made on; pass it to release_daily_quota so a refund after the channel's reset
+    goes back to that day. If the quota can't be checked, the full count is
+    granted and remaining is None (same policy as can_post_today).
+    """
     _check_pool()
+    day = _channel_today(source_channel_id)
     try:
         async with pool.acquire() as conn:
-            # Get channel's daily limit
-            channel = await conn.fetchrow(
-                'SELECT daily_limit FROM source_channels WHERE id = $1',
-                source_channel_id
+            row = await conn.fetchrow(
+                'SELECT granted, remaining FROM reserve_daily_quota($1, $2, $3)',
+                source_channel_id, day, count
             )
-            if not channel:
-                return False
+            return row['granted'], row['remaining'], day
+    except Exception as e:
+        logger.error(f"Error reserving daily quota: {e}")
+        return count, None, day
+
+
+async def release_daily_quota(source_channel_id: int, count: int = 1, day: Optional[date] = None):
+    """Give back quota reserved for posts that were not sent (on the day it was reserved)"""
+    _check_pool()
+    if day is None:
+        day = _channel_today(source_channel_id)
+    try:
+        async with pool.acquire() as conn:
+            await conn.execute('''
+                UPDATE daily_stats SET quota_used = GREATEST(0, quota_used - $3)
+                WHERE source_channel_id = $1 AND date = $2
+            ''', source_channel_id, day, count)
+    except Exception as e:
+        logger.warning(f"Failed to release daily quota: {e}")
+
+
+async def _get_quota_usage(source_channel_id: int) -> Optional[Tuple[int, int]]:
+    """Get (daily_limit, quota_used) for today in a single query"""
+    async with pool.acquire() as conn:
+        row = await conn.fetchrow('''
+            SELECT sc.daily_limit, COALESCE(ds.quota_used, 0) AS quota_used
+            FROM source_channels sc
+            LEFT JOIN daily_stats ds ON ds.source_channel_id = sc.id AND ds.date = $2
+            WHERE sc.id = $1
+        ''', source_channel_id, _channel_today(source_channel_id))
+        return (row['daily_limit'], row['quota_used']) if row else None
+
 
-            # Get today's count
-            today_count = await get_today_post_count(source_channel_id)
-            return today_count < channel['daily_limit']
+async def can_post_today(source_channel_id: int) -> bool:
+    """Check if we can still post today for this source channel"""
+    _check_pool()
+    try:
+        usage = await _get_quota_usage(source_channel_id)
+        if not usage:
+            return False
+        daily_limit, used = usage
+        return used < daily_limit
     except Exception as e:
         logger.error(f"Error checking daily limit: {e}")
         return True  # Allow posting if can't check
@@ -505,16 +1614,11 @@ async def get_remaining_posts_today(source_channel_id: int) -> int:
     """Get remaining posts allowed today"""
     _check_pool()
     try:
-        async with pool.acquire() as conn:
-            channel = await conn.fetchrow(
-                'SELECT daily_limit FROM source_channels WHERE id = $1',
-                source_channel_id
-            )
-            if not channel:
-                return 0
-
-            today_count = await get_today_post_count(source_channel_id)
-            return max(0, channel['daily_limit'] - today_count)
+        usage = await _get_quota_usage(source_channel_id)
+        if not usage:
+            return 0
+        daily_limit, used = usage
+        return max(0, daily_limit - used)
     except Exception as e:
         logger.error(f"Error getting remaining posts: {e}")
         return 0
@@ -522,58 +1626,123 @@ async def get_remaining_posts_today(source_channel_id: int) -> int:
 
 # ============== STATS ==============
 
-async def update_daily_stats(source_channel_id: int, success: bool):
-    """Update daily statistics (TR timezone)"""
+def validate_timezone(tz_name: str) -> str:
+    """Return tz_name if it is a known IANA timezone, else raise ValueError"""
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError) as e:
+        raise ValueError(f"Unknown timezone '{tz_name}'") from e
+    return tz_name
+
+
+@lru_cache(maxsize=None)
+def _get_zone(tz_name: str) -> ZoneInfo:
+    """Resolve a timezone name, falling back to the default reset timezone"""
+    try:
+        return ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        logger.warning(f"Unknown timezone '{tz_name}', using {config.DEFAULT_RESET_TIMEZONE}")
+        return ZoneInfo(config.DEFAULT_RESET_TIMEZONE)
+
+
+def day_window(tz_name: str = None) -> Tuple[date, datetime, datetime]:
+    """
+    Get today's local date and its [start, end) bounds for a timezone.
+
+    Bounds are naive UTC timestamps, comparable with posts.created_at. They are
+    computed once per timezone and reused until the day rolls over.
+    """
+    tz_name = tz_name or config.DEFAULT_RESET_TIMEZONE
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+    window = _day_windows.get(tz_name)
+    if window and window[1] <= now < window[2]:
+        return window
+
+    zone = _get_zone(tz_name)
+    today = datetime.now(zone).date()
+    start = datetime.combine(today, datetime.min.time(), tzinfo=zone)
+    end = datetime.combine(today + timedelta(days=1), datetime.min.time(), tzinfo=zone)
+    window = (
+        today,
+        start.astimezone(timezone.utc).replace(tzinfo=None),
+        end.astimezone(timezone.utc).replace(tzinfo=None)
+    )
+    _day_windows[tz_name] = window
+    return window
+
+
+def _channel_day_window(source_channel_id: int) -> Tuple[date, datetime, datetime]:
+    """Day window in the source channel's reset timezone"""
+    channel = _source_channels_by_id.get(source_channel_id)
+    return day_window(channel.get('reset_timezone') if channel else None)
+
+
+def _channel_today(source_channel_id: int) -> date:
+    """Today's date in the source channel's reset timezone"""
+    return _channel_day_window(source_channel_id)[0]
+
+
+async def update_daily_stats(source_channel_id: int, success: bool, conn=None):
+    """Update daily statistics (channel's reset timezone)"""
     _check_pool()
-    async with pool.acquire() as conn:
-        # TR saat dilimine göre bugünün tarihini al
-        from datetime import timezone, timedelta
-        tr_tz = timezone(timedelta(hours=3))
-        today = datetime.now(tr_tz).date()
+    if conn is None:
+        async with pool.acquire() as conn:
+            return await update_daily_stats(source_channel_id, success, conn=conn)
 
-        if success:
-            await conn.execute('''
-                INSERT INTO daily_stats (source_channel_id, date, post_count, success_count)
-                VALUES ($1, $2, 1, 1)
-                ON CONFLICT (source_channel_id, date) DO UPDATE
-                SET post_count = daily_stats.post_count + 1,
-                    success_count = daily_stats.success_count + 1
-            ''', source_channel_id, today)
-        else:
-            await conn.execute('''
-                INSERT INTO daily_stats (source_channel_id, date, post_count, failed_count)
-                VALUES ($1, $2, 1, 1)
-                ON CONFLICT (source_channel_id, date) DO UPDATE
-                SET post_count = daily_stats.post_count + 1,
-                    failed_count = daily_stats.failed_count + 1
-            ''', source_channel_id, today)
+    today = _channel_today(source_channel_id)
+
+    if success:
+        await conn.execute('''
+            INSERT INTO daily_stats (source_channel_id, date, post_count, success_count)
+            VALUES ($1, $2, 1, 1)
+            ON CONFLICT (source_channel_id, date) DO UPDATE
+            SET post_count = daily_stats.post_count + 1,
+                success_count = daily_stats.success_count + 1
+        ''', source_channel_id, today)
+    else:
+        await conn.execute('''
+            INSERT INTO daily_stats (source_channel_id, date, post_count, failed_count)
+            VALUES ($1, $2, 1, 1)
+            ON CONFLICT (source_channel_id, date) DO UPDATE
+            SET post_count = daily_stats.post_count + 1,
+                failed_count = daily_stats.failed_count + 1
+        ''', source_channel_id, today)
 
 
 async def get_stats_summary() -> Dict[str, Any]:
-    """Get overall stats summary (TR timezone)"""
+    """Get overall stats summary"""
     _check_pool()
     async with pool.acquire() as conn:
-        # Today's totals (TR timezone)
+        # Today's totals (each channel's own reset timezone). The local date is
+        # computed in Python so an invalid zone falls back exactly like the
+        # quota windows do instead of failing the whole query in Postgres.
+        channel_rows = await conn.fetch('SELECT id, reset_timezone FROM source_channels')
+        channel_ids = [row['id'] for row in channel_rows]
+        channel_days = [day_window(row['reset_timezone'])[0] for row in channel_rows]
         today_row = await conn.fetchrow('''
             SELECT
-                COALESCE(SUM(post_count), 0) as today_posts,
-                COALESCE(SUM(success_count), 0) as today_success,
-                COALESCE(SUM(failed_count), 0) as today_failed
-            FROM daily_stats WHERE date = DATE(NOW() AT TIME ZONE 'Europe/Istanbul')
-        ''')
+                COALESCE(SUM(ds.post_count), 0) as today_posts,
+                COALESCE(SUM(ds.success_count), 0) as today_success,
+                COALESCE(SUM(ds.failed_count), 0) as today_failed
+            FROM daily_stats ds
+            JOIN unnest($1::int[], $2::date[]) AS today(source_channel_id, date)
+              ON today.source_channel_id = ds.source_channel_id AND today.date = ds.date
+        ''', channel_ids, channel_days)
 
         # Total posts
         total_row = await conn.fetchrow('''
             SELECT COUNT(*) as total FROM posts WHERE status = 'success'
         ''')
 
-        # Weekly stats (TR timezone)
+        # Weekly stats (default reset timezone)
+        today = day_window()[0]
         weekly_rows = await conn.fetch('''
             SELECT date, SUM(post_count) as posts, SUM(success_count) as success
             FROM daily_stats
-            WHERE date >= DATE(NOW() AT TIME ZONE 'Europe/Istanbul') - INTERVAL '7 days'
+            WHERE date >= $1
             GROUP BY date ORDER BY date
-        ''')
+        ''', today - timedelta(days=7))
 
         # Active channels count
         channels_row = await conn.fetchrow('''
@@ -586,7 +1755,8 @@ async def get_stats_summary() -> Dict[str, Any]:
             'today_failed': today_row['today_failed'] if today_row else 0,
             'total_posts': total_row['total'] if total_row else 0,
             'active_channels': channels_row['count'] if channels_row else 0,
-            'weekly_stats': [dict(row) for row in weekly_rows]
+            'weekly_stats': [dict(row) for row in weekly_rows],
+            'intake_stats': await get_intake_stats(conn)
         }
 
 
@@ -597,21 +1767,15 @@ async def get_channel_stats(source_channel_id: int) -> Dict[str, Any]:
         today_count = await get_today_post_count(source_channel_id)
         total_count = await get_total_post_count(source_channel_id)
 
-        channel = await conn.fetchrow(
-            'SELECT daily_limit FROM source_channels WHERE id = $1',
-            source_channel_id
-        )
+        # Remaining comes from the enforced quota (reserve/release_daily_quota), not the posts count
+        daily_limit, quota_used = await _get_quota_usage(source_channel_id) or (0, 0)
 
-        last_post = await conn.fetchrow('''
-            SELECT created_at FROM posts
-            WHERE source_channel_id = $1 AND status = 'success'
-            ORDER BY created_at DESC LIMIT 1
-        ''', source_channel_id)
+        last_post = await conn.fetchrow(SQL_CHANNEL_LAST_POST, source_channel_id)
 
         return {
             'today_posts': today_count,
             'total_posts': total_count,
-            'daily_limit': channel['daily_limit'] if channel else 0,
-            'remaining_today': max(0, (channel['daily_limit'] if channel else 0) - today_count),
+            'daily_limit': daily_limit,
+            'remaining_today': max(0, daily_limit - quota_used),
             'last_post_time': last_post['created_at'].isoformat() if last_post else None
         }
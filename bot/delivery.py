@@ -0,0 +1,243 @@
+"""
+Hedef sohbet bazlı gönderim kuyrukları.
+
+Her hedefin kendi sınırlı kuyruğu vardır; ortak bir worker havuzu hazır
+hedefleri sırayla alıp işler. Bir hedef için aynı anda tek bir worker çalışır
+(mesaj sırası korunur), farklı hedefler paralel gönderilir. Yavaş ya da
+bekleyen bir hedef diğerlerini durdurmaz.
+
+Bir hedefin kuyruğu kaynak bazlı şeritlerden oluşur ve şeritler ağırlıklı
+round-robin ile sırayla işlenir: her turda iş bekleyen her kaynak, önceliğine
+göre sırayla en fazla `weight` iş gönderir. Böylece yoğun bir kaynak diğerlerini
+en fazla bir tur (diğer kaynakların ağırlıkları toplamı kadar iş) bekletir.
+
+Hız sınırlayıcı verilirse hedef token bekliyorsa worker bloklanmaz; hedef
+süre dolunca tekrar hazır kuyruğuna alınır. İş hesap anahtarıyla eklenirse
+bucket'lar gönderen hesaba göre seçilir (bir hesabın FloodWait'i diğer
+hesapların aynı hedefe gönderimini yavaşlatmaz). FloodWaitError alan iş atılmaz,
+hedefin kuyruğunun başına geri konur.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from telethon.errors import FloodWaitError
+
+from rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Kuyruğa konan iş: argümansız coroutine fonksiyonu (tekrar çağrılabilir olmalı)
+Job = Callable[[], Awaitable]
+# İşi gönderecek hesabı döndürür - iş başka hesaba taşınabildiği için çalıştırılmadan hemen önce çağrılır
+AccountKey = Callable[[], Hashable]
+
+
+class FairQueue:
+    """Per-source FIFO lanes drained by priority-ordered weighted round-robin"""
+
+    def __init__(self, max_per_lane: int):
+        self.max_per_lane = max_per_lane
+        self._lanes: Dict[Hashable, asyncio.Queue] = {}
+        # lane -> (priority, weight) - son put'taki değerler geçerli
+        self._shares: Dict[Hashable, Tuple[int, int]] = {}
+        # Bu turda sırası gelmemiş şeritler ve kalan hakları
+        self._round: deque = deque()
+        self._credits: Dict[Hashable, int] = {}
+        # Şerit başına alınmış ama task_done'ı gelmemiş iş sayısı
+        self._running: Dict[Hashable, int] = {}
+
+    async def put(self, lane: Hashable, job: Job, priority: int = 0, weight: int = 1):
+        """İşi kaynağın şeridine ekle (şerit doluysa yer açılana kadar bekler)"""
+        queue = self._lanes.get(lane)
+        if queue is None:
+            queue = asyncio.Queue(maxsize=self.max_per_lane)
+            self._lanes[lane] = queue
+        self._shares[lane] = (priority, max(1, weight))
+        await queue.put(job)
+
+    def _start_round(self):
+        lanes = [lane for lane, queue in self._lanes.items() if not queue.empty()]
+        lanes.sort(key=lambda lane: -self._shares[lane][0])
+        self._round = deque(lanes)
+        self._credits = {lane: self._shares[lane][1] for lane in lanes}
+
+    def get_nowait(self) -> Tuple[Hashable, Job]:
+        """Sıradaki (şerit, iş) çiftini al"""
+        for _ in range(2):
+            while self._round:
+                lane = self._round[0]
+                queue = self._lanes[lane]
+                if queue.empty() or self._credits[lane] <= 0:
+                    self._round.popleft()
+                    continue
+                self._credits[lane] -= 1
+                self._running[lane] = self._running.get(lane, 0) + 1
+                return lane, queue.get_nowait()
+            # Tur bitti - iş bekleyen şeritlerle yeni tur
+            self._start_round()
+        raise asyncio.QueueEmpty
+
+    def task_done(self, lane: Hashable):
+        self._lanes[lane].task_done()
+        self._running[lane] -= 1
+        if not self._running[lane]:
+            del self._running[lane]
+
+    def drop_idle_lanes(self, keep) -> int:
+        """`keep` dışındaki boş ve işi süren olmayan şeritleri at (round-robin'de dolaşılmasın)"""
+        dropped = [
+            lane for lane, queue in self._lanes.items()
+            if lane not in keep and queue.empty() and lane not in self._running
+        ]
+        for lane in dropped:
+            del self._lanes[lane]
+            self._shares.pop(lane, None)
+            self._credits.pop(lane, None)
+            if lane in self._round:
+                self._round.remove(lane)
+        return len(dropped)
+
+    def __len__(self):
+        """Şerit sayısı"""
+        return len(self._lanes)
+
+    async def join(self):
+        for queue in list(self._lanes.values()):
+            await queue.join()
+
+    def qsize(self) -> int:
+        return sum(queue.qsize() for queue in self._lanes.values())
+
+    def empty(self) -> bool:
+        return all(queue.empty() for queue in self._lanes.values())
+
+
+class DeliveryQueue:
+    """Bounded per-target job queues drained by a fixed worker pool"""
+
+    def __init__(self, workers: int = 4, max_per_target: int = 100, limiter: Optional[RateLimiter] = None):
+        self.worker_count = workers
+        # Hedef başına, kaynak şeridi başına kapasite
+        self.max_per_target = max_per_target
+        self.limiter = limiter
+        self._queues: Dict[Hashable, FairQueue] = {}
+        # Token bekleyen ya da FloodWait sonrası kuyruğun başında tekrar denenecek (şerit, (iş, hesap))
+        self._heads: Dict[Hashable, Tuple[Hashable, Tuple[Job, Optional[AccountKey]]]] = {}
+        # İşi olan ve şu an bir worker'a atanmamış hedefler
+        self._ready: asyncio.Queue = asyncio.Queue()
+        # Hazır kuyruğunda bekleyen ya da işlenmekte olan hedefler
+        self._scheduled = set()
+        self._workers = []
+
+    def start(self):
+        """Worker havuzunu başlat"""
+        for i in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+
+    async def stop(self):
+        """Worker'ları durdur (bekleyen işler atılır)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def join(self):
+        """Tüm kuyruklar boşalana kadar bekle"""
+        for queue in list(self._queues.values()):
+            await queue.join()
+
+    def pending(self) -> int:
+        """Bekleyen toplam iş sayısı"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    async def put(self, target: Hashable, job: Job, lane: Hashable = None, priority: int = 0, weight: int = 1,
+                  account: Optional[AccountKey] = None):
+        """
+        İşi hedefin kuyruğuna, kaynağın (lane) şeridine ekle.
+        Şerit doluysa yer açılana kadar bekler; priority/weight round-robin payını belirler.
+        account: hız bütçesi anahtarı olarak işi gönderecek hesabı döndüren fonksiyon.
+        """
+        queue = self._queues.get(target)
+        if queue is None:
+            queue = FairQueue(max_per_lane=self.max_per_target)
+            self._queues[target] = queue
+
+        await queue.put(lane, (job, account), priority=priority, weight=weight)
+        self._schedule(target)
+
+    def prune(self, routes: Dict[Hashable, set]) -> int:
+        """
+        Artık yapılandırılmamış (hedef, kaynak) şeritlerini boşsa at; hiç şeridi
+        kalmayan ve yapılandırılmamış hedefin kuyruğunu da kaldır.
+        routes: hedef -> o hedefe gönderen kaynaklar (şerit anahtarları).
+        """
+        dropped = 0
+        for target, queue in list(self._queues.items()):
+            dropped += queue.drop_idle_lanes(routes.get(target, ()))
+            if not len(queue) and target not in routes and target not in self._scheduled:
+                del self._queues[target]
+        return dropped
+
+    def _schedule(self, target: Hashable):
+        if target not in self._scheduled:
+            self._scheduled.add(target)
+            self._ready.put_nowait(target)
+
+    async def _worker(self, worker_id: int):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            target = await self._ready.get()
+            queue = self._queues[target]
+
+            head = self._heads.pop(target, None)
+            if head is not None:
+                lane, item = head
+            else:
+                try:
+                    lane, item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    self._scheduled.discard(target)
+                    continue
+            job, account_key = item
+            account = account_key() if account_key is not None else None
+
+            # Token yoksa worker'ı meşgul etme, iş başta kalır ve hedef süre dolunca tekrar hazırlanır
+            if self.limiter is not None:
+                delay = self.limiter.delay(target, account)
+                if delay > 0:
+                    self._heads[target] = (lane, item)
+                    loop.call_later(delay, self._ready.put_nowait, target)
+                    continue
+                self.limiter.consume(target, account)
+
+            done = True
+            retry_after = 0
+            try:
+                await job()
+                if self.limiter is not None:
+                    self.limiter.on_success(target, account)
+            except asyncio.CancelledError:
+                raise
+            except FloodWaitError as e:
+                logger.warning(f"⏳ Flood wait ({target}): {e.seconds}s - iş ertelendi")
+                if self.limiter is not None:
+                    self.limiter.on_flood_wait(target, e.seconds, account)
+                else:
+                    retry_after = e.seconds
+                self._heads[target] = (lane, item)
+                done = False
+            except Exception as e:
+                logger.error(f"Gönderim işi hatası ({target}): {e}")
+            finally:
+                if done:
+                    queue.task_done(lane)
+                # Hedefin başka işi varsa sıranın sonuna geri koy (hedefler arası adalet)
+                if retry_after:
+                    loop.call_later(retry_after, self._ready.put_nowait, target)
+                elif target in self._heads or not queue.empty():
+                    self._ready.put_nowait(target)
+                else:
+                    self._scheduled.discard(target)
@@ -0,0 +1,158 @@
+"""
+Telegram entity çözümleme cache'i.
+
+client.get_entity sonuçlarını TTL + LRU ile tutar. Telegram'ın kesin olarak
+bulunamadı dediği peer'lar da (negatif cache) kısa süreliğine saklanır, böylece
+aynı hatalı username için tekrar tekrar RPC yapılmaz. Geçici hatalar (FloodWait,
+ağ, iptal, session'da henüz olmayan peer) cache'e yazılmaz; sonraki istek tekrar dener.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional, Tuple
+
+from telethon.errors import (
+    ChannelPrivateError,
+    UsernameInvalidError,
+    UsernameNotOccupiedError,
+)
+
+logger = logging.getLogger(__name__)
+
+# get_entity(list) ile tek seferde çözülecek peer sayısı
+PREWARM_BATCH_SIZE = 50
+
+# Peer'ın gerçekten olmadığını (ya da erişilemediğini) gösteren kesin RPC hataları - negatif
+# cache'lenir. Telethon'un ValueError'ı (ve PeerIdInvalid / ChannelInvalid) çoğunlukla peer'ın
+# session'da henüz olmadığı anlamına gelir (soğuk başlangıç); bunlar geçici sayılır, tekrar denenir.
+NOT_FOUND_ERRORS = (
+    UsernameNotOccupiedError,
+    UsernameInvalidError,
+    ChannelPrivateError,
+)
+
+
+class EntityCache:
+    """Bounded TTL/LRU cache for client.get_entity with negative caching"""
+
+    def __init__(self, maxsize: int = 2048, ttl: float = 3600, negative_ttl: float = 300):
+        self.client = None
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expires_at, entity or None)
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._pending = {}
+        self._tasks = set()
+
+    @staticmethod
+    def _key(peer):
+        if isinstance(peer, str):
+            peer = peer.strip().lstrip('@')
+            if peer.lstrip('-').isdigit():
+                return int(peer)
+            return peer.lower()
+        return peer
+
+    def _store(self, key, entity):
+        ttl = self.ttl if entity is not None else self.negative_ttl
+        self._entries[key] = (time.monotonic() + ttl, entity)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def _lookup(self, key) -> Tuple[bool, bool, Any]:
+        """(hit, fresh, entity)"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, False, None
+        self._entries.move_to_end(key)
+        expires_at, entity = entry
+        return True, time.monotonic() < expires_at, entity
+
+    def peek(self, peer) -> Optional[Any]:
+        """
+        Cache'teki entity'yi RPC yapmadan döndür.
+
+        Yoksa veya süresi dolmuşsa arka planda çözümleme başlatılır; süresi dolmuş
+        değer yenilenene kadar döndürülmeye devam eder.
+        """
+        key = self._key(peer)
+        hit, fresh, entity = self._lookup(key)
+        if not fresh:
+            self.resolve_in_background(peer)
+        return entity if hit else None
+
+    async def get(self, peer) -> Optional[Any]:
+        """Entity'yi döndür, cache'te yoksa çözümle (çözülemezse None)"""
+        key = self._key(peer)
+        hit, fresh, entity = self._lookup(key)
+        if hit and fresh:
+            return entity
+        return await self._resolve(peer)
+
+    def resolve_in_background(self, peer):
+        """Peer'ı beklemeden çözümle"""
+        if self.client is None:
+            return
+        key = self._key(peer)
+        if key in self._pending:
+            return
+        task = asyncio.create_task(self._resolve(peer))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, peer) -> Optional[Any]:
+        key = self._key(peer)
+
+        # Aynı peer için eşzamanlı istekleri tek RPC'de birleştir
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            entity = await self.client.get_entity(key)
+        except asyncio.CancelledError:
+            # Cache'e bir şey yazma; bekleyenler geçici hatadaki gibi None alır
+            # (iptal onların task'ını - ör. intake worker'ını - düşürmesin)
+            future.set_result(None)
+            raise
+        except NOT_FOUND_ERRORS as e:
+            logger.debug(f"Entity bulunamadı ({peer}): {e}")
+            self._store(key, None)
+            future.set_result(None)
+            return None
+        except Exception as e:
+            # Geçici hata - varsa eski değer kalır, sonraki istek tekrar dener
+            logger.debug(f"Entity çözülemedi, tekrar denenecek ({peer}): {e}")
+            future.set_result(None)
+            return None
+        finally:
+            self._pending.pop(key, None)
+
+        self._store(key, entity)
+        future.set_result(entity)
+        return entity
+
+    async def prewarm(self, peers: Iterable):
+        """Verilen peer'ları toplu get_entity çağrılarıyla cache'e yükle"""
+        keys = list(dict.fromkeys(self._key(peer) for peer in peers if peer))
+        resolved = 0
+
+        for i in range(0, len(keys), PREWARM_BATCH_SIZE):
+            batch = keys[i:i + PREWARM_BATCH_SIZE]
+            try:
+                entities = await self.client.get_entity(batch)
+                for key, entity in zip(batch, entities):
+                    self._store(key, entity)
+                resolved += len(batch)
+            except Exception:
+                # Toplu çözümleme bir hatalı peer yüzünden düşerse tek tek dene
+                for key in batch:
+                    if await self._resolve(key) is not None:
+                        resolved += 1
+
+        logger.info(f"🗂️ Entity cache hazır: {resolved}/{len(keys)}")
@@ -0,0 +1,101 @@
+"""
+Çoklu hedefe dağıtım (fan-out).
+
+Bir kaynak post bir kez hazırlanır (tetikleyici kontrolü, link temizleme,
+link ekleme) ve her hedef için ayrı bir gönderim işi olarak kuyruğa konur;
+hedefler birbirinden bağımsız ve paralel gönderilir, birindeki hata
+diğerlerini etkilemez. Medyalı postlarda ilk gönderimden sonra diğer
+hedefler gönderilen mesajın medyasını referans olarak kullanır.
+
+Mesaj nesneleri (medya referansları dahil) onları alan hesaba aittir; post
+gönderen hesap değişirse mesajlar yeni hesapla tekrar alınıp rebind edilir.
+"""
+from datetime import date
+from typing import List, Optional
+
+
+class FanoutPost:
+    """A source post transformed once and delivered to several targets"""
+
+    def __init__(self, source_channel: dict, messages: list, text: str, entities: list,
+                 media_type: Optional[str], targets: List, caption_index: int = 0,
+                 event_chat_id=None, event_message_id=None, remaining_posts=None,
+                 outbox_id: Optional[int] = None, delivered: int = 0, account=None,
+                 quota_date: Optional[date] = None):
+        self.source_channel = source_channel
+        # Mesajları alan ve gönderecek hesap (ClientPool)
+        self.account = account
+        self._set_messages(messages)
+        self.text = text
+        self.entities = entities
+        self.media_type = media_type
+        self.caption_index = caption_index
+        self.targets = targets
+        self.event_chat_id = event_chat_id
+        self.event_message_id = event_message_id
+        self.remaining_posts = remaining_posts
+        # Kotanın rezerve edildiği gün (hiçbir hedefe gidemezse iade bu güne)
+        self.quota_date = quota_date
+        # Kalıcı outbox satırı (yazılamadıysa None - sadece bellekte gönderilir)
+        self.outbox_id = outbox_id
+
+        # Devam ettirilen işte önceki süreçte gönderilmiş hedefler de sayılır
+        self.delivered = delivered
+        self.link_back_sent = delivered > 0
+        self._pending = len(targets)
+        # Hedef başına başarısız deneme sayısı ve son hata (posts.error_message)
+        self.attempts = {}
+        self.last_errors = {}
+
+    def _set_messages(self, messages: list):
+        self.messages = messages
+        self.message = messages[0]
+        if len(messages) > 1:
+            self.media = [m.media for m in messages]
+        else:
+            self.media = messages[0].media
+
+    def rebind(self, account, messages: list):
+        """Postu başka hesaba taşı (mesajlar o hesapla tekrar alınmış olmalı)"""
+        self.account = account
+        self._set_messages(messages)
+
+    def refresh(self, messages: list):
+        """Medya referansı süresi dolan mesajları aynı hesapla tekrar alınmışlarıyla değiştir"""
+        self._set_messages(messages)
+
+    @property
+    def has_media(self) -> bool:
+        return self.media is not None
+
+    @property
+    def is_album(self) -> bool:
+        return isinstance(self.media, list)
+
+    def use_sent_media(self, sent):
+        """Sonraki hedefler için medyayı gönderilmiş mesajdan referansla al"""
+        sent_messages = sent if isinstance(sent, list) else [sent]
+        media = [m.media for m in sent_messages]
+        if not all(media) or len(media) != (len(self.media) if self.is_album else 1):
+            return
+        self.media = media if self.is_album else media[0]
+
+    def record_failure(self, target, error: Exception) -> int:
+        """Hedefin başarısız denemesini kaydet, toplam deneme sayısını döndür"""
+        self.attempts[target] = self.attempts.get(target, 0) + 1
+        self.last_errors[target] = str(error)
+        return self.attempts[target]
+
+    def retry_note(self, target) -> Optional[str]:
+        """Tekrar denemeyle gönderildiyse kayda düşülecek not"""
+        failed = self.attempts.get(target)
+        if not failed:
+            return None
+        return f"{failed + 1}. denemede gönderildi - son hata: {self.last_errors[target]}"
+
+    def finish(self, success: bool) -> bool:
+        """Bir hedefin sonucunu kaydet; son hedefse True döner"""
+        if success:
+            self.delivered += 1
+        self._pending -= 1
+        return self._pending == 0
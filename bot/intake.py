@@ -0,0 +1,201 @@
+"""
+Sınırlı mesaj alım (intake) kuyruğu.
+
+Telethon her güncelleme için ayrı bir handler task'ı başlatır; yoğun anlarda
+(ör. yeniden bağlanma sonrası catch-up) bu task'lar sınırsız çoğalır ve
+hepsi aynı anda DB havuzuna yüklenir. Handler artık olayı sadece bu kuyruğa
+koyar; sabit sayıda worker olayları işler. Olaylar kaynak bazlı tutulur:
+aynı kaynağın mesajları sırayla, kaynaklar arası round-robin işlenir.
+
+Kuyruk dolduğunda davranış (policy):
+  block       - yer açılana kadar handler bekler (mesaj kaybı yok); bekleyen
+                handler sayısı max_blocked'a ulaşınca spill'e (spill yoksa
+                drop_oldest'a) düşülür, böylece catch-up patlamasında bekleyen
+                coroutine sayısı ve tuttukları bellek sınırlı kalır
+  drop_oldest - gelen mesajın kaynağının en eski bekleyen mesajı atılır
+  spill       - taşan mesaj kalıcı depoya yazılır, kuyruk boşalınca geri alınır
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+POLICIES = ('block', 'drop_oldest', 'spill')
+
+
+class ReplayedEvent:
+    """Kalıcı depodan geri alınan mesaj için NewMessage olayı yerine geçen nesne"""
+
+    def __init__(self, chat_id: int, message, client=None):
+        self.chat_id = chat_id
+        self.message = message
+        # Mesajı tekrar alan hesabın client'ı (NewMessage.Event.client gibi)
+        self.client = client
+
+
+class IntakeQueue:
+    """Bounded per-source event queue with a fixed worker pool and overflow policy"""
+
+    def __init__(self, handler: Callable[[object], Awaitable], maxsize: int = 1000,
+                 per_source: int = 200, workers: int = 4, policy: str = 'block',
+                 spill: Optional[Callable[[Hashable, object], Awaitable]] = None,
+                 max_blocked: int = 100,
+                 on_drop: Optional[Callable[[Hashable, object], Awaitable]] = None):
+        if policy not in POLICIES:
+            raise ValueError(f"Bilinmeyen intake policy: {policy}")
+        if policy == 'spill' and spill is None:
+            raise ValueError("spill policy için spill fonksiyonu gerekli")
+
+        self.handler = handler
+        self.maxsize = maxsize
+        self.per_source = per_source
+        self.worker_count = workers
+        self.policy = policy
+        self.spill = spill
+        # block policy'de aynı anda bekleyebilecek en fazla handler
+        self.max_blocked = max_blocked
+        # drop_oldest ile atılan olay için çağrılır (kalıcı kaydını temizlemek için)
+        self.on_drop = on_drop
+        self._blocked = 0
+        self.counters = {'accepted': 0, 'blocked': 0, 'dropped': 0, 'spilled': 0, 'replayed': 0}
+
+        self._items: Dict[Hashable, deque] = {}
+        self._size = 0
+        self._unfinished = 0
+        # İşi olan ve şu an bir worker'a atanmamış kaynaklar
+        self._ready: asyncio.Queue = asyncio.Queue()
+        self._scheduled = set()
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers = []
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def blocked(self) -> int:
+        """Yer bekleyen handler sayısı"""
+        return self._blocked
+
+    def free(self) -> int:
+        """Kuyrukta kalan boş yer"""
+        return max(0, self.maxsize - self._size)
+
+    def start(self):
+        """Worker havuzunu başlat"""
+        for i in range(self.worker_count):
+            self._workers.append(asyncio.create_task(self._worker(i)))
+
+    async def stop(self):
+        """Worker'ları durdur (bekleyen olaylar atılır)"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def join(self):
+        """Kuyruktaki tüm olaylar işlenene kadar bekle"""
+        await self._idle.wait()
+
+    def _full(self, key: Hashable) -> bool:
+        items = self._items.get(key)
+        return self._size >= self.maxsize or (items is not None and len(items) >= self.per_source)
+
+    async def put(self, key: Hashable, event, replayed: bool = False):
+        """Olayı kaynağın kuyruğuna ekle; doluysa policy'ye göre davran"""
+        dropped = None
+        if self._full(key):
+            policy = self.policy
+            if policy == 'block' and self._blocked >= self.max_blocked:
+                # Bekleyen handler sınırı doldu - bellek sınırlı kalsın
+                policy = 'spill' if self.spill is not None else 'drop_oldest'
+
+            if policy == 'block':
+                self.counters['blocked'] += 1
+                self._blocked += 1
+                try:
+                    while self._full(key):
+                        self._has_space.clear()
+                        await self._has_space.wait()
+                finally:
+                    self._blocked -= 1
+
+            elif policy == 'drop_oldest':
+                dropped = self._drop_oldest(key)
+
+            else:  # spill
+                try:
+                    await self.spill(key, event)
+                    self.counters['spilled'] += 1
+                except Exception as e:
+                    self.counters['dropped'] += 1
+                    logger.error(f"Intake taşması kaydedilemedi, mesaj atıldı ({key}): {e}")
+                return
+
+        self._items.setdefault(key, deque()).append(event)
+        self._size += 1
+        self._unfinished += 1
+        self._idle.clear()
+        self.counters['replayed' if replayed else 'accepted'] += 1
+        self._schedule(key)
+
+        # Yer açıldıktan sonra - beklerken başka olay araya girmesin
+        if dropped is not None and self.on_drop is not None:
+            try:
+                await self.on_drop(*dropped)
+            except Exception as e:
+                logger.error(f"Atılan mesaj temizlenemedi ({dropped[0]}): {e}")
+
+    def _drop_oldest(self, key: Hashable):
+        # Önce gelen mesajın kaynağından, o boşsa en kalabalık kaynaktan at
+        items = self._items.get(key)
+        if not items:
+            key = max(self._items, key=lambda k: len(self._items[k]))
+            items = self._items[key]
+        event = items.popleft()
+        self._size -= 1
+        self._task_done()
+        self.counters['dropped'] += 1
+        return key, event
+
+    def _schedule(self, key: Hashable):
+        if key not in self._scheduled:
+            self._scheduled.add(key)
+            self._ready.put_nowait(key)
+
+    def _task_done(self):
+        self._unfinished -= 1
+        if self._unfinished == 0:
+            self._idle.set()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            key = await self._ready.get()
+            items = self._items.get(key)
+            if not items:
+                self._scheduled.discard(key)
+                self._items.pop(key, None)
+                continue
+
+            event = items.popleft()
+            self._size -= 1
+            self._has_space.set()
+            try:
+                await self.handler(event)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Intake işleme hatası ({key}): {e}")
+            finally:
+                self._task_done()
+                # Aynı kaynağın sıradaki mesajı, diğer kaynaklardan sonra
+                if items:
+                    self._ready.put_nowait(key)
+                else:
+                    self._scheduled.discard(key)
+                    if self._items.get(key) is items:
+                        del self._items[key]
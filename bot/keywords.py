@@ -0,0 +1,107 @@
+"""
+Tetikleyici kelime eşleştirici.
+
+Bir kanalın virgülle ayrılmış trigger_keywords metni bir kez Aho-Corasick
+otomatına derlenir; mesaj metni, kelime sayısından bağımsız olarak tek
+geçişte taranır. Derlenmiş otomatlar keyword metnine göre cache'lenir, bu
+yüzden kanal ayarı değişmedikçe tekrar derleme yapılmaz.
+"""
+from collections import deque
+from functools import lru_cache
+from typing import List, Optional
+
+# Türkçe büyük/küçük harf katlama: I -> ı, İ -> i; ı ile i ayrı harflerdir
+# ("kır" ile "kir" eşleşmez). Python'un 'I'.lower() -> "i" ve
+# 'İ'.lower() -> "i̇" (i + birleşik nokta) sonuçları bu yüzden kullanılmaz.
+TURKISH_FOLD = str.maketrans({'I': 'ı', 'İ': 'i'})
+
+# Ayrışık yazılmış İ ("I" + U+0307, katlamadan sonra "ı" + U+0307) ve i + U+0307;
+# nokta sadece i/ı'nın ardındaysa atılır, başka harflerin üzerindeki birleşik nokta korunur
+DOTTED_I = ('\u0131\u0307', 'i\u0307')
+
+
+def fold_turkish(text: str) -> str:
+    """
+    Türkçe kurallarına uygun küçük harfe çevir.
+
+    >>> fold_turkish('İSTANBUL'), fold_turkish('I\u0307stanbul')
+    ('istanbul', 'istanbul')
+    >>> fold_turkish('KIR'), fold_turkish('kır'), fold_turkish('Kir')
+    ('kır', 'kır', 'kir')
+    >>> fold_turkish('ISPARTA') == fold_turkish('ıspartA') != fold_turkish('isparta')
+    True
+    >>> compile_keywords('kir').search('KIR'), compile_keywords('kir').search('kır')
+    (False, False)
+    >>> compile_keywords('kır').search('KIRMIZI'), compile_keywords('istanbul').search('İSTANBUL')
+    (True, True)
+    """
+    text = text.translate(TURKISH_FOLD)
+    for dotted in DOTTED_I:
+        text = text.replace(dotted, 'i')
+    return text.lower()
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over case-folded keywords"""
+
+    def __init__(self, keywords: List[str]):
+        self.keywords = keywords
+        self._goto = [{}]
+        self._fail = [0]
+        self._terminal = [False]
+
+        for keyword in keywords:
+            self._add(keyword)
+        self._build_failure_links()
+
+    def _add(self, keyword: str):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._terminal.append(False)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._terminal[state] = True
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Bir sonek de anahtar kelimeyse bu durum da eşleşme sayılır
+                if self._terminal[self._fail[next_state]]:
+                    self._terminal[next_state] = True
+
+    def search(self, text: str) -> bool:
+        """Metinde herhangi bir anahtar kelime geçiyor mu?"""
+        goto = self._goto
+        fail = self._fail
+        terminal = self._terminal
+        state = 0
+
+        for char in fold_turkish(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if terminal[state]:
+                return True
+        return False
+
+
+@lru_cache(maxsize=256)
+def compile_keywords(keywords_str: str) -> Optional[KeywordMatcher]:
+    """Virgülle ayrılmış keyword metnini derle (kelime yoksa None)"""
+    keywords = [fold_turkish(kw).strip() for kw in keywords_str.split(',')]
+    keywords = [kw for kw in keywords if kw]
+    if not keywords:
+        return None
+    return KeywordMatcher(keywords)
@@ -3,8 +3,9 @@ import re
 import logging
 import signal
 import sys
+from bisect import bisect_left, bisect_right
+from functools import partial
 from telethon import TelegramClient, events
-from telethon.sessions import StringSession
 from telethon.tl.types import (
     MessageMediaPhoto,
     MessageMediaDocument,
@@ -26,10 +27,23 @@ from telethon.errors import (
     ChatWriteForbiddenError,
     AuthKeyUnregisteredError,
     UserDeactivatedBanError,
+    FileReferenceExpiredError,
     RPCError
 )
 import config
 import database as db
+from albums import AlbumAggregator, PresetEntities
+from client_pool import ACCOUNT_ERRORS, ClientPool, PoolAccount
+from cluster import ClusterMembership
+from delivery import DeliveryQueue
+from entity_cache import EntityCache
+from fanout import FanoutPost
+from intake import IntakeQueue, ReplayedEvent
+from keywords import compile_keywords
+from media import MediaHandleCache
+from rate_limit import RateLimiter
+from retry import RetryScheduler, TransientSendError, classify_error, retry_delay
+from session_store import PersistentStringSession
 
 # Telethon'un gereksiz loglarını ÖNCE kapat (Got difference for channel X updates vs.)
 # Telethon'un gereksiz loglarını ÖNCE kapat
@@ -47,7 +61,43 @@ logger = logging.getLogger(__name__)
 
 # Global flags
 shutdown_flag = False
-client = None
+
+# Giriş yapılan hesaplar; kaynak kanallar hesaplara yapışık atanır
+pool = ClientPool(failover_after=config.ACCOUNT_FAILOVER_FLOOD_SECONDS)
+
+# Hedef bazlı gönderim kuyrukları (handler gönderimi beklemez)
+delivery = DeliveryQueue(
+    workers=config.DELIVERY_WORKERS,
+    max_per_target=config.DELIVERY_QUEUE_SIZE,
+    limiter=RateLimiter(
+        target_per_minute=config.RATE_LIMIT_TARGET_PER_MINUTE,
+        account_per_minute=config.RATE_LIMIT_ACCOUNT_PER_MINUTE
+    )
+)
+
+# Cluster modunda bu worker'ın kaynak kanal payı
+cluster = ClusterMembership(config.WORKER_ID, enabled=config.CLUSTER_MODE, lease=config.CLUSTER_LEASE)
+
+# Geçici hatayla düşen gönderimlerin zamanlayıcısı
+retries = RetryScheduler()
+
+# Bu süreçte gönderimi süren outbox satırları (kiraları periyodik yenilenir)
+outbox_inflight = set()
+
+# Intake kuyruğunda / albüm tamponunda bekleyen mesajların outbox'taki intake satırları
+# (chat_id, message_id) -> satır id; restart'ta bu satırlardan tekrar işlenir
+intake_jobs = {}
+
+# İlk hedeften sonra ertelenen hedefleri kuyruğa ekleyen task'lar
+fanout_tasks = set()
+
+# Shutdown'da boşaltmadan sonra durum yazımlarının toplam ve disconnect'lerin süresi (saniye);
+# varsayılan SHUTDOWN_DRAIN_TIMEOUT (20) ile toplam Heroku'nun 30s'lik SIGTERM süresinin altında kalır
+SHUTDOWN_STATE_TIMEOUT = 5.0
+SHUTDOWN_DISCONNECT_TIMEOUT = 3.0
+
+# Her client'ın NewMessage builder'ı (chats= filtresi kanal seti değiştikçe yenilenir)
+message_filters = []
 
 # Telegram message link pattern
 TELEGRAM_LINK_PATTERN = re.compile(
@@ -64,6 +114,9 @@ def utf16_len(text: str) -> int:
         return 0
     return len(text.encode('utf-16-le')) // 2
 
+# 3+ ardışık satır sonu (link satırları silinince oluşan boşluklar)
+MULTIPLE_BLANK_LINES_PATTERN = re.compile(r'\n{3,}')
+
 # Link entity tipleri (silinecek)
 LINK_ENTITY_TYPES = (MessageEntityTextUrl, MessageEntityUrl, MessageEntityMention)
 
@@ -75,13 +128,9 @@ FORMATTING_ENTITY_TYPES = (
 )
 
 
-def create_client():
-    """Create Telegram client with StringSession"""
-    if not config.SESSION_STRING:
-        logger.error("SESSION_STRING is required!")
-        sys.exit(1)
-
-    session = StringSession(config.SESSION_STRING)
+def create_client(session_string: str):
+    """Create Telegram client with StringSession (entity'ler Postgres'te saklanır)"""
+    session = PersistentStringSession(session_string)
 
     return TelegramClient(
         session,
@@ -93,6 +142,31 @@ def create_client():
     )
 
 
+def create_account(index: int, session_string: str) -> PoolAccount:
+    """Hesabın client'ını ve hesaba özel cache'lerini oluştur"""
+    client = create_client(session_string)
+
+    # get_entity sonuçları (link oluşturma RPC beklemesin)
+    entity_cache = EntityCache(
+        maxsize=config.ENTITY_CACHE_SIZE,
+        ttl=config.ENTITY_CACHE_TTL,
+        negative_ttl=config.ENTITY_CACHE_NEGATIVE_TTL
+    )
+    entity_cache.client = client
+
+    # Korumalı kaynak medyası: bir kez indir/yükle, handle'ı tekrar kullan
+    media_handles = MediaHandleCache(
+        maxsize=config.MEDIA_CACHE_SIZE,
+        ttl=config.MEDIA_CACHE_TTL,
+        download_streams=config.MEDIA_STREAM_DOWNLOADS,
+        upload_workers=config.MEDIA_STREAM_UPLOADS,
+        buffer_parts=config.MEDIA_STREAM_BUFFER_PARTS
+    )
+    media_handles.client = client
+
+    return PoolAccount(f"hesap {index}", client, entity_cache, media_handles)
+
+
 def remove_links_from_message(raw_text: str, entities: list) -> tuple:
     """
     Mesajdan link entity'lerini içeren SATIRLARI tamamen kaldır.
@@ -100,6 +174,10 @@ def remove_links_from_message(raw_text: str, entities: list) -> tuple:
 
     NOT: Telethon entity offset/length değerleri UTF-16 code units cinsindendir.
 
+    Satır sınırları bir kez prefix-sum olarak hesaplanır; her entity'nin
+    kestiği satır aralığı bisect ile bulunur. Toplam maliyet
+    O(N + E·log L) - satır ve entity sayısıyla çarpımsal büyümez.
+
     Args:
         raw_text: Mesajın düz metni (message.raw_text)
         entities: Mesajın entity listesi
@@ -129,46 +207,52 @@ def remove_links_from_message(raw_text: str, entities: list) -> tuple:
 
     # Satırları bul
     lines = raw_text.split('\n')
+    line_count = len(lines)
 
-    # Her satırın UTF-16 başlangıç ve bitiş pozisyonlarını hesapla
-    line_positions_utf16 = []
+    # Her satırın UTF-16 başlangıç ve bitiş pozisyonları (ikisi de artan sıralı)
+    line_starts = []
+    line_ends = []
     current_pos_utf16 = 0
     for line in lines:
-        line_len_utf16 = utf16_len(line)
-        line_end_utf16 = current_pos_utf16 + line_len_utf16
-        line_positions_utf16.append((current_pos_utf16, line_end_utf16))
-        current_pos_utf16 = line_end_utf16 + 1  # +1 for \n
-
-    # Her link entity'sinin hangi satırda olduğunu bul
-    lines_to_remove = set()
-
+        line_starts.append(current_pos_utf16)
+        current_pos_utf16 += utf16_len(line)
+        line_ends.append(current_pos_utf16)
+        current_pos_utf16 += 1  # +1 for \n
+
+    def line_range(start: int, end: int) -> tuple:
+        """[start, end] aralığıyla kesişen satırlar: first..last (kapsayıcı)"""
+        first = bisect_left(line_ends, start)        # ilk satır: bitiş >= start
+        last = bisect_right(line_starts, end) - 1    # son satır: başlangıç <= end
+        return first, last
+
+    # Link entity'lerinin kestiği satır aralıklarını fark dizisiyle işaretle
+    marks = [0] * (line_count + 1)
     for entity in link_entities:
-        link_start = entity.offset
-        link_end = entity.offset + entity.length
-
-        # Link'in hangi satır(lar)da olduğunu bul
-        for line_idx, (start, end) in enumerate(line_positions_utf16):
-            # Link bu satırla kesişiyor mu?
-            if link_start <= end and link_end >= start:
-                lines_to_remove.add(line_idx)
-
-    # Link içermeyen satırları birleştir
+        first, last = line_range(entity.offset, entity.offset + entity.length)
+        if first <= last:
+            marks[first] += 1
+            marks[last + 1] -= 1
+
+    # Silinen satırların önek sayısı ve önek UTF-16 genişliği (+1 for \n)
+    removed_before = [0] * (line_count + 1)
+    removed_width_before = [0] * (line_count + 1)
     cleaned_lines = []
+    active = 0
     for idx, line in enumerate(lines):
-        if idx not in lines_to_remove:
+        active += marks[idx]
+        removed = active > 0
+        removed_before[idx + 1] = removed_before[idx] + removed
+        removed_width_before[idx + 1] = removed_width_before[idx] + (
+            line_ends[idx] - line_starts[idx] + 1 if removed else 0
+        )
+        if not removed:
             cleaned_lines.append(line)
 
     cleaned_text = '\n'.join(cleaned_lines)
 
     # Boş satırları temizle (ardışık boş satırları tek satıra indir)
-    while '\n\n\n' in cleaned_text:
-        cleaned_text = cleaned_text.replace('\n\n\n', '\n\n')
-
-    # Silinen UTF-16 karakter sayısını hesapla
-    removed_utf16_chars = 0
-    for line_idx in sorted(lines_to_remove):
-        start, end = line_positions_utf16[line_idx]
-        removed_utf16_chars += (end - start) + 1  # +1 for \n
+    cleaned_text = MULTIPLE_BLANK_LINES_PATTERN.sub('\n\n', cleaned_text)
+    cleaned_text_utf16_len = utf16_len(cleaned_text)
 
     # Formatting entity'lerini filtrele ve güncelle
     updated_formatting = []
@@ -177,36 +261,23 @@ def remove_links_from_message(raw_text: str, entities: list) -> tuple:
         entity_end = entity.offset + entity.length
 
         # Entity silinen bir satırda mı?
-        entity_in_removed_line = False
-        for line_idx in lines_to_remove:
-            start, end = line_positions_utf16[line_idx]
-            if entity_start <= end and entity_end >= start:
-                entity_in_removed_line = True
-                break
-
-        if not entity_in_removed_line:
-            # Entity'nin offset'ini hesapla
-            # Silinen satırların UTF-16 uzunluklarını çıkar
-            adjustment = 0
-            for line_idx in sorted(lines_to_remove):
-                start, end = line_positions_utf16[line_idx]
-                line_utf16_len = (end - start) + 1  # +1 for \n
-                if start < entity_start:
-                    adjustment += line_utf16_len
-
-            new_offset = entity_start - adjustment
-            cleaned_text_utf16_len = utf16_len(cleaned_text)
-
-            if new_offset >= 0 and new_offset < cleaned_text_utf16_len:
-                try:
-                    new_entity = type(entity)(
-                        offset=new_offset,
-                        length=entity.length,
-                        **{k: v for k, v in entity.__dict__.items() if k not in ['offset', 'length']}
-                    )
-                    updated_formatting.append(new_entity)
-                except Exception:
-                    pass
+        first, last = line_range(entity_start, entity_end)
+        if first <= last and removed_before[last + 1] - removed_before[first] > 0:
+            continue
+
+        # Entity'den önce başlayan silinmiş satırların UTF-16 uzunluklarını çıkar
+        new_offset = entity_start - removed_width_before[bisect_left(line_starts, entity_start)]
+
+        if new_offset >= 0 and new_offset < cleaned_text_utf16_len:
+            try:
+                new_entity = type(entity)(
+                    offset=new_offset,
+                    length=entity.length,
+                    **{k: v for k, v in entity.__dict__.items() if k not in ['offset', 'length']}
+                )
+                updated_formatting.append(new_entity)
+            except Exception:
+                pass
 
     return cleaned_text.strip(), updated_formatting
 
@@ -258,72 +329,152 @@ def append_link_to_text(text: str, link: str, link_text: str = None) -> tuple:
     return new_text, entities
 
 
-async def parse_telegram_link(link: str) -> tuple:
-    """Telegram mesaj linkini parse et ve (chat_id, message_id) döndür"""
-    match = TELEGRAM_LINK_PATTERN.search(link)
-    if not match:
-        return None, None
+def build_message_link(account: PoolAccount, chat_id, message_id: int, scheme: str = '') -> str:
+    """
+    Mesaj linki oluştur.
+    Username entity cache'te varsa kullanılır, yoksa ID tabanlı link döner
+    (cache arka planda doldurulur, RPC beklenmez).
+    """
+    session = account.client.session
+    if isinstance(session, PersistentStringSession) and session.has_entity(chat_id):
+        # Kalıcı depodan - restart sonrası da RPC gerekmez
+        username = session.get_username(chat_id)
+    else:
+        username = getattr(account.entity_cache.peek(chat_id), 'username', None)
+
+    if username:
+        return f"{scheme}t.me/{username}/{message_id}"
+    elif str(chat_id).startswith('-100'):
+        return f"{scheme}t.me/c/{str(chat_id)[4:]}/{message_id}"
+    else:
+        return f"{scheme}t.me/{chat_id}/{message_id}"
 
+
+async def prewarm_entity_cache(account: PoolAccount):
+    """Aktif kaynak ve hedef sohbetlerin entity'lerini önceden çözümle"""
+    # Yedek hesap olarak devralabileceği için her hesap tüm kanalları tanısın
+    peers = []
+    for channel in db.get_cached_source_channels():
+        peers.append(channel['source_chat_id'])
+        peers.extend(db.get_channel_targets(channel))
+
+    # Access hash'i depoda olanlar için RPC yapma
+    peers = [peer for peer in peers if not account.client.session.has_entity(peer)]
+    if not peers:
+        return
+
+    try:
+        await account.entity_cache.prewarm(peers)
+    except Exception as e:
+        logger.warning(f"Entity cache ön yükleme başarısız ({account.name}): {e}")
+
+
+async def load_entity_store(account: PoolAccount):
+    """Kayıtlı session entity'lerini (access hash, username) toplu yükle"""
+    if account.account_id is None:
+        return
+    try:
+        rows = await db.get_telegram_entities(account.account_id)
+        account.client.session.load_entities(rows)
+        logger.info(f"🗂️ {len(rows)} entity depodan yüklendi ({account.name})")
+    except Exception as e:
+        logger.warning(f"Entity deposu yüklenemedi ({account.name}): {e}")
+
+
+async def flush_entity_store():
+    """Tüm hesapların yeni görülen entity'lerini veritabanına yaz"""
+    for account in pool:
+        if account.account_id is None:
+            continue
+        rows = account.client.session.take_dirty_entities()
+        if not rows:
+            continue
+        try:
+            await db.save_telegram_entities(account.account_id, rows)
+        except Exception as e:
+            account.client.session.restore_dirty_entities(rows)
+            logger.warning(f"Entity deposu kaydedilemedi ({account.name}): {e}")
+
+
+def parse_link_match(match) -> tuple:
+    """TELEGRAM_LINK_PATTERN eşleşmesinden (chat_id, message_id) döndür"""
     chat_identifier = match.group(1)
     message_id = int(match.group(2))
 
     if chat_identifier.isdigit():
         chat_id = int(f"-100{chat_identifier}")
     else:
-        chat_id = chat_identifier
+        chat_id = chat_identifier.lower()
 
     return chat_id, message_id
 
 
+async def parse_telegram_link(link: str) -> tuple:
+    """Telegram mesaj linkini parse et ve (chat_id, message_id) döndür"""
+    match = TELEGRAM_LINK_PATTERN.search(link)
+    if not match:
+        return None, None
+
+    return parse_link_match(match)
+
+
 def check_trigger_keywords(text: str, keywords_str: str) -> bool:
-    """Mesajda trigger keyword var mı kontrol et"""
+    """Mesajda trigger keyword var mı kontrol et (derlenmiş Aho-Corasick otomatı ile)"""
     if not keywords_str or not keywords_str.strip():
         return True
 
     if not text:
         return False
 
-    text_lower = text.lower()
-    keywords = [kw.strip().lower() for kw in keywords_str.split(',') if kw.strip()]
-
-    if not keywords:
+    matcher = compile_keywords(keywords_str)
+    if matcher is None:
         return True
 
-    for keyword in keywords:
-        if keyword in text_lower:
-            return True
+    return matcher.search(text)
+
 
-    return False
+def parse_target_chat_id(target_chat_id_raw):
+    """target_chat_id'yi integer'a çevir (string olabilir; @username gibi ise öyle kalır)"""
+    try:
+        return int(target_chat_id_raw)
+    except (ValueError, TypeError):
+        return target_chat_id_raw
 
 
-async def forward_message(source_channel_config: dict, message, source_event_chat_id=None, source_event_message_id=None):
-    """Mesajı hedef kanala işleyerek gönder"""
-    global client
+def prepare_post(source_channel_config: dict, message, source_event_chat_id=None, source_event_message_id=None,
+                 remaining_posts=None, outbox_id=None, done_targets=(), account=None, quota_date=None):
+    """
+    Mesajı tüm hedefler için bir kez işle (tetikleyici, link temizleme, link ekleme).
+
+    message: tek mesaj ya da albüm parçalarının listesi (tek gönderim, tek kayıt).
+    remaining_posts: reserve_daily_quota'dan dönen kalan hak (send_link_back mesajı için).
+    done_targets: devam ettirilen outbox işinde zaten gönderilmiş hedefler (atlanır).
+    account: mesajları alan hesap (gönderim de bu hesapla yapılır).
+    quota_date: kotanın rezerve edildiği gün (gönderilemezse iade o güne yapılır).
+    Gönderilmeyecekse None döner.
+    """
+    # Albümde kayıt ve linkler için ilk parça, metin için caption'lı parça kullanılır
+    messages = message if isinstance(message, list) else [message]
+    message = messages[0]
+    caption_message = next((m for m in messages if m.raw_text), message)
 
     try:
-        # target_chat_id'yi integer'a çevir (string olabilir)
-        target_chat_id_raw = source_channel_config['target_chat_id']
-        try:
-            target_chat_id = int(target_chat_id_raw)
-        except (ValueError, TypeError):
-            target_chat_id = target_chat_id_raw  # String ise öyle kalsın (@username gibi)
         append_link = source_channel_config['append_link']
         append_link_text = source_channel_config.get('append_link_text', '')
         remove_links = source_channel_config['remove_links']
         trigger_keywords = source_channel_config.get('trigger_keywords', '')
-        send_link_back = source_channel_config.get('send_link_back', False)
 
         # Orijinal metin ve entity'leri al
         # ÖNEMLİ: raw_text kullan, text değil!
-        original_text = message.raw_text or ''
-        original_entities = list(message.entities) if message.entities else []
+        original_text = caption_message.raw_text or ''
+        original_entities = list(caption_message.entities) if caption_message.entities else []
 
         # Media için caption - Telethon'da caption zaten raw_text içinde
         # Ayrıca entities de message.entities içinde (caption için de)
 
         # Trigger keywords kontrolü
         if not check_trigger_keywords(original_text, trigger_keywords):
-            return False
+            return None
 
         # Link kaldırma işlemi
         if remove_links:
@@ -341,10 +492,10 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
                 final_entities = final_entities + link_entities
 
         # Media kontrolü
-        has_media = message.media is not None
         media_type = None
-
-        if has_media:
+        if len(messages) > 1:
+            media_type = 'album'
+        elif message.media is not None:
             if isinstance(message.media, MessageMediaPhoto):
                 media_type = 'photo'
             elif isinstance(message.media, MessageMediaDocument):
@@ -352,20 +503,84 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
             else:
                 media_type = 'other'
 
+        # target_chat_id'leri integer'a çevir (string olabilir)
+        targets = []
+        for target_chat_id_raw in db.get_channel_targets(source_channel_config):
+            target_chat_id = parse_target_chat_id(target_chat_id_raw)
+            if target_chat_id not in done_targets:
+                targets.append(target_chat_id)
+
+        return FanoutPost(
+            source_channel_config, messages, final_text, final_entities, media_type, targets,
+            caption_index=messages.index(caption_message),
+            event_chat_id=source_event_chat_id,
+            event_message_id=source_event_message_id,
+            remaining_posts=remaining_posts,
+            outbox_id=outbox_id,
+            delivered=len(done_targets),
+            account=account,
+            quota_date=quota_date
+        )
+
+    except Exception as e:
+        logger.error(f"❌ Mesaj hazırlanamadı: {e}")
+        return None
+
+
+def target_title_of(post: FanoutPost, target_chat_id) -> str:
+    """Log için hedef adı (ek hedeflerin başlığı cache'te yok)"""
+    if target_chat_id == post.targets[0]:
+        return post.source_channel.get('target_title') or str(target_chat_id)
+    return str(target_chat_id)
+
+
+async def forward_message(post: FanoutPost, target_chat_id):
+    """
+    Hazırlanmış postu tek bir hedefe gönder.
+    Başarılıysa gönderilen mesajı (albümde liste) döndürür, değilse None.
+    """
+    # Post, mesajlarını alan hesapla gönderilir
+    client = post.account.client
+    media_handles = post.account.media_handles
+
+    source_channel_config = post.source_channel
+    message = post.message
+    final_text = post.text
+    final_entities = post.entities
+
+    try:
+        media = post.media
+        if post.has_media and any(MediaHandleCache.is_restricted(m) for m in post.messages):
+            # Korumalı kaynak referansla gönderilemez - indirilip yüklenmiş handle kullanılır
+            handles = await asyncio.gather(*(media_handles.resolve(m) for m in post.messages))
+            media = list(handles) if post.is_album else handles[0]
+
         # Mesajı gönder
         # ÖNEMLİ: parse_mode=None ve formatting_entities kullan
         # Bu sayede metin olduğu gibi gönderilir, markdown parse edilmez
 
-        if has_media:
-            sent_message = await client.send_file(
+        if post.is_album:
+            # Albüm: tek send_file çağrısı, caption asıl parçada kalır
+            # (albümlerde formatting_entities desteklenmediği için PresetEntities)
+            captions = [''] * len(media)
+            captions[post.caption_index] = final_text
+            sent = await client.send_file(
                 entity=target_chat_id,
-                file=message.media,
+                file=media,
+                caption=captions,
+                parse_mode=PresetEntities(final_text, final_entities)
+            )
+            sent_message = sent[0]
+        elif post.has_media:
+            sent = sent_message = await client.send_file(
+                entity=target_chat_id,
+                file=media,
                 caption=final_text if final_text else None,
                 formatting_entities=final_entities if final_entities else None,
                 parse_mode=None  # Markdown/HTML parse YAPMA
             )
         else:
-            sent_message = await client.send_message(
+            sent = sent_message = await client.send_message(
                 entity=target_chat_id,
                 message=final_text,
                 formatting_entities=final_entities if final_entities else None,
@@ -373,42 +588,13 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
                 link_preview=False
             )
 
-        # Source link oluştur
+        # Source/target link oluştur (sadece cache'ten - RPC beklemez)
         source_chat_id = message.chat_id
-        try:
-            source_entity = await client.get_entity(source_chat_id)
-            source_username = getattr(source_entity, 'username', None)
-            if source_username:
-                source_link = f"t.me/{source_username}/{message.id}"
-            elif str(source_chat_id).startswith('-100'):
-                source_link = f"t.me/c/{str(source_chat_id)[4:]}/{message.id}"
-            else:
-                source_link = f"t.me/{source_chat_id}/{message.id}"
-        except Exception:
-            if str(source_chat_id).startswith('-100'):
-                source_link = f"t.me/c/{str(source_chat_id)[4:]}/{message.id}"
-            else:
-                source_link = f"t.me/{source_chat_id}/{message.id}"
-
-        # Target link oluştur
-        target_link = None
-        try:
-            target_entity = await client.get_entity(target_chat_id)
-            target_username = getattr(target_entity, 'username', None)
-            if target_username:
-                target_link = f"https://t.me/{target_username}/{sent_message.id}"
-            elif str(target_chat_id).startswith('-100'):
-                target_link = f"https://t.me/c/{str(target_chat_id)[4:]}/{sent_message.id}"
-            else:
-                target_link = f"https://t.me/{target_chat_id}/{sent_message.id}"
-        except Exception:
-            if str(target_chat_id).startswith('-100'):
-                target_link = f"https://t.me/c/{str(target_chat_id)[4:]}/{sent_message.id}"
-            else:
-                target_link = f"https://t.me/{target_chat_id}/{sent_message.id}"
+        source_link = build_message_link(post.account, source_chat_id, message.id)
+        target_link = build_message_link(post.account, target_chat_id, sent_message.id, scheme='https://')
 
-        # Database'e kaydet
-        await db.add_post(
+        # Database'e kaydet (toplu yazım tamponu)
+        db.queue_post(
             source_channel_id=source_channel_config['id'],
             source_link=source_link,
             source_chat_id=source_chat_id,
@@ -416,55 +602,63 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
             target_chat_id=target_chat_id,
             target_message_id=sent_message.id,
             message_text=final_text[:500] if final_text else None,
-            has_media=has_media,
-            media_type=media_type,
-            status='success'
+            has_media=post.has_media,
+            media_type=post.media_type,
+            status='success',
+            error_message=post.retry_note(target_chat_id)
         )
 
-        # Send link back (mesaj bağlantısı + kalan post hakkı) - DB kaydından sonra - REPLY olarak
-        if send_link_back and source_event_chat_id and target_link:
+        # Send link back (mesaj bağlantısı + kalan post hakkı) - ilk başarılı hedef için bir kez - REPLY olarak
+        send_link_back = source_channel_config.get('send_link_back', False)
+        if send_link_back and post.event_chat_id and target_link and not post.link_back_sent:
+            post.link_back_sent = True
             try:
-                # Kalan post hakkını hesapla (DB'ye kaydedildikten sonra doğru değer)
-                remaining_posts = await db.get_remaining_posts_today(source_channel_config['id'])
+                # Kalan post hakkı rezervasyondan geliyor, yoksa DB'den hesapla
+                remaining_posts = post.remaining_posts
+                if remaining_posts is None:
+                    remaining_posts = await db.get_remaining_posts_today(source_channel_config['id'])
 
                 # Geri bildirim mesajı oluştur (link_preview kapalı)
                 feedback_message = f"✅ Post gönderildi!\n{target_link}\n📊 Kalan Post Hakkınız: {remaining_posts}"
 
                 await client.send_message(
-                    source_event_chat_id,
+                    post.event_chat_id,
                     feedback_message,
-                    reply_to=source_event_message_id,
+                    reply_to=post.event_message_id,
                     link_preview=False
                 )
             except Exception:
                 pass
 
         logger.info(f"✅ {message.id} -> {target_link}")
-        return True
-
-    except FloodWaitError as e:
-        logger.warning(f"⏳ Flood wait: {e.seconds}s bekleniyor...")
-        await asyncio.sleep(e.seconds)
-        return False
-
-    except ChatWriteForbiddenError:
-        logger.error(f"❌ Hedefe yazılamıyor: {source_channel_config.get('target_title', target_chat_id)}")
-        await db.add_post(
-            source_channel_id=source_channel_config['id'],
-            source_link=f"t.me/{message.chat_id}/{message.id}",
-            source_chat_id=message.chat_id,
-            source_message_id=message.id,
-            target_chat_id=target_chat_id,
-            target_message_id=0,
-            status='failed',
-            has_media=False
+        return sent
+
+    except (FloodWaitError, *ACCOUNT_ERRORS):
+        # Gönderim kuyruğu işi erteleyip tekrar dener (mesaj düşürülmez),
+        # hesap hataları deliver_message'da başka hesaba aktarılır
+        raise
+
+    except FileReferenceExpiredError as e:
+        # Cache'teki handle ve mesajların kendi medya referansları eskimiş - tekrar
+        # denemede korumalı medya yeniden yüklenir, diğerleri taze mesajla gönderilir
+        media_handles.invalidate(post.messages)
+        logger.warning(f"⚠️ Medya referansının süresi dolmuş: {message.id} -> {target_chat_id}")
+        messages = await fetch_linked_messages(
+            post.account, post.message.chat_id, [m.id for m in post.messages]
         )
-        return False
+        if all(messages):
+            post.refresh(messages)
+        raise classify_error(e) from e
+
+    except ChatWriteForbiddenError as e:
+        logger.error(f"❌ Hedefe yazılamıyor: {target_title_of(post, target_chat_id)}")
+        record_failed_post(post, target_chat_id, f"{type(e).__name__}: {e}")
+        return None
 
     except RPCError as e:
         # Medya gönderme izni hatalarını yakala (403 CHAT_SEND_PHOTOS_FORBIDDEN, CHAT_SEND_MEDIA_FORBIDDEN vb.)
         if e.code == 403 and 'FORBIDDEN' in str(e.message).upper():
-            logger.error(f"❌ Hedefe medya gönderilemedi (izin yok): {source_channel_config.get('target_title', target_chat_id)} - {e.message}")
+            logger.error(f"❌ Hedefe medya gönderilemedi (izin yok): {target_title_of(post, target_chat_id)} - {e.message}")
             # Media olmadan sadece text olarak göndermeyi dene
             try:
                 if final_text:
@@ -478,7 +672,7 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
                     logger.info(f"📝 Medya yerine sadece metin gönderildi: {target_chat_id}")
             except Exception:
                 pass
-            await db.add_post(
+            db.queue_post(
                 source_channel_id=source_channel_config['id'],
                 source_link=f"t.me/{message.chat_id}/{message.id}",
                 source_chat_id=message.chat_id,
@@ -486,128 +680,710 @@ async def forward_message(source_channel_config: dict, message, source_event_cha
                 target_chat_id=target_chat_id,
                 target_message_id=0,
                 status='media_forbidden',
-                has_media=True
+                has_media=True,
+                error_message=f"{type(e).__name__}: {e.message}"
             )
-            return False
-        else:
-            logger.error(f"❌ RPC hatası: {e}")
-            return False
+            return None
+        transient = classify_error(e)
+        if transient is not None:
+            raise transient from e
+        logger.error(f"❌ RPC hatası: {e}")
+        record_failed_post(post, target_chat_id, f"{type(e).__name__}: {e}")
+        return None
 
     except Exception as e:
+        transient = classify_error(e)
+        if transient is not None:
+            raise transient from e
         logger.error(f"❌ Forward hatası: {e}")
+        record_failed_post(post, target_chat_id, f"{type(e).__name__}: {e}")
+        return None
+
+
+def record_failed_post(post: FanoutPost, target_chat_id, error_message: str):
+    """Hedefe gönderilemeyen postu hata mesajıyla kaydet"""
+    message = post.message
+    db.queue_post(
+        source_channel_id=post.source_channel['id'],
+        source_link=f"t.me/{message.chat_id}/{message.id}",
+        source_chat_id=message.chat_id,
+        source_message_id=message.id,
+        target_chat_id=target_chat_id,
+        target_message_id=0,
+        status='failed',
+        has_media=False,
+        error_message=error_message
+    )
+
+
+async def failover_post(post: FanoutPost) -> bool:
+    """
+    Gönderen hesabı kullanılamayan postu kanalın yeni hesabına taşı.
+    Mesajlar yeni hesapla tekrar alınır (medya referansları hesaba özeldir).
+    """
+    account = pool.route(post.source_channel['id'])
+    if account is None or not account.available:
+        return False
+    if account is post.account:
+        return True
+
+    messages = await fetch_linked_messages(account, post.message.chat_id, [m.id for m in post.messages])
+    if not all(messages):
+        logger.warning(f"⚠️ Post {account.name} hesabına taşınamadı (mesajlar alınamadı): {post.message.id}")
+        return False
+
+    # Aynı postun başka bir hedef işi bu arada taşımış olabilir
+    if post.account is not account:
+        logger.info(f"🔀 {post.message.id} {post.account.name} -> {account.name}")
+        post.rebind(account, messages)
+    return True
+
+
+def defer_for_account(post: FanoutPost, target_chat_id) -> bool:
+    """Post taşınamadı: FloodWait'teki hesabın açılmasını bekle; bekleyecek hesap yoksa kaydet ve False döndür"""
+    account = post.account
+    if account.banned:
+        account = pool.route(post.source_channel['id'])
+    if account is None or account.available:
+        # Hesap kalmadı ya da mesajlar açık hesapla alınamadı - beklemek işe yaramaz
+        logger.error(f"❌ {target_chat_id} gönderilemedi: {post.account.name} kullanılamıyor, post taşınamadı")
+        record_failed_post(post, target_chat_id, f"{post.account.name} kullanılamıyor, post başka hesaba taşınamadı")
+        return False
+
+    retries.schedule(account.blocked_for, partial(enqueue_targets, post, [target_chat_id]))
+    return True
+
+
+def schedule_retry(post: FanoutPost, target_chat_id, error: TransientSendError) -> bool:
+    """Geçici hatayı politikaya göre ertele; deneme hakkı bittiyse kaydet ve False döndür"""
+    attempt = post.record_failure(target_chat_id, error)
+    delay = retry_delay(error, attempt)
+
+    if delay is None:
+        logger.error(f"❌ {target_chat_id} gönderimi {attempt} denemede başarısız: {error}")
+        record_failed_post(post, target_chat_id, f"{attempt} deneme sonrası başarısız - son hata: {error}")
         return False
 
+    logger.warning(f"🔁 {target_chat_id} gönderimi {delay:.0f}s sonra tekrar denenecek ({attempt}. hata): {error}")
+    retries.schedule(delay, partial(enqueue_targets, post, [target_chat_id]))
+    return True
 
-async def handle_telegram_link(event, link: str):
-    """Telegram mesaj linkini işle - mesajı al ve forward et"""
-    global client
 
+async def deliver_message(post: FanoutPost, target_chat_id, deferred_targets=()):
+    """
+    Kuyruktan çalışan tek hedef gönderim işi.
+    Ertelenen hedefler bu gönderimden sonra (medya referansıyla) kuyruğa alınır;
+    geçici hatalar RetryScheduler ile ertelenir, hiçbir hedefe gönderilemezse
+    rezerve edilen kota iade edilir. Gönderen hesap uzun FloodWait alırsa ya da
+    banlanırsa iş kanalın yeni hesabına taşınır.
+    """
+    retrying = False
+    sent = None
+    if not post.account.available and not await failover_post(post):
+        retrying = defer_for_account(post, target_chat_id)
+    else:
+        try:
+            sent = await forward_message(post, target_chat_id)
+        except TransientSendError as e:
+            retrying = schedule_retry(post, target_chat_id, e)
+        except FloodWaitError as e:
+            if not pool.on_flood_wait(post.account, e.seconds):
+                # Kısa bekleme: kuyruk hedefi bloklayıp aynı hesapla tekrar dener
+                raise
+            # Hesap devre dışı - iş hemen tekrar kuyruğa girer ve başka hesaba taşınır
+            retries.schedule(0, partial(enqueue_targets, post, [target_chat_id]))
+            retrying = True
+        except ACCOUNT_ERRORS as e:
+            pool.on_banned(post.account, e)
+            retries.schedule(0, partial(enqueue_targets, post, [target_chat_id]))
+            retrying = True
+
+    if sent is not None and post.outbox_id is not None:
+        try:
+            await db.mark_outbox_target_done(post.outbox_id, target_chat_id)
+        except Exception as e:
+            logger.warning(f"Outbox hedefi işaretlenemedi ({post.outbox_id}): {e}")
+
+    if deferred_targets:
+        if sent is not None:
+            post.use_sent_media(sent)
+        # Worker'ı dolu bir hedef kuyruğunda bekletmemek için ayrı task'ta kuyruğa al
+        # (ilk hedef tekrar denenecekse diğerleri onu beklemez)
+        task = asyncio.create_task(enqueue_targets(post, deferred_targets))
+        fanout_tasks.add(task)
+        task.add_done_callback(fanout_tasks.discard)
+
+    if retrying:
+        # Hedef henüz sonuçlanmadı - kota ve outbox satırı korunur
+        return False
+
+    if post.finish(sent is not None):
+        if not post.delivered:
+            await db.release_daily_quota(post.source_channel['id'], day=post.quota_date)
+        await finish_outbox(post.outbox_id)
+    return sent is not None
+
+
+async def finish_outbox(outbox_id):
+    """Tüm hedefleri biten işin outbox satırını sil"""
+    if outbox_id is None:
+        return
+    outbox_inflight.discard(outbox_id)
     try:
-        chat_id, message_id = await parse_telegram_link(link)
+        await db.complete_outbox(outbox_id)
+    except Exception as e:
+        # Satır kalırsa kira süresi dolunca tekrar alınır, gönderilmiş hedefler atlanır
+        logger.warning(f"Outbox satırı kapatılamadı ({outbox_id}): {e}")
 
-        if not chat_id or not message_id:
-            logger.warning(f"❌ Link parse edilemedi: {link}")
-            return
 
+def take_intake_jobs(events) -> list:
+    """Olayların intake satırlarını devral (satırı devralan aşama kapatır)"""
+    job_ids = []
+    for event in events:
+        job_id = intake_jobs.pop((event.chat_id, event.message.id), None)
+        if job_id is not None:
+            job_ids.append(job_id)
+    return job_ids
+
+
+async def release_intake(events):
+    """Post üretmeden biten olayların (filtre, limit, hata) intake satırlarını sil"""
+    for job_id in take_intake_jobs(events):
         try:
-            if isinstance(chat_id, str):
-                entity = await client.get_entity(chat_id)
-                message = await client.get_messages(entity, ids=message_id)
-            else:
-                message = await client.get_messages(chat_id, ids=message_id)
+            await db.complete_outbox(job_id)
         except Exception as e:
-            logger.warning(f"❌ Mesaj alınamadı ({link}): {e}")
+            # Satır kalırsa kira süresi dolunca mesaj tekrar işlenir
+            logger.warning(f"Intake satırı kapatılamadı ({job_id}): {e}")
+
+
+def sending_account(post: FanoutPost) -> PoolAccount:
+    """Postu şu an gönderecek hesap (hız bütçesi anahtarı) - kullanılamıyorsa taşınacağı hesap"""
+    if post.account.available:
+        return post.account
+    return pool.route(post.source_channel['id']) or post.account
+
+
+async def enqueue_targets(post: FanoutPost, targets, deferred_targets=()):
+    """Postu verilen hedeflerin gönderim kuyruklarına, kaynağın şeridine ekle"""
+    source_channel = post.source_channel
+    for target_chat_id in targets:
+        job = partial(deliver_message, post, target_chat_id, deferred_targets)
+        await delivery.put(
+            target_chat_id, job,
+            lane=source_channel['id'],
+            priority=source_channel.get('priority') or 0,
+            weight=source_channel.get('weight') or 1,
+            account=partial(sending_account, post)
+        )
+
+
+def prune_delivery_lanes():
+    """Kaldırılan kaynak/hedef çiftlerinin boşalmış gönderim şeritlerini at"""
+    routes = {}
+    for channel in db.get_cached_source_channels():
+        for target_chat_id in db.get_channel_targets(channel):
+            routes.setdefault(parse_target_chat_id(target_chat_id), set()).add(channel['id'])
+    dropped = delivery.prune(routes)
+    if dropped:
+        logger.debug(f"{dropped} boş gönderim şeridi kaldırıldı")
+
+
+async def drain_delivery():
+    """Gönderim kuyruklarını boşalt (ilk hedeften sonra eklenen fan-out hedefleri dahil)"""
+    await delivery.join()
+    if fanout_tasks:
+        await asyncio.gather(*fanout_tasks, return_exceptions=True)
+    # Ertelenen hedef işleri yeni hedef eklemez, ikinci tur yeterli
+    await delivery.join()
+
+
+async def enqueue_forward(source_channel_config: dict, posts: list, event, quota_date=None, intake_events=None):
+    """
+    Postları outbox'a yazıp tüm hedeflerin gönderim kuyruklarına ekle.
+    posts: (mesaj ya da albüm listesi, kalan hak) çiftleri. Kaynak olayların
+    intake satırları aynı transaction'da silinir, mesaj iki kez işlenmez.
+    """
+    posts = [(message if isinstance(message, list) else [message], remaining) for message, remaining in posts]
+    # Mesajı alan hesap gönderir
+    account = pool.account_of(event.client)
+    intake_job_ids = take_intake_jobs(intake_events if intake_events is not None else [event])
+
+    # Süreç gönderim bitmeden kapanırsa iş bu satırlardan devam ettirilir
+    outbox_ids = [None] * len(posts)
+    try:
+        outbox_ids = await db.insert_outbox_jobs([
+            {
+                'source_channel_id': source_channel_config['id'],
+                'message_chat_id': messages[0].chat_id,
+                'message_ids': [m.id for m in messages],
+                'event_chat_id': event.chat_id,
+                'event_message_id': event.message.id,
+                'remaining_posts': remaining_posts,
+                'quota_date': quota_date,
+            }
+            for messages, remaining_posts in posts
+        ], config.WORKER_ID, intake_job_ids)
+    except Exception as e:
+        logger.warning(f"Outbox'a yazılamadı, sadece bellekten gönderilecek: {e}")
+        # Intake satırları kalırsa mesaj kira dolunca ikinci kez işlenir
+        for job_id in intake_job_ids:
+            try:
+                await db.complete_outbox(job_id)
+            except Exception:
+                pass
+
+    for (messages, remaining_posts), outbox_id in zip(posts, outbox_ids):
+        await dispatch_post(
+            source_channel_config, messages, event.chat_id, event.message.id, remaining_posts, outbox_id,
+            account=account, quota_date=quota_date
+        )
+
+
+async def dispatch_post(source_channel_config: dict, messages: list, event_chat_id, event_message_id,
+                        remaining_posts, outbox_id=None, done_targets=(), account=None, quota_date=None):
+    """Postu bir kez işleyip kalan hedeflerin gönderim kuyruklarına ekle"""
+    if outbox_id is not None:
+        outbox_inflight.add(outbox_id)
+
+    post = prepare_post(
+        source_channel_config, messages, event_chat_id, event_message_id,
+        remaining_posts, outbox_id=outbox_id, done_targets=done_targets, account=account,
+        quota_date=quota_date
+    )
+    if post is None:
+        if not done_targets:
+            await db.release_daily_quota(source_channel_config['id'], day=quota_date)
+        await finish_outbox(outbox_id)
+        return
+
+    if not post.targets:
+        # Devam ettirilen işin tüm hedefleri zaten gönderilmiş
+        await finish_outbox(outbox_id)
+        return
+
+    first, rest = post.targets[:1], post.targets[1:]
+    if post.has_media and rest:
+        # Medya önce ilk hedefe gider, diğer hedefler gönderilen medyayı referansla kullanır
+        await enqueue_targets(post, first, deferred_targets=rest)
+    else:
+        await enqueue_targets(post, post.targets)
+
+
+async def resume_outbox_jobs(rows: list):
+    """Sahipsiz outbox satırlarının mesajlarını kanalın hesabıyla toplu alıp gönderime devam et"""
+    accounts = {row['id']: pool.route(row['source_channel_id']) for row in rows}
+
+    by_chat = {}
+    for row in rows:
+        account = accounts[row['id']]
+        if account is not None:
+            by_chat.setdefault((account, row['message_chat_id']), []).extend(row['message_ids'])
+
+    fetched = {}
+    for (account, chat_id), message_ids in by_chat.items():
+        messages = await fetch_linked_messages(account, chat_id, message_ids)
+        for message_id, message in zip(message_ids, messages):
+            fetched[(account, chat_id, message_id)] = message
+
+    for row in rows:
+        account = accounts[row['id']]
+        if account is None:
+            # Kullanılabilir hesap yok - kira dolunca tekrar alınır
+            continue
+
+        source_channel = db.get_cached_source_channel_by_id(row['source_channel_id'])
+        messages = [fetched.get((account, row['message_chat_id'], message_id)) for message_id in row['message_ids']]
+        messages = [message for message in messages if message]
+        done_targets = tuple(row['done_targets'] or ())
+
+        if row['stage'] == 'intake':
+            # Alım aşamasında kalmış mesaj - filtre, albüm ve kota adımlarından tekrar geçer
+            key = (row['message_chat_id'], row['message_ids'][0])
+            if key in intake_jobs:
+                # Kira dolmuş ama mesaj bu süreçte hâlâ işleniyor - satırı o iş kapatır;
+                # aynı mesajın ikinci bir satırıysa işlenen satır mesajı zaten koruyor
+                if intake_jobs[key] != row['id']:
+                    await finish_outbox(row['id'])
+                continue
+            if not source_channel or not messages:
+                await finish_outbox(row['id'])
+                continue
+            intake_jobs[key] = row['id']
+            await intake.put(key[0], ReplayedEvent(key[0], messages[0], account.client), replayed=True)
+            continue
+
+        if not source_channel or not messages:
+            logger.warning(f"⚠️ Outbox işi devam ettirilemedi (kanal pasif ya da mesaj silinmiş): {row['id']}")
+            if source_channel and not done_targets:
+                await db.release_daily_quota(source_channel['id'], day=row['quota_date'])
+            await finish_outbox(row['id'])
+            continue
+
+        logger.info(f"♻️ Outbox işi devam ediyor: {row['id']} ({len(done_targets)} hedef gönderilmiş)")
+        await dispatch_post(
+            source_channel, messages, row['event_chat_id'], row['event_message_id'],
+            row['remaining_posts'], outbox_id=row['id'], done_targets=done_targets, account=account,
+            quota_date=row['quota_date']
+        )
+
+
+async def outbox_dispatcher():
+    """Kendi outbox işlerimizin kirasını yenile, sahipsiz kalan işleri (çöken süreçler) devral"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        try:
+            claimed = list(outbox_inflight) + list(intake_jobs.values())
+            if claimed:
+                await db.renew_outbox_claims(config.WORKER_ID, claimed)
+
+            # Gönderim ya da intake kuyruğu doluyken yeni iş alma
+            if delivery.pending() < config.DELIVERY_QUEUE_SIZE and intake.free() >= config.OUTBOX_CLAIM_BATCH:
+                rows = await db.claim_outbox(
+                    config.WORKER_ID, config.OUTBOX_LEASE, config.OUTBOX_CLAIM_BATCH,
+                    source_channel_ids=cluster.owned_ids()
+                )
+                if rows:
+                    await resume_outbox_jobs(rows)
+        except Exception as e:
+            logger.error(f"Outbox dispatcher error: {e}")
+
+        await asyncio.sleep(config.OUTBOX_POLL_INTERVAL)
+
+
+async def handle_album(events: list):
+    """Birleştirilen albüm parçalarını tek post olarak kuyruğa ekle"""
+    try:
+        await forward_album(sorted(events, key=lambda e: e.message.id))
+    finally:
+        # Post üretilmediyse parçaların intake satırları
+        await release_intake(events)
+
+
+async def forward_album(events: list):
+    """Sıralı albüm parçalarını filtre ve kotadan geçirip outbox'a yaz"""
+    event = events[0]
+
+    source_channel = db.get_cached_source_channel(event.chat_id)
+    if not source_channel:
+        return
+
+    messages = [e.message for e in events]
+    caption = next((m.raw_text for m in messages if m.raw_text), '')
+    if not check_trigger_keywords(caption, source_channel.get('trigger_keywords', '')):
+        return
+
+    # Albüm tek kota hakkı kullanır
+    granted, remaining, quota_date = await db.reserve_daily_quota(source_channel['id'])
+    if not granted:
+        await notify_limit_reached(event, source_channel)
+        return
+
+    logger.info(f"📤 Albüm iletiliyor ({len(messages)} parça): {source_channel.get('source_title', event.chat_id)}")
+    await enqueue_forward(source_channel, [(messages, remaining)], event, quota_date, intake_events=events)
+
+
+# grouped_id parçalarını birleştirip handle_album'e verir
+album_aggregator = AlbumAggregator(config.ALBUM_WINDOW, handle_album)
+
+
+async def notify_limit_reached(event, source_channel: dict):
+    """Günlük limit dolduğunda (send_link_back açıksa) kaynağa bilgi ver"""
+    logger.info(f"⚠️ Günlük limit doldu: {source_channel.get('source_title', event.chat_id)}")
+    if source_channel.get('send_link_back', False):
+        try:
+            await event.client.send_message(
+                event.chat_id,
+                "⚠️ Günlük post limitiniz doldu. Yarın tekrar deneyin.",
+                reply_to=event.message.id,
+                link_preview=False
+            )
+        except Exception:
+            pass
+
+
+async def fetch_linked_messages(account: PoolAccount, chat_id, message_ids: list) -> list:
+    """Bir sohbetteki mesajları hesabın tek get_messages çağrısıyla al (bulunamayanlar None)"""
+    try:
+        if isinstance(chat_id, str):
+            entity = await account.entity_cache.get(chat_id)
+            if entity is None:
+                logger.warning(f"❌ Sohbet bulunamadı: {chat_id}")
+                return [None] * len(message_ids)
+        else:
+            entity = chat_id
+        return list(await account.client.get_messages(entity, ids=message_ids))
+    except Exception as e:
+        logger.warning(f"❌ Mesajlar alınamadı ({chat_id}): {e}")
+        return [None] * len(message_ids)
+
+
+async def handle_telegram_links(event, source_channel: dict, matches: list):
+    """
+    Olaydaki tüm Telegram linklerini işle.
+    Linkler sohbete göre gruplanır ve her sohbet için tek get_messages yapılır;
+    kota tek sorguda tüm linkler için rezerve edilir.
+    """
+    try:
+        account = pool.account_of(event.client)
+
+        # (chat_id, message_id) sırasını koru, tekrarları at
+        targets = list(dict.fromkeys(parse_link_match(match) for match in matches))
+
+        by_chat = {}
+        for chat_id, message_id in targets:
+            by_chat.setdefault(chat_id, []).append(message_id)
+
+        chats = list(by_chat)
+        results = await asyncio.gather(*(fetch_linked_messages(account, chat_id, by_chat[chat_id]) for chat_id in chats))
+        fetched = {}
+        for chat_id, messages in zip(chats, results):
+            for message_id, message in zip(by_chat[chat_id], messages):
+                fetched[(chat_id, message_id)] = message
+
+        trigger_keywords = source_channel.get('trigger_keywords', '')
+        messages = []
+        for chat_id, message_id in targets:
+            message = fetched.get((chat_id, message_id))
+            if not message:
+                logger.warning(f"❌ Mesaj bulunamadı: {chat_id}/{message_id}")
+                continue
+            # Tetikleyici yoksa kota rezerve etme
+            if not check_trigger_keywords(message.raw_text or '', trigger_keywords):
+                continue
+            messages.append(message)
+
+        if not messages:
             return
 
-        if not message:
-            logger.warning(f"❌ Mesaj bulunamadı: {link}")
+        # Limit kontrolü + rezervasyon tek sorguda
+        granted, remaining, quota_date = await db.reserve_daily_quota(source_channel['id'], count=len(messages))
+        if not granted:
+            await notify_limit_reached(event, source_channel)
             return
 
-        source_channel = await db.get_source_channel(event.chat_id)
+        if granted < len(messages):
+            logger.info(f"⚠️ Limit nedeniyle {len(messages) - granted} link atlandı")
 
-        if not source_channel:
-            logger.debug(f"⏭️ Kayıtlı kaynak kanal değil: {event.chat_id}")
+        target_title = source_channel.get('target_title', source_channel['target_chat_id'])
+        posts = []
+        for i, message in enumerate(messages[:granted]):
+            # Her gönderimden sonra kalacak hak
+            remaining_after = None if remaining is None else remaining + (granted - 1 - i)
+            logger.info(f"📤 Link işleniyor: {message.chat_id}/{message.id} -> {target_title}")
+            posts.append((message, remaining_after))
+        # Tüm linkler tek transaction'da outbox'a geçer
+        await enqueue_forward(source_channel, posts, event, quota_date)
+
+    except Exception as e:
+        logger.error(f"Link error: {e}")
+
+
+async def process_event(event):
+    """Intake kuyruğundan gelen mesajı işle (link çözme, kota, gönderim kuyruğu)"""
+    in_album = False
+    try:
+        if not db.settings_snapshot.bot_enabled:
             return
 
-        can_post = await db.can_post_today(source_channel['id'])
-        if not can_post:
-            logger.info(f"⚠️ Günlük limit doldu: {source_channel.get('source_title', event.chat_id)}")
-            if source_channel.get('send_link_back', False):
-                try:
-                    await client.send_message(
-                        event.chat_id,
-                        "⚠️ Günlük post limitiniz doldu. Yarın tekrar deneyin.",
-                        reply_to=event.message.id,
-                        link_preview=False
-                    )
-                except Exception:
-                    pass
+        # Kuyrukta beklerken kanal kaldırılmış olabilir - index'ten tekrar bak
+        source_channel = db.get_cached_source_channel(event.chat_id)
+        if not source_channel:
             return
 
-        logger.info(f"📤 Link işleniyor: {link} -> {source_channel.get('target_title', source_channel['target_chat_id'])}")
-        await forward_message(source_channel, message, source_event_chat_id=event.chat_id, source_event_message_id=event.message.id)
+        # Kalıcı kayıt sınırlı aşamada (worker sayısı kadar eşzamanlı INSERT);
+        # outbox'tan ya da spill'den geri alınan mesajın satırı zaten var
+        if (event.chat_id, event.message.id) not in intake_jobs:
+            await record_intake(source_channel, event.chat_id, event.message.id)
+
+        source_title = source_channel.get('source_title', str(event.chat_id))
+        message_text = event.message.raw_text or ''
+        listen_type = source_channel.get('listen_type', 'direct')
+
+        logger.info(f"📩 Mesaj alındı [{source_title}] mode={listen_type}")
+
+        if listen_type == 'link':
+            matches = list(TELEGRAM_LINK_PATTERN.finditer(message_text))
+
+            if matches:
+                logger.info(f"🔗 {len(matches)} link bulundu")
+                await handle_telegram_links(event, source_channel, matches)
+            else:
+                logger.debug(f"⏭️ Link bulunamadı, atlanıyor")
+
+        else:  # listen_type == 'direct'
+            if event.message.grouped_id:
+                # Albüm parçası - diğer parçalarla birlikte tek post olarak gönderilecek
+                # (intake satırı albüm işlenince kapanır)
+                in_album = True
+                album_aggregator.add((event.chat_id, event.message.grouped_id), event)
+                return
+
+            if message_text or event.message.media:
+                # Tetikleyici yoksa kota rezerve etme
+                if not check_trigger_keywords(message_text, source_channel.get('trigger_keywords', '')):
+                    return
+
+                # Limit kontrolü + rezervasyon tek sorguda
+                granted, remaining, quota_date = await db.reserve_daily_quota(source_channel['id'])
+                if not granted:
+                    await notify_limit_reached(event, source_channel)
+                    return
+
+                logger.info(f"📤 Direkt mesaj iletiliyor: {source_title}")
+                await enqueue_forward(source_channel, [(event.message, remaining)], event, quota_date)
 
     except Exception as e:
-        logger.error(f"Link error: {e}")
+        import traceback
+        logger.error(f"Handler error: {e}\n{traceback.format_exc()}")
+
+    finally:
+        # Post üretmeden biten mesajın intake satırı (enqueue_forward devraldıysa boş)
+        if not in_album:
+            await release_intake([event])
+
+
+async def spill_event(chat_id, event):
+    """Kuyruğa sığmayan mesajı kalıcı depoya yaz (sonra tekrar alınır)"""
+    # Intake satırı spill kaydıyla aynı transaction'da silinir; yazılamazsa satır
+    # kira dolunca tekrar işlenir
+    job_id = intake_jobs.get((chat_id, event.message.id))
+    try:
+        await db.spill_intake(chat_id, event.message.id, job_id)
+    finally:
+        take_intake_jobs([event])
+
+
+async def drop_event(chat_id, event):
+    """drop_oldest ile atılan mesajın intake satırını sil"""
+    await release_intake([event])
+
+
+# Handler'lar olayı sadece bu sınırlı kuyruğa koyar; işleme sabit sayıda worker'da
+intake = IntakeQueue(
+    process_event,
+    maxsize=config.INTAKE_QUEUE_SIZE,
+    per_source=config.INTAKE_PER_SOURCE,
+    workers=config.INTAKE_WORKERS,
+    policy=config.INTAKE_POLICY,
+    spill=spill_event,
+    max_blocked=config.INTAKE_MAX_BLOCKED,
+    on_drop=drop_event
+)
+
+
+async def record_intake(source_channel: dict, chat_id, message_id: int):
+    """Kuyruktan alınan mesajı kalıcı kaydet; albüm tamponunda ya da işlenirken çökerse bu satırdan tekrar işlenir"""
+    try:
+        intake_jobs[(chat_id, message_id)] = await db.insert_intake_job(
+            source_channel['id'], chat_id, message_id, config.WORKER_ID
+        )
+    except Exception as e:
+        logger.warning(f"Intake satırı yazılamadı, mesaj sadece bellekte: {e}")
+
+
+def refresh_message_filters():
+    """Handler'ların chats= filtresini aktif kaynak sohbetlerle yerinde güncelle"""
+    chat_ids = db.get_cached_source_chat_ids()
+    for builder in message_filters:
+        # Kaynak ID'leri zaten işaretli (-100...) - Telethon'un tekrar çözümlemesine gerek yok
+        builder.chats = chat_ids
+        builder.resolved = True
+    logger.debug(f"Mesaj filtresi güncellendi: {len(chat_ids)} kaynak sohbet")
 
 
 async def setup_message_handler():
-    """Mesaj handler'ını kur"""
-    global client
+    """Mesaj handler'ını kaynak sohbet filtresiyle her hesabın client'ına kur"""
 
-    @client.on(events.NewMessage)
     async def message_handler(event):
-        """Monitör edilen kanallardaki yeni mesajları işle"""
+        """Monitör edilen kanallardaki yeni mesajları intake kuyruğuna al"""
         try:
-            if not await db.is_bot_enabled():
+            if shutdown_flag or not db.settings_snapshot.bot_enabled:
                 return
 
-            source_channel = await db.get_source_channel(event.chat_id)
-
+            # Filtre güncellenirken gelen olay için index'ten tekrar bak
+            source_channel = db.get_cached_source_channel(event.chat_id)
             if not source_channel:
-                # Kayıtlı olmayan kanalları loglama (spam olur)
                 return
 
-            source_title = source_channel.get('source_title', str(event.chat_id))
-            message_text = event.message.raw_text or ''
-            listen_type = source_channel.get('listen_type', 'direct')
-
-            logger.info(f"📩 Mesaj alındı [{source_title}] mode={listen_type}")
-
-            if listen_type == 'link':
-                links = TELEGRAM_LINK_PATTERN.findall(message_text)
-
-                if links:
-                    logger.info(f"🔗 {len(links)} link bulundu")
-                    for match in TELEGRAM_LINK_PATTERN.finditer(message_text):
-                        full_link = match.group(0)
-                        await handle_telegram_link(event, full_link)
-                else:
-                    logger.debug(f"⏭️ Link bulunamadı, atlanıyor")
-
-            else:  # listen_type == 'direct'
-                if message_text or event.message.media:
-                    can_post = await db.can_post_today(source_channel['id'])
-                    if not can_post:
-                        logger.info(f"⚠️ Günlük limit doldu: {source_title}")
-                        if source_channel.get('send_link_back', False):
-                            try:
-                                await client.send_message(
-                                    event.chat_id,
-                                    "⚠️ Günlük post limitiniz doldu. Yarın tekrar deneyin.",
-                                    reply_to=event.message.id,
-                                    link_preview=False
-                                )
-                            except Exception:
-                                pass
-                        return
-
-                    logger.info(f"📤 Direkt mesaj iletiliyor: {source_title}")
-                    await forward_message(source_channel, event.message, source_event_chat_id=event.chat_id, source_event_message_id=event.message.id)
+            # Cluster modunda kanal başka bir worker'a ait olabilir
+            if not cluster.owns(source_channel['id']):
+                return
+
+            # Aynı mesajı kanala üye tüm hesaplar alır - sadece kanalın hesabı işler
+            account = pool.route(source_channel['id'])
+            if account is None or account.client is not event.client:
+                return
+
+            # Kanal devredilirse yeni sahip bu mesajdan sonrasını alır
+            cluster.seen(source_channel['id'], event.message.id)
+
+            # Handler sadece sınırlı kuyruğa verir; DB'ye yazma intake worker'ında
+            await intake.put(event.chat_id, event)
 
         except Exception as e:
-            import traceback
-            logger.error(f"Handler error: {e}\n{traceback.format_exc()}")
+            logger.error(f"Handler error: {e}")
+
+    # Kayıtlı olmayan sohbetlerin güncellemeleri Telethon'da elenir, handler çağrılmaz
+    for account in pool:
+        # chats= boş olsa da verilmeli - None olursa Telethon filtreyi hiç çalıştırmaz
+        builder = events.NewMessage(chats=db.get_cached_source_chat_ids())
+        message_filters.append(builder)
+        account.client.add_event_handler(message_handler, builder)
+    refresh_message_filters()
+
+    # Kanal eklenip çıkarıldıkça (NOTIFY ya da periyodik senkron) filtre yenilenir,
+    # kaldırılan kaynakların boş gönderim şeritleri atılır
+    db.add_source_chat_listener(refresh_message_filters)
+    db.add_source_chat_listener(prune_delivery_lanes)
+
+
+async def intake_replay():
+    """Kalıcı depoya taşan mesajları intake kuyruğunda yer açıldıkça geri al"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        await asyncio.sleep(config.INTAKE_REPLAY_INTERVAL)
+
+        try:
+            # Kuyruğun yarısı yeni mesajlara boş kalsın
+            room = intake.free() - intake.maxsize // 2
+            if room <= 0:
+                continue
+
+            source_chat_ids = None
+            if cluster.enabled:
+                owned = (db.get_cached_source_channel_by_id(i) for i in cluster.owned_ids())
+                source_chat_ids = [channel['source_chat_id'] for channel in owned if channel]
+
+            # Spill kayıtları bu worker'ın intake satırlarına dönüşür (kuyruktayken çökerse kaybolmaz)
+            rows = await db.take_spilled_intake(room, config.WORKER_ID, source_chat_ids)
+            if not rows:
+                continue
+
+            by_chat = {}
+            for job_id, chat_id, message_id in rows:
+                by_chat.setdefault(chat_id, []).append((message_id, job_id))
+
+            for chat_id, jobs in by_chat.items():
+                # Mesajlar kanalın şu anki hesabıyla alınır (gönderim de o hesaptan)
+                source_channel = db.get_cached_source_channel(chat_id)
+                account = pool.route(source_channel['id']) if source_channel else None
+                if account is None:
+                    # Satırlar kira dolunca outbox dispatcher'dan tekrar alınır
+                    continue
+                jobs.sort()
+                messages = await fetch_linked_messages(account, chat_id, [message_id for message_id, _ in jobs])
+                for (message_id, job_id), message in zip(jobs, messages):
+                    if not message or (chat_id, message_id) in intake_jobs:
+                        await finish_outbox(job_id)
+                        continue
+                    intake_jobs[(chat_id, message_id)] = job_id
+                    await intake.put(chat_id, ReplayedEvent(chat_id, message, account.client), replayed=True)
+
+            logger.info(f"♻️ {len(rows)} ertelenmiş mesaj kuyruğa geri alındı")
+        except Exception as e:
+            logger.error(f"Intake replay error: {e}")
 
 
 async def update_bot_status(status: str):
@@ -622,18 +1398,149 @@ async def heartbeat():
     """Periyodik heartbeat - bot durumunu güncelle"""
     global shutdown_flag
 
+    last_shed = 0
     while not shutdown_flag:
         try:
             await update_bot_status('online')
         except Exception:
             pass
 
+        # Yük altında atılan/ertelenen mesaj sayaçları (değiştikçe logla)
+        shed = intake.counters['dropped'] + intake.counters['spilled']
+        if shed != last_shed:
+            logger.warning(f"📉 Intake taşması: {intake.counters} (kuyrukta {len(intake)})")
+            last_shed = shed
+
+        # Panelin istatistik ekranı için (worker başına, toplamı get_intake_stats)
+        try:
+            await db.publish_intake_stats(
+                config.WORKER_ID,
+                {**intake.counters, 'queued': len(intake), 'waiting': intake.blocked}
+            )
+        except Exception:
+            pass
+
         await asyncio.sleep(config.HEARTBEAT_INTERVAL)
 
 
+async def channel_cache_sync():
+    """Periyodik tam senkronizasyon - NOTIFY kaçırılırsa cache'i düzelt"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        await asyncio.sleep(config.CHANNEL_CACHE_RESYNC_INTERVAL)
+
+        try:
+            if not db.is_listener_alive():
+                await db.start_listener()
+            await db.load_source_channel_cache()
+            # Ek hedef değişiklikleri kaynak seti değişmeden de olur - şeritler burada da temizlenir
+            prune_delivery_lanes()
+        except Exception as e:
+            logger.warning(f"Kanal cache senkronizasyonu başarısız: {e}")
+
+
+async def cluster_sync():
+    """Cluster heartbeat - kiraları yenile, worker sayısı değiştikçe kanal payını dengele"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        await asyncio.sleep(config.CLUSTER_HEARTBEAT_INTERVAL)
+
+        try:
+            await position_channels()
+            await cluster.rebalance()
+        except Exception as e:
+            logger.warning(f"Cluster heartbeat başarısız: {e}")
+
+        await catch_up_channels()
+
+
+async def position_channels():
+    """
+    Bu sürecin hiç mesaj almadığı kanallarda kanalın son mesajını konum al.
+    Teklif edilen kanal konumu alınana kadar işlenmeye devam eder, sonra bırakılır.
+    """
+    for source_channel_id in cluster.unpositioned():
+        source_channel = db.get_cached_source_channel_by_id(source_channel_id)
+        account = pool.route(source_channel_id)
+        if not source_channel or account is None:
+            continue
+        try:
+            messages = await account.client.get_messages(source_channel['source_chat_id'], limit=1)
+        except Exception as e:
+            logger.warning(f"Kanalın son mesajı alınamadı ({source_channel_id}): {e}")
+            continue
+        cluster.set_position(source_channel_id, messages[0].id if messages else 0)
+
+
+async def catch_up_channels():
+    """Devralınan kanalların eski sahibi bıraktıktan sonra gelen mesajlarını kuyruğa al"""
+    for source_channel_id in cluster.catch_up_pending():
+        source_channel = db.get_cached_source_channel_by_id(source_channel_id)
+        account = pool.route(source_channel_id)
+        if not source_channel or not cluster.owns(source_channel_id):
+            cluster.finish_catch_up(source_channel_id)
+            continue
+        if account is None:
+            continue
+
+        chat_id = source_channel['source_chat_id']
+        resume_after, _ = cluster.catch_up_range(source_channel_id)
+        count = 0
+        try:
+            while True:
+                messages = await account.client.get_messages(
+                    chat_id, min_id=resume_after, reverse=True, limit=config.INTAKE_PER_SOURCE
+                )
+                for message in messages:
+                    # Devirden sonra canlı alınan mesajlar handler'dan geçti
+                    _, live_from = cluster.catch_up_range(source_channel_id)
+                    if live_from is not None and message.id >= live_from:
+                        messages = []
+                        break
+                    resume_after = message.id
+                    if getattr(message, 'action', None) or (chat_id, message.id) in intake_jobs:
+                        continue
+                    await intake.put(chat_id, ReplayedEvent(chat_id, message, account.client), replayed=True)
+                    count += 1
+                if len(messages) < config.INTAKE_PER_SOURCE:
+                    break
+        except Exception as e:
+            # Kalan mesajlar bir sonraki heartbeat'te bu noktadan alınır
+            cluster.resume_catch_up(source_channel_id, resume_after)
+            logger.warning(f"Devralınan kanalın mesajları alınamadı ({source_channel_id}): {e}")
+            continue
+
+        cluster.finish_catch_up(source_channel_id, resume_after)
+        if count:
+            logger.info(f"♻️ Devralınan kanaldan {count} mesaj kuyruğa alındı: {source_channel.get('source_title', chat_id)}")
+
+
+async def post_buffer_flusher():
+    """Post kayıtlarını ve istatistikleri periyodik olarak toplu yaz"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        await asyncio.sleep(config.POST_BUFFER_FLUSH_INTERVAL)
+        try:
+            await db.post_buffer.flush()
+        except Exception as e:
+            logger.warning(f"Post kayıtları yazılamadı: {e}")
+
+
+async def entity_store_sync():
+    """Periyodik olarak yeni entity'leri kaydet"""
+    global shutdown_flag
+
+    while not shutdown_flag:
+        await asyncio.sleep(config.ENTITY_STORE_FLUSH_INTERVAL)
+        await flush_entity_store()
+
+
 async def graceful_shutdown(sig=None):
     """Graceful shutdown işle"""
-    global shutdown_flag, client
+    global shutdown_flag
 
     if shutdown_flag:
         return  # Zaten shutdown yapılıyor
@@ -646,15 +1553,63 @@ async def graceful_shutdown(sig=None):
     except Exception:
         pass
 
-    # Önce client'ı kapat
-    if client and client.is_connected():
+    # Boşaltma adımları tek bir süreyi paylaşır (Heroku SIGTERM'den 30s sonra öldürür)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + config.SHUTDOWN_DRAIN_TIMEOUT
+
+    def remaining() -> float:
+        return max(0.0, deadline - loop.time())
+
+    # Alınmış mesajları işle, bekleyen albümleri kuyruğa al, sonra gönderimlerin bitmesini bekle
+    try:
+        await asyncio.wait_for(intake.join(), timeout=remaining())
+    except asyncio.TimeoutError:
+        logger.warning(f"Intake kuyruğu boşaltılamadı ({len(intake)} mesaj kaldı)")
+    except Exception:
+        pass
+    await intake.stop()
+
+    try:
+        await asyncio.wait_for(album_aggregator.flush_all(), timeout=remaining())
+    except asyncio.TimeoutError:
+        logger.warning("Bekleyen albümler kuyruğa alınamadı")
+    except Exception:
+        pass
+
+    try:
+        await asyncio.wait_for(drain_delivery(), timeout=remaining())
+    except asyncio.TimeoutError:
+        logger.warning(f"Gönderim kuyruğu boşaltılamadı ({delivery.pending()} iş kaldı)")
+    except Exception:
+        pass
+    await delivery.stop()
+    # Bekleyen tekrar denemeler outbox satırlarından sonraki süreçte devam eder
+    await retries.stop()
+
+    # Durum yazımları bloklayabilecek disconnect'lerden önce: bekleyen post kayıtları,
+    # bitmeyen outbox işleri (sonraki süreç kira süresini beklemeden devralır),
+    # kanal kiraları (diğer worker'lar heartbeat süresini beklemeden devralır) ve entity'ler
+    deadline = loop.time() + SHUTDOWN_STATE_TIMEOUT
+    for step in (db.post_buffer.flush, partial(db.release_outbox_claims, config.WORKER_ID),
+                 cluster.leave, flush_entity_store):
+        try:
+            await asyncio.wait_for(step(), timeout=remaining())
+        except asyncio.TimeoutError:
+            logger.warning(f"Shutdown adımı zaman aşımı: {getattr(step, '__name__', step)}")
+        except Exception:
+            pass
+
+    # Client'ları paralel kapat
+    async def disconnect(account: PoolAccount):
         try:
-            await asyncio.wait_for(client.disconnect(), timeout=5.0)
+            await asyncio.wait_for(account.client.disconnect(), timeout=SHUTDOWN_DISCONNECT_TIMEOUT)
         except asyncio.TimeoutError:
-            logger.warning("Client disconnect timeout")
+            logger.warning(f"Client disconnect timeout ({account.name})")
         except Exception:
             pass
 
+    await asyncio.gather(*(disconnect(account) for account in pool if account.client.is_connected()))
+
     # Sonra database'i kapat
     try:
         await db.close_db()
@@ -684,10 +1639,8 @@ def setup_signal_handlers(loop):
             signal.signal(sig, lambda s, f: asyncio.create_task(graceful_shutdown()))
 
 
-async def start_client():
+async def start_client(client):
     """Telegram client'ı başlat"""
-    global client
-
     await client.connect()
 
     if not await client.is_user_authorized():
@@ -699,7 +1652,7 @@ async def start_client():
 
 async def main():
     """Ana fonksiyon"""
-    global client, shutdown_flag
+    global shutdown_flag
 
     if not config.API_ID or not config.API_HASH:
         logger.error("API_ID and API_HASH required!")
@@ -709,51 +1662,98 @@ async def main():
         logger.error("DATABASE_URL required!")
         sys.exit(1)
 
-    if not config.SESSION_STRING:
+    if not config.SESSION_STRINGS:
         logger.error("SESSION_STRING required!")
         sys.exit(1)
 
     try:
         await db.init_db()
+        await db.load_source_channel_cache()
+        await db.settings_snapshot.refresh()
     except Exception as e:
         logger.error(f"Database error: {e}")
         sys.exit(1)
 
-    client = create_client()
+    await db.start_listener()
 
-    try:
-        await start_client()
-    except (AuthKeyUnregisteredError, UserDeactivatedBanError) as e:
-        logger.error(f"Auth failed: {e}")
-        await db.close_db()
-        sys.exit(1)
-    except Exception as e:
-        logger.error(f"Client error: {e}")
+    # Giriş yapamayan hesap havuza alınmaz, diğerleriyle devam edilir
+    for index, session_string in enumerate(config.SESSION_STRINGS, start=1):
+        account = create_account(index, session_string)
+        try:
+            await start_client(account.client)
+        except (AuthKeyUnregisteredError, UserDeactivatedBanError) as e:
+            logger.error(f"Auth failed ({account.name}): {e}")
+            await account.client.disconnect()
+            continue
+        except Exception as e:
+            logger.error(f"Client error ({account.name}): {e}")
+            await account.client.disconnect()
+            continue
+
+        try:
+            me = await account.client.get_me()
+            account.account_id = me.id
+            logger.info(f"✅ {me.first_name} (@{me.username or 'no username'}) - {account.name}")
+        except Exception:
+            logger.info(f"✅ {account.name} bağlandı")
+        pool.add(account)
+
+    if not len(pool):
+        logger.error("Hiçbir hesaba giriş yapılamadı")
         await db.close_db()
         sys.exit(1)
 
+    logger.info(f"✅ Bot running ({len(pool)} hesap)")
+
+    for account in pool:
+        await load_entity_store(account)
+        await prewarm_entity_cache(account)
+
+    # Önceki süreçten (aynı WORKER_ID) kalan outbox işleri hemen devralınabilsin
     try:
-        me = await client.get_me()
-        logger.info(f"✅ {me.first_name} (@{me.username or 'no username'}) - Bot running")
-    except Exception:
-        logger.info("✅ Bot running")
+        await db.release_outbox_claims(config.WORKER_ID)
+    except Exception as e:
+        logger.warning(f"Outbox kiraları bırakılamadı: {e}")
 
+    # Cluster modunda kanal payını mesaj dinlemeden önce al
+    if cluster.enabled:
+        try:
+            await cluster.rebalance()
+        except Exception as e:
+            logger.warning(f"Cluster'a katılınamadı: {e}")
+
+    delivery.start()
+    retries.start()
+    intake.start()
     await setup_message_handler()
+    # Önceki sahibin (ya da bu worker'ın restart öncesinin) bıraktığı kanalların kaçan mesajları
+    await catch_up_channels()
     await update_bot_status('online')
 
     heartbeat_task = asyncio.create_task(heartbeat())
+    cache_sync_task = asyncio.create_task(channel_cache_sync())
+    entity_store_task = asyncio.create_task(entity_store_sync())
+    post_flush_task = asyncio.create_task(post_buffer_flusher())
+    outbox_task = asyncio.create_task(outbox_dispatcher())
+    cluster_task = asyncio.create_task(cluster_sync())
+    replay_task = asyncio.create_task(intake_replay())
+
+    # Tüm hesapların bağlantısı kopana kadar çalış (banlanan hesap diğerlerini durdurmaz)
+    accounts = list(pool)
+    results = await asyncio.gather(
+        *(account.client.run_until_disconnected() for account in accounts),
+        return_exceptions=True
+    )
+    for account, result in zip(accounts, results):
+        if isinstance(result, Exception) and not shutdown_flag:
+            logger.error(f"Disconnected ({account.name}): {result}")
 
-    try:
-        await client.run_until_disconnected()
-    except Exception as e:
-        if not shutdown_flag:
-            logger.error(f"Disconnected: {e}")
-
-    heartbeat_task.cancel()
-    try:
-        await heartbeat_task
-    except asyncio.CancelledError:
-        pass
+    for task in (heartbeat_task, cache_sync_task, entity_store_task, post_flush_task, replay_task, outbox_task, cluster_task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
 
 
 if __name__ == '__main__':
@@ -0,0 +1,227 @@
+"""
+Kısıtlı (noforwards) kaynaklar için medya hattı.
+
+İçeriği korunan bir kaynaktaki medya referansla gönderilemez; indirip tekrar
+yüklemek gerekir. MediaHandleCache her kaynak medyayı (photo/document ID)
+bir kez indirir, bir kez yükler ve UploadMedia ile elde edilen InputMedia
+handle'ını saklar. Aynı posta gelen tekrar linkler ve diğer hedeflere
+gönderimler bu handle'ı kullanır, yeni transfer yapılmaz.
+
+10 MB üstü dosyalar belleğe alınmaz: birkaç iter_download akışıyla indirilen
+parçalar sınırlı bir kuyruk üzerinden doğrudan SaveBigFilePart ile yüklenir,
+bellek kullanımı dosya boyutundan bağımsız kalır. cryptg kuruluysa Telethon
+şifrelemeyi onunla hızlandırır.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple
+
+from telethon import functions, helpers, types, utils
+
+try:
+    import cryptg  # noqa: F401 - Telethon kuruluysa AES için otomatik kullanır
+    HAS_CRYPTG = True
+except ImportError:
+    HAS_CRYPTG = False
+
+logger = logging.getLogger(__name__)
+
+# Yükleme/indirme parça boyutu (Telegram üst sınırı, 1 MB'ın böleni)
+PART_SIZE = 512 * 1024
+# Bu boyutun üstü "büyük dosya" - akış halinde SaveBigFilePart ile yüklenir
+BIG_FILE_SIZE = 10 * 1024 * 1024
+
+
+class MediaHandleCache:
+    """Source media ID -> reusable InputMedia handle (download and upload once)"""
+
+    def __init__(self, maxsize: int = 512, ttl: float = 3600, download_streams: int = 2,
+                 upload_workers: int = 3, buffer_parts: int = 8):
+        self.client = None
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.download_streams = download_streams
+        self.upload_workers = upload_workers
+        # Akış sırasında bellekte bekleyebilecek en fazla parça
+        self.buffer_parts = buffer_parts
+        # key -> (expires_at, input_media)
+        self._handles: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._pending = {}
+
+    @staticmethod
+    def media_key(media) -> Optional[Tuple[str, int]]:
+        """Kaynak medyanın cache anahtarı (dosya içermeyen medya için None)"""
+        if isinstance(media, types.MessageMediaPhoto) and isinstance(media.photo, types.Photo):
+            return ('photo', media.photo.id)
+        if isinstance(media, types.MessageMediaDocument) and isinstance(media.document, types.Document):
+            return ('document', media.document.id)
+        return None
+
+    @staticmethod
+    def is_restricted(message) -> bool:
+        """Mesaj içerik korumalı bir kaynaktan mı (referansla gönderilemez)?"""
+        return bool(getattr(message, 'noforwards', False))
+
+    def _get(self, key) -> Optional[Any]:
+        entry = self._handles.get(key)
+        if entry is None:
+            return None
+        expires_at, handle = entry
+        if time.monotonic() >= expires_at:
+            del self._handles[key]
+            return None
+        self._handles.move_to_end(key)
+        return handle
+
+    def _store(self, key, handle):
+        self._handles[key] = (time.monotonic() + self.ttl, handle)
+        self._handles.move_to_end(key)
+        while len(self._handles) > self.maxsize:
+            self._handles.popitem(last=False)
+
+    def invalidate(self, messages):
+        """Mesajların handle'larını at (file reference süresi dolduğunda)"""
+        for message in messages:
+            key = self.media_key(message.media)
+            if key is not None:
+                self._handles.pop(key, None)
+
+    async def resolve(self, message):
+        """
+        send_file'a verilecek medyayı döndür.
+
+        Kısıtlı olmayan mesajlarda medya olduğu gibi (referansla) döner;
+        kısıtlı olanlarda cache'teki handle, yoksa indirilip yüklenen handle.
+        """
+        key = self.media_key(message.media)
+        if key is None or not self.is_restricted(message):
+            return message.media
+
+        handle = self._get(key)
+        if handle is not None:
+            return handle
+
+        # Aynı medya için eşzamanlı istekleri tek transferde birleştir
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            handle = await self._transfer(message)
+            self._store(key, handle)
+            future.set_result(handle)
+            return handle
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception never retrieved" uyarısı çıkmasın
+            future.exception()
+            raise
+        finally:
+            self._pending.pop(key, None)
+
+    async def _transfer(self, message):
+        """Medyayı indir, yükle ve tekrar kullanılabilir InputMedia handle'ına çevir"""
+        media = message.media
+        started = time.monotonic()
+
+        if isinstance(media, types.MessageMediaPhoto):
+            data = await self.client.download_media(message, file=bytes)
+            size = len(data)
+            uploaded = await self.client.upload_file(data, file_name='photo.jpg')
+            input_media = types.InputMediaUploadedPhoto(file=uploaded)
+        else:
+            document = media.document
+            size = document.size
+            file_name = next(
+                (attr.file_name for attr in document.attributes
+                 if isinstance(attr, types.DocumentAttributeFilename)),
+                'file'
+            )
+            if size > BIG_FILE_SIZE:
+                uploaded = await self._stream_upload(document, file_name)
+            else:
+                data = await self.client.download_media(message, file=bytes)
+                uploaded = await self.client.upload_file(data, file_name=file_name)
+            input_media = types.InputMediaUploadedDocument(
+                file=uploaded,
+                mime_type=document.mime_type,
+                attributes=document.attributes
+            )
+
+        # Sohbete göndermeden yükle; dönen medya her hedefte referansla kullanılabilir
+        result = await self.client(functions.messages.UploadMediaRequest(
+            peer=types.InputPeerSelf(),
+            media=input_media
+        ))
+        logger.info(f"📦 Korumalı medya yüklendi ({size} bayt, {time.monotonic() - started:.1f}s)")
+        return utils.get_input_media(result)
+
+    async def _stream_upload(self, document, file_name: str) -> types.InputFileBig:
+        """
+        Büyük dosyayı belleğe almadan aktar.
+
+        Dosya parça aralıklarına bölünür, her aralık ayrı bir iter_download
+        akışıyla indirilir; parçalar sınırlı kuyruktan upload worker'larına
+        gider (büyük dosya parçaları sırasız yüklenebilir).
+        """
+        if not HAS_CRYPTG:
+            logger.warning("cryptg kurulu değil - büyük medya aktarımı yavaş olabilir")
+
+        total_parts = (document.size + PART_SIZE - 1) // PART_SIZE
+        file_id = helpers.generate_random_long()
+        buffer: asyncio.Queue = asyncio.Queue(maxsize=self.buffer_parts)
+        errors = []
+
+        streams = max(1, min(self.download_streams, total_parts))
+        parts_per_stream = (total_parts + streams - 1) // streams
+
+        async def download(first_part: int):
+            last_part = min(first_part + parts_per_stream, total_parts)
+            part = first_part
+            async for chunk in self.client.iter_download(
+                document,
+                offset=first_part * PART_SIZE,
+                limit=last_part - first_part,
+                request_size=PART_SIZE,
+                chunk_size=PART_SIZE,
+                file_size=document.size
+            ):
+                await buffer.put((part, chunk))
+                part += 1
+
+        async def upload():
+            while True:
+                part, chunk = await buffer.get()
+                try:
+                    # Hata olsa da kuyruğu tüketmeye devam et (indirme akışları bloklanmasın)
+                    if not errors:
+                        saved = await self.client(functions.upload.SaveBigFilePartRequest(
+                            file_id, part, total_parts, chunk
+                        ))
+                        if not saved:
+                            raise RuntimeError(f"Parça {part} yüklenemedi")
+                except Exception as e:
+                    errors.append(e)
+                finally:
+                    buffer.task_done()
+
+        downloaders = [
+            asyncio.create_task(download(i * parts_per_stream))
+            for i in range(streams) if i * parts_per_stream < total_parts
+        ]
+        uploaders = [asyncio.create_task(upload()) for _ in range(self.upload_workers)]
+        try:
+            await asyncio.gather(*downloaders)
+            await buffer.join()
+        finally:
+            for task in downloaders + uploaders:
+                task.cancel()
+            await asyncio.gather(*downloaders, *uploaders, return_exceptions=True)
+
+        if errors:
+            raise errors[0]
+        return types.InputFileBig(id=file_id, parts=total_parts, name=file_name)
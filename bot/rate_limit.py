@@ -0,0 +1,106 @@
+"""
+FloodWait'e duyarlı token bucket hız sınırlayıcı.
+
+Her hesap için bir bucket, her (hesap, hedef sohbet) çifti için bir bucket
+tutulur. Gönderim ancak iki bucket'ta da token varsa yapılır. FloodWaitError
+gönderen hesaba uygulanır: o hesabın hedef ve hesap bucket'ları e.seconds kadar
+bloklanır ve hızları düşürülür (AIMD); diğer hesaplar etkilenmez. Başarılı
+gönderimlerle hız yavaşça yapılandırılan tavana geri çıkar.
+"""
+import time
+from typing import Dict, Hashable, Optional, Tuple
+
+# Başarılı gönderim başına hızın tavana yaklaşma adımı (tavanın oranı)
+INCREASE_STEP = 0.05
+# FloodWait sonrası hız çarpanları
+TARGET_DECREASE = 0.5
+ACCOUNT_DECREASE = 0.75
+# Hız bu oranın altına düşmez
+MIN_RATE_RATIO = 0.1
+
+
+class TokenBucket:
+    """Token bucket with an adaptive rate and a hard block window"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.max_rate = rate
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def delay(self) -> float:
+        """Bir token için beklenmesi gereken süre (0 = hemen)"""
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        self._refill(now)
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def on_success(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * INCREASE_STEP)
+
+    def on_flood_wait(self, seconds: float, factor: float):
+        now = time.monotonic()
+        self._refill(now)
+        self.rate = max(self.max_rate * MIN_RATE_RATIO, self.rate * factor)
+        self.tokens = 0
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class RateLimiter:
+    """Per-account and per-(account, target) token buckets"""
+
+    def __init__(self, target_per_minute: float, account_per_minute: float,
+                 target_burst: float = 3, account_burst: float = 5):
+        self.target_rate = target_per_minute / 60
+        self.target_burst = target_burst
+        self.account_rate = account_per_minute / 60
+        self.account_burst = account_burst
+        # Hesap verilmeyen işler None anahtarlı tek hesap bucket'ını kullanır
+        self._accounts: Dict[Optional[Hashable], TokenBucket] = {}
+        self._targets: Dict[Tuple[Optional[Hashable], Hashable], TokenBucket] = {}
+
+    def _account(self, account: Optional[Hashable]) -> TokenBucket:
+        bucket = self._accounts.get(account)
+        if bucket is None:
+            bucket = TokenBucket(self.account_rate, self.account_burst)
+            self._accounts[account] = bucket
+        return bucket
+
+    def _bucket(self, target: Hashable, account: Optional[Hashable]) -> TokenBucket:
+        bucket = self._targets.get((account, target))
+        if bucket is None:
+            bucket = TokenBucket(self.target_rate, self.target_burst)
+            self._targets[(account, target)] = bucket
+        return bucket
+
+    def delay(self, target: Hashable, account: Optional[Hashable] = None) -> float:
+        """Hesabın hedefe gönderimi için beklenmesi gereken süre"""
+        return max(self._account(account).delay(), self._bucket(target, account).delay())
+
+    def consume(self, target: Hashable, account: Optional[Hashable] = None):
+        self._account(account).consume()
+        self._bucket(target, account).consume()
+
+    def on_success(self, target: Hashable, account: Optional[Hashable] = None):
+        self._account(account).on_success()
+        self._bucket(target, account).on_success()
+
+    def on_flood_wait(self, target: Hashable, seconds: float, account: Optional[Hashable] = None):
+        """Hesabın hedefini ve kendisini bekleme süresince blokla (hesabın diğer hedefleri de hemen flood'a girmesin), hızları düşür"""
+        self._bucket(target, account).on_flood_wait(seconds, TARGET_DECREASE)
+        self._account(account).on_flood_wait(seconds, ACCOUNT_DECREASE)
@@ -0,0 +1,144 @@
+"""
+Geçici gönderim hataları için yeniden deneme.
+
+Hatalar sınıflandırılır (ağ, sunucu, file reference, slow mode); her sınıfın
+kendi üstel bekleme politikası ve deneme sınırı vardır. Ertelenen işler
+tek bir min-heap'te tutulur ve tek bir task en yakın zamanı bekleyip
+vadesi gelen işi ayrı bir task'ta tekrar gönderim kuyruğuna verir (dolu bir
+hedef kuyruğu diğer vadesi gelen denemeleri bekletmez). Kalıcı hatalar (yetki,
+geçersiz istek) tekrar denenmez.
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from telethon.errors import (
+    FileReferenceExpiredError,
+    ServerError,
+    SlowModeWaitError,
+    TimedOutError,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class RetryPolicy(NamedTuple):
+    base: float          # ilk bekleme (saniye), her denemede iki katına çıkar
+    max_delay: float     # bekleme üst sınırı
+    max_attempts: int    # toplam deneme sayısı (ilk gönderim dahil)
+
+
+RETRY_POLICIES = {
+    'network': RetryPolicy(base=2, max_delay=60, max_attempts=5),
+    'server': RetryPolicy(base=5, max_delay=300, max_attempts=5),
+    # Cache'teki handle atıldı - hemen yeniden yükleyip bir kez daha dene
+    'file_reference': RetryPolicy(base=1, max_delay=1, max_attempts=2),
+    # Bekleme süresini Telegram söyler
+    'slow_mode': RetryPolicy(base=0, max_delay=3600, max_attempts=3),
+}
+
+
+class TransientSendError(Exception):
+    """Gönderim tekrar denenebilir bir hatayla başarısız oldu"""
+
+    def __init__(self, kind: str, error: Exception, wait: Optional[float] = None):
+        super().__init__(f"{type(error).__name__}: {error}")
+        self.kind = kind
+        self.error = error
+        # Telegram'ın bildirdiği bekleme (slow mode), yoksa politikadan hesaplanır
+        self.wait = wait
+
+
+def classify_error(error: Exception) -> Optional[TransientSendError]:
+    """Hata geçiciyse TransientSendError döndür, kalıcıysa None"""
+    if isinstance(error, FileReferenceExpiredError):
+        return TransientSendError('file_reference', error)
+    if isinstance(error, SlowModeWaitError):
+        return TransientSendError('slow_mode', error, wait=error.seconds)
+    if isinstance(error, (ServerError, TimedOutError)):
+        return TransientSendError('server', error)
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, OSError)):
+        return TransientSendError('network', error)
+    return None
+
+
+def retry_delay(error: TransientSendError, attempt: int) -> Optional[float]:
+    """`attempt` başarısız denemeden sonra beklenecek süre (deneme hakkı bittiyse None)"""
+    policy = RETRY_POLICIES[error.kind]
+    if attempt >= policy.max_attempts:
+        return None
+    if error.wait is not None:
+        return min(policy.max_delay, error.wait)
+    delay = min(policy.max_delay, policy.base * 2 ** (attempt - 1))
+    # Aynı anda düşen işler aynı anda tekrar denenmesin
+    return delay * random.uniform(0.5, 1.0)
+
+
+class RetryScheduler:
+    """Min-heap of deferred callbacks driven by a single timer task"""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Kuyruğa alınmayı bekleyen (hedef şeridi dolu olabilir) callback task'ları
+        self._pending = set()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Zamanlayıcıyı durdur (bekleyen denemeler atılır)"""
+        tasks = list(self._pending)
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def schedule(self, delay: float, callback: Callable[[], Awaitable]):
+        """callback'i `delay` saniye sonra çalıştır"""
+        due = time.monotonic() + max(0.0, delay)
+        heapq.heappush(self._heap, (due, next(self._counter), callback))
+        # Yeni iş en yakınsa bekleyen zamanlayıcıyı uyandır
+        if self._heap[0][0] == due:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            _, _, callback = heapq.heappop(self._heap)
+            task = asyncio.create_task(self._call(callback))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    @staticmethod
+    async def _call(callback: Callable[[], Awaitable]):
+        try:
+            await callback()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Yeniden deneme kuyruğa alınamadı: {e}")
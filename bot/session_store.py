@@ -0,0 +1,69 @@
+"""
+Postgres destekli Telethon session entity deposu.
+
+StringSession sadece auth key'i taşır; entity (peer ID, access hash, username)
+cache'i bellekte tutulur ve her restart'ta kaybolur. Bu sınıf yeni görülen
+entity'leri işaretler, main.py bunları periyodik olarak telegram_entities
+tablosuna yazar ve açılışta toplu olarak geri yükler.
+"""
+from typing import List, Optional, Tuple
+
+from telethon.sessions import StringSession
+
+# (id, hash, username, phone, name) - Telethon MemorySession satır formatı
+EntityRow = Tuple[int, int, Optional[str], Optional[str], Optional[str]]
+
+
+class PersistentStringSession(StringSession):
+    """StringSession whose entity rows can be loaded from / flushed to Postgres"""
+
+    def __init__(self, string: str = None):
+        super().__init__(string)
+        self._by_id = {}
+        self._dirty = {}
+
+    def _add_rows(self, rows, mark_dirty: bool):
+        for row in rows:
+            previous = self._by_id.get(row[0])
+            if previous == row:
+                continue
+            if previous is not None:
+                # Eski hash/username'i at, MemorySession aynı id için tekrar tutmasın
+                self._entities.discard(previous)
+            self._by_id[row[0]] = row
+            self._entities.add(row)
+            if mark_dirty:
+                self._dirty[row[0]] = row
+
+    def process_entities(self, tlo):
+        self._add_rows(self._entities_to_rows(tlo), mark_dirty=True)
+
+    def get_entity_rows_by_id(self, id, exact=True):
+        if exact:
+            row = self._by_id.get(id)
+            return (row[0], row[1]) if row else None
+        return super().get_entity_rows_by_id(id, exact)
+
+    def load_entities(self, rows: List[EntityRow]):
+        """Veritabanından gelen satırları yükle (kirli sayılmaz)"""
+        self._add_rows((tuple(row) for row in rows), mark_dirty=False)
+
+    def take_dirty_entities(self) -> List[EntityRow]:
+        """Kaydedilmemiş satırları döndür ve listeyi sıfırla"""
+        rows = list(self._dirty.values())
+        self._dirty.clear()
+        return rows
+
+    def restore_dirty_entities(self, rows: List[EntityRow]):
+        """Kaydedilemeyen satırları bir sonraki flush için geri koy"""
+        for row in rows:
+            self._dirty.setdefault(row[0], row)
+
+    def has_entity(self, peer_id: int) -> bool:
+        """Peer'ın access hash'i biliniyor mu?"""
+        return peer_id in self._by_id
+
+    def get_username(self, peer_id: int) -> Optional[str]:
+        """Bilinen username (yoksa None)"""
+        row = self._by_id.get(peer_id)
+        return row[2] if row else None
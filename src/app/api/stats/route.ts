@@ -51,6 +51,22 @@ export async function GET() {
       ORDER BY created_at DESC LIMIT 1
     `);
 
+    // Intake counters (accepted / dropped / spilled ...) written by each bot worker's heartbeat
+    const intakeResult = await query(`
+      SELECT value FROM settings WHERE key LIKE 'intake_stats:%'
+    `);
+    const intakeStats: Record<string, number> = {};
+    for (const row of intakeResult.rows) {
+      try {
+        const values = JSON.parse(row.value) as Record<string, number>;
+        for (const [name, count] of Object.entries(values)) {
+          intakeStats[name] = (intakeStats[name] || 0) + Number(count);
+        }
+      } catch {
+        // Skip malformed rows
+      }
+    }
+
     const todayRow = todayResult.rows[0];
 
     return NextResponse.json({
@@ -62,7 +78,8 @@ export async function GET() {
       weekly_stats: weeklyResult.rows,
       bot_status: botStatusResult.rows[0]?.value || 'offline',
       bot_enabled: botEnabledResult.rows[0]?.value === 'true',
-      last_post_time: lastPostResult.rows[0]?.created_at || null
+      last_post_time: lastPostResult.rows[0]?.created_at || null,
+      intake_stats: intakeStats
     });
   } catch (error) {
     console.error('Error fetching stats:', error);
@@ -157,6 +157,7 @@ interface Stats {
   bot_enabled: boolean;
   last_post_time: string | null;
   weekly_stats: { date: string; posts: number; success: number }[];
+  intake_stats?: Record<string, number>;
 }
 
 const emptySourceChannel: Partial<SourceChannel> = {